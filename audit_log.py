@@ -0,0 +1,197 @@
+"""Buffered audit trail of logins, orders and transfers
+
+audit.emit('login', 'captain', role='Captain') timestamps the event and
+puts it on a bounded queue; it never touches the disk, and if the queue
+is full the event is dropped and counted rather than holding up the
+player's prompt. A background writer thread takes events off the queue
+in batches, gathering for up to `flush_interval` seconds, and appends
+each batch to audit.jsonl, one JSON object per line, in a single write
+followed by a single fsync. The first batch written after a drop opens
+with an `audit_dropped` event giving the count.
+
+Once the file would grow past max_bytes it is rotated: audit.jsonl
+becomes audit.jsonl.1, .1 becomes .2 and so on, keeping `backups` old
+files. Writes and rotation happen under the file's FileLock, so
+terminals sharing a directory keep one trail.
+
+recent() waits for what is already queued to be written, then reads the
+files from the end, newest first.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from station_lock import lock_for
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.2
+READ_BLOCK = 65536
+
+
+def reversed_lines(path):
+    """Yield the complete lines of a file last to first, reading it backwards in blocks"""
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        tail = b''
+        while end > 0:
+            start = max(0, end - READ_BLOCK)
+            f.seek(start)
+            lines = (f.read(end - start) + tail).split(b'\n')
+            end = start
+            tail = lines.pop(0) if start else b''
+            for line in reversed(lines):
+                if line:
+                    yield line
+
+
+class AuditLog:
+    """Append-only JSONL event log fed through a queue by a background writer"""
+
+    def __init__(self, path='audit.jsonl', max_bytes=None, backups=None,
+                 queue_size=QUEUE_SIZE, flush_interval=FLUSH_INTERVAL):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('IRON_RING_AUDIT_MAX_BYTES', DEFAULT_MAX_BYTES))
+        if backups is None:
+            backups = int(os.environ.get('IRON_RING_AUDIT_BACKUPS', DEFAULT_BACKUPS))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.lock = lock_for(path)
+        self._queue = queue.Queue(queue_size)
+        self._writer = None
+        self._start_lock = threading.Lock()
+
+    def emit(self, event, user=None, **fields):
+        """Queue an event for the writer; drops it (and counts the drop) if the queue is full"""
+        record = {'ts': time.strftime('%Y-%m-%d %H:%M:%S'), 'event': event, 'user': user, **fields}
+        self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        if self._writer is not None:
+            return
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < BATCH_SIZE and isinstance(batch[-1], dict):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # A flush marker or the stop sentinel ends the gathering early
+            records = [item for item in batch if isinstance(item, dict)]
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                records.insert(0, {'ts': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                   'event': 'audit_dropped', 'user': None, 'count': dropped})
+            if records:
+                try:
+                    self._write(records)
+                except OSError:
+                    pass  # the trail must never take the terminal down with it
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is None:
+                return
+
+    def _write(self, records):
+        """Append records in one write and one fsync, rotating first if they'd overflow the file"""
+        payload = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        payload = payload.encode('utf-8')
+        with self.lock.exclusive():
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                size = 0
+            if size and size + len(payload) > self.max_bytes:
+                self._rotate()
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b'\n':
+                    payload = b'\n' + payload  # don't glue onto a line a crash cut short
+                os.write(fd, payload)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _rotate(self):
+        """Shift audit.jsonl to .1, .1 to .2 and so on, dropping the oldest"""
+        if not self.backups:
+            os.remove(self.path)
+            return
+        for n in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{n}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{n + 1}")
+        os.replace(self.path, self.path + '.1')
+
+    def flush(self, timeout=5):
+        """Wait until every event queued so far is on disk; True if it got there in time"""
+        if self._writer is None or not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """Write out what is queued and stop the writer"""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._writer.join(timeout)
+
+    def paths(self):
+        """The log and its rotated files, newest first"""
+        return [self.path] + [f"{self.path}.{n}" for n in range(1, self.backups + 1)]
+
+    def recent(self, username, limit=20):
+        """Return the latest events by or naming username (as recipient), newest first"""
+        self.flush()
+        found = []
+        with self.lock.shared():
+            for path in self.paths():
+                try:
+                    for line in reversed_lines(path):
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # torn by a crash mid-write
+                        if record.get('user') == username or record.get('recipient') == username:
+                            found.append(record)
+                            if len(found) >= limit:
+                                return found
+                except FileNotFoundError:
+                    continue
+        return found
+
+
+audit = AuditLog()
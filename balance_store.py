@@ -0,0 +1,240 @@
+"""Fixed-width, memory-mapped holo balances
+
+With IRON_RING_BALANCES=mmap the flat backend keeps balances in
+user_holos.bin instead of user_holos.txt. The file is laid out as:
+
+    64 bytes    header: magic, slots in use, last ledger seq applied
+    64 bytes    slot 0: username (48 bytes, NUL padded), balance, seq
+    64 bytes    slot 1 ...
+
+All numbers are little-endian 64-bit. Each process maps the file and keeps
+a username -> slot dict, so reading a balance is a dict lookup and an
+8-byte read, and a debit or credit rewrites that user's 8-byte balance,
+together with the seq of the record that changed it, in place. Nothing
+else in the file is touched. Slots are 64 bytes so none straddles a page.
+
+user_holos.ledger is still the commit log: records are appended and
+fsynced exactly as in the text mode, then applied to the slots. A slot
+only takes records newer than its seq, so records a crash left unapplied
+are replayed safely the next time the file is opened. Before the ledger
+is moved aside the mapped pages are flushed to disk.
+
+The first use builds user_holos.bin from user_holos.txt and its ledger.
+`python main.py export-holos` writes user_holos.txt back from the slots
+for hand editing and `import-holos` rebuilds the binary file from it;
+every terminal sharing a directory must use the same mode. Growing or
+replacing a file while it is mapped needs a POSIX system.
+"""
+import mmap
+import os
+import struct
+import threading
+
+from holo_ledger import HoloLedger, SEQ_HEADER
+from station_store import store
+
+MAGIC = b'IRHOLO01'
+HEADER = struct.Struct('<8sQQ')  # magic, slots in use, last seq applied
+SLOT = struct.Struct('<48sqQ')   # username, balance, seq
+VALUE = struct.Struct('<qQ')     # balance, seq
+SLOT_SIZE = 64
+NAME_SIZE = 48
+INITIAL_SLOTS = 1024
+
+
+def slot_name(username):
+    """Encode username for a slot, rejecting names that don't fit"""
+    raw = username.encode('utf-8')
+    if not raw or len(raw) > NAME_SIZE or b'\0' in raw:
+        raise ValueError(f"username {username!r} doesn't fit a {NAME_SIZE}-byte balance slot")
+    return raw
+
+
+class MmapHoloLedger(HoloLedger):
+    """HoloLedger whose balances live in fixed-width slots of a memory-mapped file"""
+
+    def __init__(self, path='user_holos.bin', text_path='user_holos.txt',
+                 ledger_path='user_holos.ledger', compact_every=None):
+        super().__init__(checkpoint_path=path, ledger_path=ledger_path, compact_every=compact_every)
+        store.parsers.pop(path, None)  # the slots are read through the map, never parsed as text
+        self.path = path
+        self.text_path = text_path
+        self._map_lock = threading.Lock()
+        self._mm = None
+        self._inode = None
+        self._slots = {}
+        self._count = 0
+        self._ready = False
+
+    def _open(self):
+        """Create the file from the text balances if missing, and replay the ledger once per process"""
+        if self._ready:
+            return
+        with self.lock.exclusive():
+            if not os.path.exists(self.path):
+                self._import_text()
+            self._replay()
+        self._ready = True
+
+    def _mapped(self):
+        """Return the mmap, remapping if the file was replaced or grew and indexing new slots"""
+        st = os.stat(self.path)
+        mm = self._mm
+        if (mm is not None and (st.st_dev, st.st_ino) == self._inode and st.st_size == len(mm)
+                and HEADER.unpack_from(mm)[1] == self._count):
+            return mm
+        with self._map_lock:
+            if self._mm is None or (st.st_dev, st.st_ino) != self._inode or st.st_size != len(self._mm):
+                with open(self.path, 'r+b') as f:
+                    mm = mmap.mmap(f.fileno(), 0)
+                magic, _, _ = HEADER.unpack_from(mm)
+                if magic != MAGIC:
+                    raise ValueError(f"{self.path} is not a balance file")
+                if (st.st_dev, st.st_ino) != self._inode:
+                    self._slots, self._count = {}, 0
+                # The old map is left for readers still holding it; it is unmapped once they let go
+                self._mm, self._inode = mm, (st.st_dev, st.st_ino)
+            mm = self._mm
+            count = HEADER.unpack_from(mm)[1]
+            slots = dict(self._slots)
+            for slot in range(self._count, count):
+                name = SLOT.unpack_from(mm, SLOT_SIZE * (slot + 1))[0].rstrip(b'\0')
+                slots[name.decode('utf-8')] = slot
+            self._slots, self._count = slots, count
+            return mm
+
+    def _add_slot(self, username):
+        """Give username a zero balance in the next free slot, growing the file if needed"""
+        mm = self._mapped()
+        _, count, applied = HEADER.unpack_from(mm)
+        if SLOT_SIZE * (count + 2) > len(mm):
+            capacity = max(INITIAL_SLOTS, 2 * (len(mm) // SLOT_SIZE - 1))
+            with open(self.path, 'r+b') as f:
+                f.truncate(SLOT_SIZE * (capacity + 1))
+            mm = self._mapped()
+        SLOT.pack_into(mm, SLOT_SIZE * (count + 1), slot_name(username), 0, 0)
+        HEADER.pack_into(mm, 0, MAGIC, count + 1, applied)
+        self._mapped()
+        return self._slots[username]
+
+    def _apply(self, records):
+        """Apply ledger records to their slots, skipping any a slot already has"""
+        for record in records:
+            slot = self._slots.get(record.username)
+            if slot is None:
+                slot = self._add_slot(record.username)
+            offset = SLOT_SIZE * (slot + 1) + NAME_SIZE
+            balance, seq = VALUE.unpack_from(self._mm, offset)
+            if record.seq > seq:
+                VALUE.pack_into(self._mm, offset, balance + record.delta, record.seq)
+        if records:
+            _, count, applied = HEADER.unpack_from(self._mm)
+            HEADER.pack_into(self._mm, 0, MAGIC, count, max(applied, records[-1].seq))
+
+    def _replay(self):
+        mm = self._mapped()
+        applied = HEADER.unpack_from(mm)[2]
+        self._apply([record for record in self._records() if record.seq > applied])
+
+    def balance(self, username):
+        self._open()
+        with self.lock.shared():
+            self._mapped()
+            slot = self._slots.get(username)
+            if slot is None:
+                return None
+            return VALUE.unpack_from(self._mm, SLOT_SIZE * (slot + 1) + NAME_SIZE)[0]
+
+    def balances(self):
+        self._open()
+        return super().balances()
+
+    def _balances(self):
+        mm = self._mapped()
+        return {username: VALUE.unpack_from(mm, SLOT_SIZE * (slot + 1) + NAME_SIZE)[0]
+                for username, slot in self._slots.items()}
+
+    def _last_seq(self):
+        return HEADER.unpack_from(self._mapped())[2]
+
+    def _pending(self):
+        return len(self._records())
+
+    def post_many(self, transactions, notes=()):
+        self._open()
+        return super().post_many(transactions, notes)
+
+    def _append(self, transactions, notes=()):
+        for entries, _ in transactions:
+            for username, _ in entries:
+                slot_name(username)  # refuse before anything reaches the ledger
+        self._replay()
+        records = self._records()
+        new_records = self._write_records(transactions, self._last_seq(), notes)
+        store.put(self.ledger_path, [*records, *new_records])
+        self._apply(new_records)
+        # Unlike the text ledger, don't hand back every balance: building
+        # that dict would cost more than the update itself
+        return None
+
+    def _write_file(self, balances, seq):
+        """Replace the file with one slot per balance, all as of seq"""
+        capacity = max(INITIAL_SLOTS, len(balances))
+        buf = bytearray(SLOT_SIZE * (capacity + 1))
+        HEADER.pack_into(buf, 0, MAGIC, len(balances), seq)
+        for slot, (username, holos) in enumerate(balances.items()):
+            SLOT.pack_into(buf, SLOT_SIZE * (slot + 1), slot_name(username), holos, seq)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(buf)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def checkpoint(self, balances):
+        self._open()
+        super().checkpoint(balances)
+
+    def _checkpoint(self, balances):
+        self._replay()
+        self._write_file(balances, self._last_seq())
+        self._retire_ledger()
+
+    def compact(self):
+        """Flush the mapped balances to disk and move the ledger tail aside"""
+        with self.lock.exclusive():
+            self._replay()
+            self._mm.flush()
+            self._retire_ledger()
+
+    def _import_text(self):
+        text = HoloLedger(self.text_path, self.ledger_path)
+        with text.lock.exclusive():
+            balances = text.balances()
+            self._write_file(balances, text.last_seq())
+        return len(balances)
+
+    def import_text(self):
+        """Rebuild the file from user_holos.txt and its ledger, returning how many balances it holds"""
+        with self.lock.exclusive():
+            count = self._import_text()
+            self._replay()
+        self._ready = True
+        return count
+
+    def export_text(self):
+        """Write every balance to user_holos.txt, returning how many were written"""
+        self._open()
+        with self.lock.exclusive():
+            self._replay()
+            balances = self._balances()
+            tmp_path = self.text_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(f"{SEQ_HEADER}{self._last_seq()}\n")
+                for username, holos in balances.items():
+                    f.write(f"{username}:{holos}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.text_path)
+        store.invalidate(self.text_path)
+        return len(balances)
@@ -0,0 +1,144 @@
+"""The station bank's rules for moving holos, and idempotent transfers
+
+check_debit() is the one overdraft rule and check_transfer() the one
+transfer rule; the screens, the scripting CLI and batch files all go
+through them. Storage.transfer() and Storage.place_order() check them
+again while holding the backend's write lock, so a balance can't change
+between the check and the debit, and a transfer's debit and credit are
+written together or not at all.
+
+A transfer may carry an idempotency key. The first transfer with a key
+is applied and the key recorded alongside it; a transfer repeated with
+the same key (a retried CLI call, a form submitted twice) posts nothing
+and gets the first one's Receipt back, marked replayed. The flat backend
+writes the key as a `transfer-key key|sender|recipient|amount|memo` note
+in the same ledger append as the transfer (see holo_ledger.py); SQLite
+keeps keys in the transfer_keys table.
+"""
+import os
+import uuid
+from collections import namedtuple
+
+from holo_ledger import read_notes
+
+OVERDRAFT_LIMIT = 0  # how far below zero a debit may take an account
+KEY_NOTE = 'transfer-key '
+
+Receipt = namedtuple('Receipt', 'key sender recipient amount memo replayed')
+
+
+class Refused(Exception):
+    """A debit or transfer the bank won't make"""
+
+
+def new_key():
+    """Return a fresh idempotency key"""
+    return uuid.uuid4().hex
+
+
+def check_debit(username, balance, amount):
+    """Refuse a debit that isn't positive or would overdraw the account"""
+    if amount <= 0:
+        raise Refused("amount must be positive")
+    if balance is None:
+        raise Refused(f"no account for {username}")
+    if balance - amount < -OVERDRAFT_LIMIT:
+        raise Refused(f"not enough holos: {username} has {balance}, needs {amount}")
+
+
+def check_transfer(sender, recipient, amount, balance_of):
+    """Refuse a transfer the bank won't make; balance_of(username) returns a balance or None"""
+    if sender == recipient:
+        raise Refused("can't transfer to the same account")
+    if balance_of(recipient) is None:
+        raise Refused(f"no account for {recipient}")
+    check_debit(sender, balance_of(sender), amount)
+
+
+def transfer_memo(sender, recipient, note=''):
+    """The ledger memo for a transfer, with the sender's note on the same line"""
+    note = ' '.join(note.split())
+    memo = f"TRANSFER {sender} -> {recipient}"
+    return f"{memo} ({note})" if note else memo
+
+
+def check_key(key):
+    """Refuse a key that can't be stored in one ledger note"""
+    if not key or '|' in key or any(c in key for c in '\r\n'):
+        raise Refused("key must be non-empty, on one line and free of '|'")
+
+
+def replay(receipt, sender, recipient, amount):
+    """Return the receipt a key was first used for, refusing the key for a different transfer"""
+    if (receipt.sender, receipt.recipient, receipt.amount) != (sender, recipient, amount):
+        raise Refused(f"key {receipt.key} was already used for a different transfer")
+    return receipt._replace(replayed=True)
+
+
+def format_key(receipt):
+    """Format a Receipt as a ledger note"""
+    return f"{KEY_NOTE}{receipt.key}|{receipt.sender}|{receipt.recipient}|{receipt.amount}|{receipt.memo}"
+
+
+def parse_keys(notes):
+    """Parse the key notes among ledger notes into {key: Receipt}"""
+    keys = {}
+    for note in notes:
+        if not note.startswith(KEY_NOTE):
+            continue
+        parts = note[len(KEY_NOTE):].split('|', 4)
+        if len(parts) != 5:
+            continue
+        try:
+            keys[parts[0]] = Receipt(parts[0], parts[1], parts[2], int(parts[3]), parts[4], False)
+        except ValueError:
+            continue
+    return keys
+
+
+class TransferKeys:
+    """Idempotency keys of flat-file transfers, kept as notes of the holo ledger
+
+    Keys are looked up in the ledger tail, its archive and the notes kept
+    from older ledgers, each parsed again only when its file changes.
+    Callers hold the ledger's exclusive lock around get() and post().
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self._files = {}  # path -> (signature, {key: Receipt})
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _keys(self, path):
+        signature = self._signature(path)
+        cached = self._files.get(path)
+        if cached is None or cached[0] != signature:
+            cached = self._files[path] = (signature, parse_keys(read_notes(path)))
+        return cached[1]
+
+    def get(self, key):
+        """Return the Receipt recorded for key, or None"""
+        for path in (self.ledger.ledger_path, self.ledger.archive_path, self.ledger.notes_path):
+            receipt = self._keys(path).get(key)
+            if receipt is not None:
+                return receipt
+        return None
+
+    def post(self, receipt, entries):
+        """Post entries with receipt's key as a note in the same ledger append"""
+        path = self.ledger.ledger_path
+        keys = self._keys(path)
+        self.ledger.post(entries, receipt.memo, notes=[format_key(receipt)])
+        keys[receipt.key] = receipt
+        signature = self._signature(path)
+        if signature is None:
+            self._files.pop(path, None)  # compacted: the key is in the archive now
+        else:
+            self._files[path] = (signature, keys)
@@ -0,0 +1,173 @@
+"""Batch holo transactions from a CSV or JSONL file
+
+A batch is a file of rows, one transaction each:
+
+    type,user,recipient,amount,item,quantity,memo
+    transfer,captain,engineer,50,,,repairs
+    purchase,guest,,,Protein Bar,2,
+    reward,science,,100,,,found the artifact
+    fine,cargo,,25,,,smuggling
+
+or the same fields as one JSON object per line. `transfer` moves amount
+from user to recipient, `purchase` buys quantity (default 1) of a food
+menu item for user and delivers it to their inventory, `reward` credits
+user and `fine` debits them.
+
+plan() checks every row in file order against a working copy of the
+balances, so a row sees the effect of the rows before it. A row that
+fails (unknown user, unknown item, not enough holos, a malformed field)
+is reported and leaves the balances alone; the rest of the batch goes
+ahead. Overdrafts and transfers follow the bank's rules (see bank.py).
+The storage backend then applies the accepted rows in one go (see
+Storage.apply_batch).
+"""
+import csv
+import json
+import os
+
+from bank import Refused, check_debit, check_transfer, transfer_memo
+
+KINDS = ('transfer', 'purchase', 'reward', 'fine')
+FIELDS = ('type', 'user', 'recipient', 'amount', 'item', 'quantity', 'memo')
+
+
+class RowError(Exception):
+    """A batch row that can't be applied"""
+
+
+class Plan:
+    """What a batch will do once applied: transactions, deliveries and a result per row"""
+
+    def __init__(self):
+        self.transactions = []  # [(entries, memo)]
+        self.deliveries = []    # [(username, item, description, quantity)]
+        self.results = []       # [(row number, ok, message)]
+
+    @property
+    def applied(self):
+        return sum(1 for _, ok, _ in self.results if ok)
+
+    @property
+    def failed(self):
+        return [(number, message) for number, ok, message in self.results if not ok]
+
+
+def read_rows(path, fmt=None):
+    """Yield (row number, fields dict or None, error) for every row in a CSV or JSONL file
+
+    fmt is 'csv' or 'jsonl'; by default it follows the file extension.
+    Rows are numbered by their line in the file.
+    """
+    if fmt is None:
+        fmt = 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.json', '.ndjson') else 'csv'
+    with open(path, newline='') as f:
+        if fmt == 'jsonl':
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    fields = json.loads(line)
+                except ValueError as e:
+                    yield number, None, f"not valid JSON ({e.msg})"
+                    continue
+                if not isinstance(fields, dict):
+                    yield number, None, "not a JSON object"
+                    continue
+                yield number, fields, None
+        else:
+            reader = csv.DictReader(f)
+            missing = {'type', 'user'} - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"{path} is missing the {', '.join(sorted(missing))} column")
+            for fields in reader:
+                if not any((value or '').strip() for value in fields.values() if isinstance(value, str)):
+                    continue
+                yield reader.line_num, fields, None
+
+
+def _text(fields, name):
+    value = fields.get(name)
+    return '' if value is None else str(value).strip()
+
+
+def _positive(fields, name, default=None):
+    text = _text(fields, name)
+    if not text and default is not None:
+        return default
+    try:
+        value = int(text)
+    except ValueError:
+        raise RowError(f"{name} must be a whole number, not {text!r}" if text else f"{name} is missing")
+    if value <= 0:
+        raise RowError(f"{name} must be positive")
+    return value
+
+
+def _account(balances, fields, name):
+    username = _text(fields, name)
+    if not username:
+        raise RowError(f"{name} is missing")
+    if username not in balances:
+        raise RowError(f"no account for {username}")
+    return username
+
+
+def _memo(base, fields):
+    note = ' '.join(_text(fields, 'memo').split())  # one ledger line, however it was typed
+    return f"{base} ({note})" if note else base
+
+
+def plan_row(fields, balances, prices):
+    """Return (entries, memo, delivery or None) for one row, or raise RowError"""
+    kind = _text(fields, 'type').lower()
+    if kind not in KINDS:
+        raise RowError(f"unknown type {kind!r}; expected {', '.join(KINDS)}")
+    user = _account(balances, fields, 'user')
+
+    if kind == 'transfer':
+        recipient = _account(balances, fields, 'recipient')
+        amount = _positive(fields, 'amount')
+        check_transfer(user, recipient, amount, balances.get)
+        return [(user, -amount), (recipient, amount)], transfer_memo(user, recipient, _text(fields, 'memo')), None
+
+    if kind == 'purchase':
+        item = _text(fields, 'item')
+        if item.lower() not in prices:
+            raise RowError(f"{item!r} is not on the food menu" if item else "item is missing")
+        item, price = prices[item.lower()]
+        quantity = _positive(fields, 'quantity', default=1)
+        check_debit(user, balances[user], price * quantity)
+        return [(user, -price * quantity)], _memo(f"STORE {quantity} x {item}", fields), (user, item, item, quantity)
+
+    amount = _positive(fields, 'amount')
+    if kind == 'fine':
+        check_debit(user, balances[user], amount)
+        return [(user, -amount)], _memo("FINE", fields), None
+    return [(user, amount)], _memo("REWARD", fields), None
+
+
+def plan(rows, balances, food_menu):
+    """Check rows from read_rows() in order against balances and return a Plan
+
+    balances is not modified; accepted rows are applied to a working copy
+    so later rows are checked against the balances they will really see.
+    """
+    balances = dict(balances)
+    prices = {item.lower(): (item, price) for item, price in food_menu}
+    result = Plan()
+    for number, fields, error in rows:
+        if error is None:
+            try:
+                entries, memo, delivery = plan_row(fields, balances, prices)
+            except (RowError, Refused) as e:
+                error = str(e)
+        if error is not None:
+            result.results.append((number, False, error))
+            continue
+        for username, delta in entries:
+            balances[username] += delta
+        result.transactions.append((entries, memo))
+        if delivery is not None:
+            result.deliveries.append(delivery)
+        result.results.append((number, True, memo))
+    return result
@@ -0,0 +1,117 @@
+"""Cold-start benchmark: time to the first login prompt and peak memory
+
+Launches `python main.py` with the instant pacing profile a number of
+times. For each run it measures the time until the USERNAME prompt
+appears on stdout and the process's peak resident set size. It then
+prints the median and worst of each, and exits with status 1 if either
+median is over its threshold.
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --runs 20 --max-ms 300 --max-rss-mb 40
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'main.py')
+PROMPT = b'USERNAME'
+
+
+def peak_rss_kb(pid):
+    """Peak RSS of a running process in KiB from /proc, or None off Linux"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def children_rss_kb():
+    """Largest peak RSS of any waited-for child, in KiB"""
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run_once(python, timeout):
+    """Start the terminal once and return (seconds to first prompt, peak RSS in KiB)"""
+    env = dict(os.environ, IRON_RING_PACING='instant', COLUMNS='100', LINES='40')
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [python, MAIN], cwd=ROOT, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    output = b''
+    try:
+        while PROMPT not in output:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f'no login prompt after {timeout}s')
+            chunk = os.read(proc.stdout.fileno(), 65536)
+            if not chunk:
+                raise RuntimeError('terminal exited before the login prompt:\n'
+                                   + proc.stderr.read().decode(errors='replace'))
+            output += chunk
+        elapsed = time.perf_counter() - started
+        rss = peak_rss_kb(proc.pid)
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+        proc.stdin.close()
+    return elapsed, rss if rss is not None else children_rss_kb()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='launches to measure (default 10)')
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured launches first, to fill the OS file cache (default 1)')
+    parser.add_argument('--max-ms', type=float, default=400.0, help='fail if the median time to first prompt exceeds this (default 400)')
+    parser.add_argument('--max-rss-mb', type=float, default=60.0, help='fail if the median peak RSS exceeds this (default 60)')
+    parser.add_argument('--python', default=sys.executable, help='interpreter to launch the terminal with')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds to wait for the prompt')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    for _ in range(args.warmup):
+        run_once(args.python, args.timeout)
+    times, rss = [], []
+    for _ in range(args.runs):
+        elapsed, peak = run_once(args.python, args.timeout)
+        times.append(elapsed * 1000)
+        rss.append(peak / 1024)
+
+    result = {
+        'runs': args.runs,
+        'time_to_prompt_ms': {'median': statistics.median(times), 'max': max(times), 'min': min(times)},
+        'peak_rss_mb': {'median': statistics.median(rss), 'max': max(rss)},
+        'thresholds': {'time_to_prompt_ms': args.max_ms, 'peak_rss_mb': args.max_rss_mb},
+    }
+    failures = []
+    if result['time_to_prompt_ms']['median'] > args.max_ms:
+        failures.append(f"time to first prompt {result['time_to_prompt_ms']['median']:.1f} ms > {args.max_ms:g} ms")
+    if result['peak_rss_mb']['median'] > args.max_rss_mb:
+        failures.append(f"peak RSS {result['peak_rss_mb']['median']:.1f} MB > {args.max_rss_mb:g} MB")
+    result['failures'] = failures
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        t, m = result['time_to_prompt_ms'], result['peak_rss_mb']
+        print(f"time to first prompt: median {t['median']:.1f} ms, min {t['min']:.1f} ms, max {t['max']:.1f} ms ({args.runs} runs)")
+        print(f"peak RSS:             median {m['median']:.1f} MB, max {m['max']:.1f} MB")
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
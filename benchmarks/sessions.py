@@ -0,0 +1,258 @@
+"""Scripted-session benchmark: drives the whole terminal from canned input
+
+Runs the real menu loop (main.run_terminal) in-process against a generated
+dataset. Every Prompt.ask / IntPrompt.ask / Confirm.ask is answered from a
+script, and output goes to a console that renders everything but writes it
+nowhere. Each scripted answer is one action: the time from giving the
+answer to the next prompt is that action's latency, and file opens plus
+bytes read and written in that window are charged to it.
+
+    python benchmarks/sessions.py
+    python benchmarks/sessions.py --users 20000 --items 200000 --sessions 50 --json
+
+The default script logs in, orders from the store, transfers holos, views
+the inventory and logs out, once per session. With --concurrency N, N
+players run their sessions at once on a SessionRunner. Opens and bytes
+can't be told apart between threads, so they are only reported for a
+single player.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import datagen
+from pacing import Pacing
+from snapshot import ScriptedConsole
+from station_store import parse_permissions
+
+# (action, answer) pairs for one session; {user}, {password} and
+# {recipient} are filled in from the dataset. The first prompt of a
+# session (USERNAME) is reached by the 'boot' action of the session before.
+SESSION_SCRIPT = [
+    ('login: username', '{user}'),
+    ('login', '{password}'),
+    ('open store', '4'),
+    ('store: choose item', '1'),
+    ('store order', '1'),
+    ('back to main menu', ''),
+    ('open bank', '5'),
+    ('open transfer', '2'),
+    ('transfer: recipient', '{recipient}'),
+    ('transfer: amount', '1'),
+    ('transfer', 'y'),
+    ('back to bank menu', ''),
+    ('back to main menu', '3'),
+    ('open personal menu', '1'),
+    ('inventory view', '1'),
+    ('back to personal menu', ''),
+    ('back to main menu', '3'),
+    ('logout: confirm', '7'),
+    ('logout', 'y'),
+]
+
+
+class IOCounter:
+    """Counts file opens (via an audit hook) and bytes moved (via /proc/self/io)"""
+
+    def __init__(self):
+        self.opens = 0
+        sys.addaudithook(self._hook)
+        # Reading /proc/self/io shows up in rchar itself; measure it once to subtract
+        first, second = self._proc_io(), self._proc_io()
+        self.overhead = second[0] - first[0] if first and second else 0
+
+    def _hook(self, event, args):
+        if event == 'open':
+            self.opens += 1
+
+    @staticmethod
+    def _proc_io():
+        try:
+            with open('/proc/self/io') as f:
+                fields = dict(line.split(': ') for line in f.read().splitlines())
+            return int(fields['rchar']), int(fields['wchar'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def snapshot(self):
+        opens = self.opens
+        moved = self._proc_io()
+        self.opens = opens  # reading /proc/self/io is an open too; don't charge it
+        return opens, moved
+
+
+class TimedConsole(ScriptedConsole):
+    """A scripted console that renders nowhere and times each action
+
+    answers are (action, answer) pairs. counter may be None to time
+    actions without charging I/O to them.
+    """
+
+    def __init__(self, answers, stats, counter=None):
+        super().__init__(answers)
+        self.stats = stats
+        self.counter = counter
+        self._pending = None
+
+    def shown(self, prompt):
+        now = time.perf_counter()
+        opens, moved = self._snapshot()
+        if self._pending is not None:
+            self._record(now, opens, moved)
+
+    def next_answer(self, prompt):
+        action, answer = super().next_answer(prompt)
+        opens, moved = self._snapshot()
+        self._pending = (action, time.perf_counter(), opens, moved)
+        return answer
+
+    def _snapshot(self):
+        return self.counter.snapshot() if self.counter is not None else (None, None)
+
+    def _record(self, now, opens, moved):
+        action, started, opens0, moved0 = self._pending
+        sample = self.stats.setdefault(action, {'ms': [], 'opens': [], 'read': [], 'written': []})
+        sample['ms'].append((now - started) * 1000)
+        if opens is not None:
+            sample['opens'].append(opens - opens0)
+        if moved is not None and moved0 is not None:
+            sample['read'].append(moved[0] - moved0[0] - self.counter.overhead)
+            sample['written'].append(moved[1] - moved0[1])
+
+
+def load_accounts(path, limit=1000):
+    """Read (username, password) for up to limit users whose role can use every scripted menu"""
+    needed = {1, 4, 5, 7}
+    with open(os.path.join(path, 'permissions.txt')) as f:
+        roles = {role for role, perms in parse_permissions(f).items() if needed <= set(perms)}
+    accounts = []
+    with open(os.path.join(path, 'users.txt')) as f:
+        for line in f:
+            username, password, role = line.strip().split(':')
+            if role in roles:
+                accounts.append((username, password))
+                if len(accounts) == limit:
+                    break
+    return accounts
+
+
+def session_answers(accounts, sessions, seed):
+    """Yield (action, answer) for the scripted sessions, ending with an exit"""
+    rng = random.Random(seed)
+    for n in range(sessions):
+        (user, password), (recipient, _) = rng.sample(accounts, 2)
+        for action, answer in SESSION_SCRIPT:
+            yield action, answer.format(user=user, password=password, recipient=recipient)
+        # "Exit terminal completely?"; 'no' goes back through the boot sequence
+        if n + 1 < sessions:
+            yield 'boot', 'n'
+        else:
+            yield 'exit', 'y'
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(stats):
+    """Per-action latency percentiles and mean I/O"""
+    report = {}
+    for action, sample in stats.items():
+        ms = sample['ms']
+        report[action] = {
+            'count': len(ms),
+            'p50_ms': percentile(ms, 50),
+            'p90_ms': percentile(ms, 90),
+            'p99_ms': percentile(ms, 99),
+            'max_ms': max(ms),
+            'opens': sum(sample['opens']) / len(sample['opens']) if sample['opens'] else None,
+            'read_bytes': sum(sample['read']) / len(sample['read']) if sample['read'] else None,
+            'written_bytes': sum(sample['written']) / len(sample['written']) if sample['written'] else None,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'action':<24}{'n':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'opens':>8}{'read KB':>11}{'written KB':>12}")
+    for action, row in report.items():
+        opens = '-' if row['opens'] is None else f"{row['opens']:.1f}"
+        read = '-' if row['read_bytes'] is None else f"{row['read_bytes'] / 1024:.1f}"
+        written = '-' if row['written_bytes'] is None else f"{row['written_bytes'] / 1024:.1f}"
+        print(f"{action:<24}{row['count']:>6}{row['p50_ms']:>10.2f}{row['p90_ms']:>10.2f}"
+              f"{row['p99_ms']:>10.2f}{opens:>8}{read:>11}{written:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000, help='generated users (default 1000)')
+    parser.add_argument('--items', type=int, default=10000, help='generated inventory rows (default 10000)')
+    parser.add_argument('--news', type=int, default=500, help='generated news articles (default 500)')
+    parser.add_argument('--skew', type=float, default=1.0, help='how unevenly inventory is spread over users (default 1)')
+    parser.add_argument('--sessions', type=int, default=20, help='scripted sessions per player (default 20)')
+    parser.add_argument('--concurrency', type=int, default=1, help='players running sessions at once (default 1)')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the dataset and the script')
+    parser.add_argument('--keep', action='store_true', help='keep the generated data directory')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    data_dir = tempfile.mkdtemp(prefix='iron-ring-bench-')
+    datagen.generate(data_dir, users=args.users, items=args.items, news=args.news, skew=args.skew, seed=args.seed)
+    accounts = load_accounts(data_dir)
+
+    # The terminal reads its data files relative to the working directory
+    os.environ.setdefault('IRON_RING_STORAGE', 'flat')
+    os.chdir(data_dir)
+    import main as terminal
+    from session import Session, SessionRunner
+
+    counter = IOCounter() if args.concurrency == 1 else None
+    players = []
+    for player in range(args.concurrency):
+        answers = session_answers(accounts, args.sessions, args.seed + player)
+        players.append(TimedConsole(answers, {}, counter))
+    runner = SessionRunner(terminal.run_terminal, max_sessions=args.concurrency)
+
+    started = time.perf_counter()
+    try:
+        running = [runner.submit(Session(console, Pacing('instant', skippable=False))) for console in players]
+        for future in running:
+            future.result()
+    finally:
+        runner.shutdown()
+        elapsed = time.perf_counter() - started
+        if not args.keep:
+            os.chdir(ROOT)
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    stats = {}
+    for console in players:
+        for action, sample in console.stats.items():
+            merged = stats.setdefault(action, {'ms': [], 'opens': [], 'read': [], 'written': []})
+            for key, values in sample.items():
+                merged[key].extend(values)
+    report = summarize(stats)
+    total = args.sessions * args.concurrency
+    if args.json:
+        print(json.dumps({'sessions': total, 'concurrency': args.concurrency, 'seconds': elapsed,
+                          'actions': report}, indent=2))
+    else:
+        print(f"{total} sessions ({args.concurrency} at a time) in {elapsed:.2f} s "
+              f"({args.users} users, {args.items} inventory rows, {args.news} news)")
+        print_report(report)
+        if args.keep:
+            print(f"data kept in {data_dir}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
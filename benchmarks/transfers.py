@@ -0,0 +1,182 @@
+"""Transfer throughput benchmark: transfers per second through Storage.transfer
+
+Generates a dataset, then for each backend moves 1 holo between random
+pairs of accounts as fast as it can, from one or more threads, and
+reports transfers per second and latency percentiles. Every transfer
+carries an idempotency key, and with --replays some are sent twice, so
+the cost of the key check is included. Afterwards the total of all
+balances must be unchanged; the benchmark exits with status 1 if not.
+
+    python benchmarks/transfers.py
+    python benchmarks/transfers.py --users 10000 --transfers 20000 --threads 8 --backends flat,sqlite
+
+Backends:
+
+    flat     user_holos.txt plus the ledger, on disk
+    mmap     the flat backend with IRON_RING_BALANCES=mmap
+    sqlite   an SQLite database on disk
+    memory   an in-memory SQLite database (no disk at all; one thread,
+             since every connection to :memory: is a database of its own)
+
+Each backend runs in a fresh process against its own copy of the data.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import datagen
+from sessions import percentile
+
+BACKENDS = ('flat', 'mmap', 'sqlite', 'memory')
+
+
+def open_backend(backend, data_dir):
+    """Open the storage backend over the dataset in data_dir (the working directory)"""
+    from storage import FlatFileStorage, SQLiteStorage, import_flat_files
+    from holo_ledger import HoloLedger
+    if backend == 'flat':
+        return FlatFileStorage('text')
+    if backend == 'mmap':
+        return FlatFileStorage('mmap')
+    if backend == 'sqlite':
+        import_flat_files('iron_ring.db', data_dir)
+        return SQLiteStorage('iron_ring.db')
+    storage = SQLiteStorage(':memory:')
+    with storage.conn:
+        storage.conn.executemany('INSERT INTO balances (username, holos) VALUES (?, ?)',
+                                 HoloLedger().balances().items())
+    return storage
+
+
+def run_backend(backend, data_dir, transfers, threads, replays, seed):
+    """Run the transfers against one backend and return its report"""
+    os.chdir(data_dir)
+    from bank import Refused, new_key
+    storage = open_backend(backend, data_dir)
+    if backend == 'memory':
+        threads = 1
+    balances = storage.balances()
+    accounts = sorted(balances)
+    total_before = sum(balances.values())
+
+    per_thread = transfers // threads
+    latencies = [[] for _ in range(threads)]
+    applied = [0] * threads
+    replayed = [0] * threads
+    refused = [0] * threads
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        for _ in range(per_thread):
+            sender, recipient = rng.sample(accounts, 2)
+            key = new_key()
+            sends = 2 if rng.random() < replays else 1
+            for _ in range(sends):
+                started = time.perf_counter()
+                try:
+                    receipt = storage.transfer(sender, recipient, 1, key=key)
+                    replayed[n] += receipt.replayed
+                    applied[n] += not receipt.replayed
+                except Refused:
+                    refused[n] += 1
+                latencies[n].append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    if threads == 1:
+        worker(0)  # on this thread, whose connection holds the :memory: database
+    else:
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    ms = [value for values in latencies for value in values]
+    return {
+        'backend': backend,
+        'threads': threads,
+        'calls': len(ms),
+        'applied': sum(applied),
+        'replayed': sum(replayed),
+        'refused': sum(refused),
+        'seconds': elapsed,
+        'transfers_per_second': sum(applied) / elapsed,
+        'p50_ms': percentile(ms, 50),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': max(ms),
+        'conserved': sum(storage.balances().values()) == total_before,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000, help='generated users (default 1000)')
+    parser.add_argument('--transfers', type=int, default=2000, help='transfers per backend (default 2000)')
+    parser.add_argument('--threads', type=int, default=1, help='threads sending transfers at once (default 1)')
+    parser.add_argument('--replays', type=float, default=0.1,
+                        help='share of transfers sent a second time with the same key (default 0.1)')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help=f"comma-separated, from {', '.join(BACKENDS)}")
+    parser.add_argument('--seed', type=int, default=1, help='seed for the dataset and the transfers')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--run', nargs=2, metavar=('BACKEND', 'DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        # Child process: one backend, report on stdout
+        backend, data_dir = args.run
+        print(json.dumps(run_backend(backend, data_dir, args.transfers, args.threads, args.replays, args.seed)))
+        return 0
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backend {', '.join(sorted(unknown))}")
+
+    source = tempfile.mkdtemp(prefix='iron-ring-transfers-')
+    reports = []
+    try:
+        datagen.generate(source, users=args.users, items=0, news=0, seed=args.seed)
+        for backend in backends:
+            data_dir = os.path.join(source, backend)
+            shutil.copytree(source, data_dir, ignore=shutil.ignore_patterns(*BACKENDS))
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', backend, data_dir,
+                 '--transfers', str(args.transfers), '--threads', str(args.threads),
+                 '--replays', str(args.replays), '--seed', str(args.seed)],
+                capture_output=True, text=True,
+            )
+            if child.returncode:
+                sys.stderr.write(child.stderr)
+                return 1
+            reports.append(json.loads(child.stdout))
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({'users': args.users, 'backends': reports}, indent=2))
+    else:
+        print(f"{args.transfers} transfers per backend, {args.threads} thread(s), {args.users} users")
+        print(f"{'backend':<10}{'threads':>8}{'per sec':>11}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'replayed':>10}")
+        for row in reports:
+            print(f"{row['backend']:<10}{row['threads']:>8}{row['transfers_per_second']:>11.0f}{row['p50_ms']:>10.3f}"
+                  f"{row['p99_ms']:>10.3f}{row['max_ms']:>10.2f}{row['replayed']:>10}")
+    broken = [row['backend'] for row in reports if not row['conserved']]
+    if broken:
+        print(f"holos not conserved by: {', '.join(broken)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
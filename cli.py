@@ -0,0 +1,425 @@
+"""Command-line interface for the Iron Ring terminal
+
+`python main.py` with no arguments starts the terminal straight away
+without loading Typer. Any arguments (options such as --pacing, or a
+subcommand) are handled by the Typer app defined here.
+
+The scripting subcommands (balance, transfer, inventory, news, menu,
+audit) are for bots and GM tools: they skip the boot sequence and banner,
+print one JSON object on stdout and exit with 0 on success, 1 when the
+request is malformed or names something that doesn't exist, and 2 when
+the station refuses it (not enough holos, transfer to the same account).
+"""
+import atexit
+import json
+import os
+import sys
+
+import typer
+from rich.markup import escape
+
+import datagen
+from audit_log import audit
+from bank import Refused
+from balance_store import MmapHoloLedger
+from batch import read_rows
+from main import console, run_terminal, storage, LAUNCH_DIR
+from inventory_index import inventory
+from line_index import news, maintenance_notes
+from pacing import pacing, PROFILES
+from profiling import profiler
+from storage import Storage, import_flat_files
+
+app = typer.Typer()
+inventory_app = typer.Typer(help="List, add and delete a user's inventory items (JSON output)")
+news_app = typer.Typer(help="Post station news (JSON output)")
+menu_app = typer.Typer(help="Look up the food menu (JSON output)")
+app.add_typer(inventory_app, name="inventory")
+app.add_typer(news_app, name="news")
+app.add_typer(menu_app, name="menu")
+
+BATCH_FAILURES_SHOWN = 50
+
+
+def validate_pacing(value):
+    """Typer callback rejecting unknown pacing profiles"""
+    if value is not None and value not in PROFILES:
+        raise typer.BadParameter(f"choose from {', '.join(PROFILES)}")
+    return value
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    ctx: typer.Context,
+    pacing_profile: str = typer.Option(
+        None, "--pacing", envvar="IRON_RING_PACING", callback=validate_pacing,
+        help="Animation pacing: cinematic, brisk or instant"
+    ),
+    profile: bool = typer.Option(
+        False, "--profile", help="Time every screen, loader and storage call and write the results on exit"
+    ),
+    profile_out: str = typer.Option(
+        "iron_ring_profile", "--profile-out", help="Where --profile writes PATH.json and PATH.prom"
+    ),
+    mirror: int = typer.Option(
+        None, "--mirror", metavar="PORT", help="Also show the terminal on a web page at http://127.0.0.1:PORT/"
+    ),
+):
+    """Iron Ring Space Station Terminal - Retro DOS Style CLI"""
+    if pacing_profile:
+        pacing.set_profile(pacing_profile)
+    if profile:
+        start_profiling(os.path.join(LAUNCH_DIR, profile_out))
+    if ctx.invoked_subcommand is not None:
+        return
+    if mirror is not None:
+        run_mirrored(mirror)
+    else:
+        run_terminal()
+
+
+def start_profiling(prefix):
+    """Instrument the screens, loaders and storage and dump the registry at exit"""
+    terminal = sys.modules['main']
+    profiler.enable()
+    profiler.instrument(terminal, 'screen', terminal.PROFILED_SCREENS)
+    profiler.instrument(terminal, 'loader', terminal.PROFILED_LOADERS)
+    profiler.instrument(storage, 'storage', [name for name, value in vars(Storage).items()
+                                             if callable(value) and not name.startswith('_')])
+
+    def dump():
+        paths = profiler.dump(prefix)
+        typer.echo(f"Profile written to {paths[0]} and {paths[1]}", err=True)
+    atexit.register(dump)
+
+
+def run_mirrored(port):
+    """Run the terminal with its screen also served as a web page on this machine"""
+    from session import Session
+    from snapshot import MirrorConsole, MirrorServer
+
+    mirror_console = MirrorConsole()
+    try:
+        server = MirrorServer(mirror_console.screen, port=port, width=mirror_console.width).start()
+    except OSError as e:
+        console.print(f"[red]ERROR: Could not serve the mirror on port {port}: {e}[/red]")
+        raise typer.Exit(1)
+    typer.echo(f"Mirroring the terminal at {server.url}", err=True)
+    run_terminal(Session(mirror_console))
+
+
+@app.command("rebuild-index")
+def rebuild_index():
+    """Rebuild the inventory, news and search indexes after editing the files by hand"""
+    for index, label in ((inventory, "inventory rows"), (news, "news articles"),
+                         (maintenance_notes, "maintenance notes")):
+        try:
+            count = index.rebuild()
+        except FileNotFoundError:
+            console.print(f"[red]ERROR: {index.data_path} not found![/red]")
+            raise typer.Exit(1)
+        console.print(f"[green]Indexed {count} {label}.[/green]")
+    count = storage.search_index.rebuild()
+    console.print(f"[green]Indexed {count} archive entries for search.[/green]")
+
+
+@app.command("compact")
+def compact():
+    """Merge duplicate inventory rows and reclaim the space of deleted ones"""
+    try:
+        merged = storage.compact_inventory()
+    except FileNotFoundError as e:
+        console.print(f"[red]ERROR: {e.filename} not found![/red]")
+        raise typer.Exit(1)
+    console.print(f"[green]Merged {merged} duplicate inventory rows.[/green]")
+
+
+@app.command("batch")
+def batch(
+    path: str = typer.Argument(..., help="CSV or JSONL file of transfers, purchases, rewards and fines"),
+    fmt: str = typer.Option(None, "--format", help="csv or jsonl (default: from the file extension)"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Check every row but write nothing"),
+    failures_path: str = typer.Option(None, "--failures", help="Write every failed row and its reason to this file"),
+):
+    """Apply a file of holo transactions in one pass, reporting the rows that fail"""
+    if fmt is not None and fmt not in ('csv', 'jsonl'):
+        console.print("[red]ERROR: --format must be csv or jsonl![/red]")
+        raise typer.Exit(1)
+    try:
+        rows = list(read_rows(os.path.join(LAUNCH_DIR, path), fmt))
+    except FileNotFoundError:
+        console.print(f"[red]ERROR: {path} not found![/red]")
+        raise typer.Exit(1)
+    except (ValueError, UnicodeDecodeError) as e:
+        console.print(f"[red]ERROR: {e}[/red]")
+        raise typer.Exit(1)
+    try:
+        result = storage.apply_batch(rows, dry_run=dry_run)
+    except FileNotFoundError as e:
+        console.print(f"[red]ERROR: {e.filename} not found![/red]")
+        raise typer.Exit(1)
+
+    for number, message in result.failed[:BATCH_FAILURES_SHOWN]:
+        console.print(f"[red]Line {number}: {escape(message)}[/red]")
+    if len(result.failed) > BATCH_FAILURES_SHOWN:
+        console.print(f"[red]... and {len(result.failed) - BATCH_FAILURES_SHOWN} more[/red]")
+    if failures_path and result.failed:
+        with open(os.path.join(LAUNCH_DIR, failures_path), 'w') as f:
+            f.writelines(f"Line {number}: {message}\n" for number, message in result.failed)
+        console.print(f"[yellow]Failed rows written to {failures_path}.[/yellow]")
+    if not dry_run:
+        audit.emit('batch', None, path=path, applied=result.applied, failed=len(result.failed))
+    verb = "Would apply" if dry_run else "Applied"
+    console.print(f"\n[bold bright_green]{verb} {result.applied} of {len(result.results)} rows "
+                  f"({len(result.deliveries)} deliveries).[/bold bright_green]")
+    if result.failed:
+        console.print(f"[yellow]{len(result.failed)} rows skipped.[/yellow]")
+        raise typer.Exit(2)
+
+
+def emit(payload, code=0):
+    """Print payload as one line of JSON and exit with code"""
+    typer.echo(json.dumps(payload))
+    if code:
+        raise typer.Exit(code)
+
+
+def fail(message, code=1):
+    """Print an error as JSON and exit with code"""
+    emit({'error': message}, code)
+
+
+def require_user(username):
+    """Fail unless username has a terminal account"""
+    try:
+        if storage.get_user(username) is None:
+            fail(f"no such user: {username}")
+    except FileNotFoundError as e:
+        fail(f"{e.filename} not found")
+
+
+def require_text(name, value, forbidden='|'):
+    """Fail if a value written into a data file is empty or would break its line format"""
+    if not value.strip() or any(c in value for c in forbidden + '\r\n'):
+        fail(f"{name} must be non-empty, on one line and free of {forbidden!r}" if forbidden
+             else f"{name} must be non-empty and on one line")
+
+
+@app.command("balance")
+def balance(username: str = typer.Argument(..., help="Account to look up")):
+    """Print a user's holo balance"""
+    try:
+        holos = storage.balance(username)
+    except FileNotFoundError as e:
+        fail(f"{e.filename} not found")
+    if holos is None:
+        fail(f"no account for {username}")
+    emit({'user': username, 'balance': holos})
+
+
+@app.command("transfer")
+def transfer(
+    sender: str = typer.Argument(..., help="Account to take holos from"),
+    recipient: str = typer.Argument(..., help="Account to give them to"),
+    amount: int = typer.Argument(..., help="Holos to move"),
+    memo: str = typer.Option("", help="Note recorded with the transfer"),
+    key: str = typer.Option(None, help="Idempotency key: repeating a transfer with the same key applies it once"),
+):
+    """Move holos between two accounts"""
+    try:
+        for username in (sender, recipient):
+            if storage.balance(username) is None:
+                fail(f"no account for {username}")
+    except FileNotFoundError as e:
+        fail(f"{e.filename} not found")
+    if amount <= 0:
+        fail("amount must be positive")
+    if key is not None:
+        require_text('key', key)
+    try:
+        receipt = storage.transfer(sender, recipient, amount, memo, key=key)
+    except Refused as e:
+        fail(str(e), 2)
+    except FileNotFoundError as e:
+        fail(f"{e.filename} not found")
+    if not receipt.replayed:
+        audit.emit('transfer', sender, recipient=recipient, amount=amount, via='cli')
+    emit({'user': sender, 'recipient': recipient, 'amount': amount, 'memo': receipt.memo,
+          'replayed': receipt.replayed, 'balance': storage.balance(sender)})
+
+
+@app.command("audit")
+def audit_events(
+    username: str = typer.Argument(..., help="Whose events to show"),
+    limit: int = typer.Option(20, help="How many events, newest first"),
+):
+    """Print a user's latest logins, orders and transfers from the audit log"""
+    if limit <= 0:
+        fail("limit must be positive")
+    emit({'user': username, 'events': audit.recent(username, limit)})
+
+
+@inventory_app.command("list")
+def inventory_list(username: str = typer.Argument(..., help="Whose inventory to list")):
+    """Print a user's inventory items"""
+    require_user(username)
+    items = storage.inventory_items(username)
+    emit({'user': username, 'items': [{'item': item, 'description': description, 'quantity': quantity}
+                                      for item, description, quantity in items]})
+
+
+@inventory_app.command("add")
+def inventory_add(
+    username: str = typer.Argument(..., help="Who gets the item"),
+    item_name: str = typer.Argument(..., help="Item name"),
+    description: str = typer.Option(None, help="Item description (default: the item name)"),
+    quantity: int = typer.Option(1, help="How many"),
+):
+    """Add an item to a user's inventory"""
+    require_user(username)
+    description = item_name if description is None else description
+    require_text("item", item_name)
+    require_text("description", description)
+    if quantity <= 0:
+        fail("quantity must be positive")
+    storage.add_inventory_item(username, item_name, description, quantity)
+    emit({'user': username, 'item': item_name, 'description': description, 'quantity': quantity})
+
+
+@inventory_app.command("delete")
+def inventory_delete(
+    username: str = typer.Argument(..., help="Whose inventory to delete from"),
+    item_name: str = typer.Argument(..., help="Item name; every row with this name is removed"),
+):
+    """Delete an item from a user's inventory"""
+    require_user(username)
+    removed = storage.delete_inventory_item(username, item_name)
+    if not removed:
+        fail(f"{username} has no {item_name}")
+    emit({'user': username, 'item': item_name, 'removed': removed})
+
+
+@news_app.command("post")
+def news_post(
+    title: str = typer.Argument(..., help="Headline"),
+    body: str = typer.Argument(..., help="Article text"),
+):
+    """Publish a station news article"""
+    require_text("title", title)
+    require_text("body", body, forbidden='')
+    try:
+        storage.post_news(title, body)
+    except FileNotFoundError as e:
+        fail(f"{e.filename} not found")
+    emit({'title': title, 'body': body, 'articles': storage.news_count()})
+
+
+@menu_app.command("price")
+def menu_price(item_name: str = typer.Argument(..., help="Food menu item (any case)")):
+    """Print the price of a food menu item"""
+    try:
+        food_items = storage.food_menu()
+    except FileNotFoundError as e:
+        fail(f"{e.filename} not found")
+    for item, price in food_items:
+        if item.lower() == item_name.lower():
+            return emit({'item': item, 'price': price})
+    fail(f"{item_name} is not on the food menu")
+
+
+@menu_app.command("list")
+def menu_list():
+    """Print the whole food menu"""
+    try:
+        food_items = storage.food_menu()
+    except FileNotFoundError as e:
+        fail(f"{e.filename} not found")
+    emit({'items': [{'item': item, 'price': price} for item, price in food_items]})
+
+
+@app.command("import-db")
+def import_db(
+    db_path: str = typer.Option("iron_ring.db", "--db", help="SQLite database to create or replace"),
+):
+    """Bulk load the .txt data files into a SQLite database (balances from user_holos.bin with IRON_RING_BALANCES=mmap)"""
+    try:
+        counts = import_flat_files(db_path)
+    except FileNotFoundError as e:
+        console.print(f"[red]ERROR: {e.filename} not found![/red]")
+        raise typer.Exit(1)
+    for table, count in counts.items():
+        console.print(f"[green]{table}: {count} rows[/green]")
+    console.print(f"\n[bold bright_green]Imported into {db_path}. Run with IRON_RING_STORAGE=sqlite to use it.[/bold bright_green]")
+
+
+@app.command("import-holos")
+def import_holos():
+    """Rebuild user_holos.bin from user_holos.txt after editing balances by hand"""
+    try:
+        count = MmapHoloLedger().import_text()
+    except FileNotFoundError as e:
+        console.print(f"[red]ERROR: {e.filename} not found![/red]")
+        raise typer.Exit(1)
+    except ValueError as e:
+        console.print(f"[red]ERROR: {e}[/red]")
+        raise typer.Exit(1)
+    console.print(f"[green]Imported {count} balances into user_holos.bin.[/green]")
+
+
+@app.command("export-holos")
+def export_holos():
+    """Write the balances in user_holos.bin out to user_holos.txt"""
+    try:
+        count = MmapHoloLedger().export_text()
+    except FileNotFoundError as e:
+        console.print(f"[red]ERROR: {e.filename} not found![/red]")
+        raise typer.Exit(1)
+    except ValueError as e:
+        console.print(f"[red]ERROR: {e}[/red]")
+        raise typer.Exit(1)
+    console.print(f"[green]Exported {count} balances to user_holos.txt.[/green]")
+
+
+@app.command("generate")
+def generate(
+    out_dir: str = typer.Argument(..., help="Directory to write the dataset into"),
+    users: int = typer.Option(1000, help="Number of users"),
+    items: int = typer.Option(10000, help="Number of inventory rows"),
+    news: int = typer.Option(500, help="Number of news articles"),
+    food: int = typer.Option(30, help="Number of food menu items"),
+    hatches: int = typer.Option(200, help="Number of maintenance notes"),
+    skew: float = typer.Option(1.0, help="How unevenly items are spread over users (0 = evenly)"),
+    seed: int = typer.Option(0, help="Random seed; the same seed writes the same files"),
+    force: bool = typer.Option(False, "--force", help="Overwrite data files already in the directory"),
+):
+    """Write a synthetic campaign dataset for load testing"""
+    out_dir = os.path.join(LAUNCH_DIR, out_dir)
+    if not force and os.path.exists(os.path.join(out_dir, 'users.txt')):
+        console.print(f"[red]ERROR: {out_dir} already holds station data! Use --force to overwrite it.[/red]")
+        raise typer.Exit(1)
+    try:
+        datagen.generate(
+            out_dir, users=users, items=items, news=news, food=food, hatches=hatches,
+            skew=skew, seed=seed, report=lambda name, rows: console.print(f"[green]{name}: {rows} rows[/green]"),
+        )
+    except ValueError as e:
+        console.print(f"[red]ERROR: {e}[/red]")
+        raise typer.Exit(1)
+    console.print(f"\n[bold bright_green]Dataset written to {out_dir}.[/bold bright_green]")
+
+
+@app.command("serve")
+def serve(
+    host: str = typer.Option("127.0.0.1", help="Address to listen on"),
+    port: int = typer.Option(2323, help="TCP port to listen on"),
+    max_sessions: int = typer.Option(32, help="Most players connected at once"),
+    raw: bool = typer.Option(False, "--raw", help="Plain TCP without telnet negotiation (for netcat)"),
+):
+    """Host many terminal sessions from this process over TCP/telnet"""
+    from server import TerminalServer
+
+    storage.preload()
+    TerminalServer(
+        run_terminal, host=host, port=port, max_sessions=max_sessions,
+        pacing_profile=pacing.profile, telnet=not raw, log=console.log,
+    ).run()
@@ -0,0 +1,182 @@
+"""Synthetic campaign datasets for load testing
+
+generate() writes users.txt, permissions.txt, user_holos.txt,
+user_inventory.txt, news.txt, food_menu.txt and maintenance_notes.txt in
+the formats the terminal reads. Each file is streamed line by line
+through a large write buffer, so a 10M-row inventory never sits in
+memory.
+
+Output is deterministic for a given seed. Each file draws from its own
+generator seeded with (seed, file name), so changing the row count of one
+file leaves the others identical. Usernames are derived from the user's
+number, which lets inventory rows and balances refer to any user without
+keeping a list of them.
+
+Item ownership follows a power law controlled by `skew`. At 0 every user
+owns about the same number of rows. At 3, the top 1% of users own about a
+third of all rows.
+"""
+import os
+import random
+
+BUFFER_SIZE = 1 << 20
+
+ROLE_PERMISSIONS = [
+    ('ADMIN', '1,2,3,4,5,6,7', 1),
+    ('COMMAND', '1,2,3,4,5,6,7', 2),
+    ('ENGINEERING', '1,2,3,4,5,6,7', 10),
+    ('SECURITY', '1,2,3,4,5,7', 8),
+    ('MEDICAL', '1,2,3,4,5,7', 8),
+    ('SCIENCE', '1,2,3,4,5,7', 8),
+    ('CARGO', '1,2,3,4,5,7', 12),
+    ('USER', '1,2,3,4,5,7', 51),
+]
+
+CALLSIGNS = [
+    'vex', 'kora', 'daln', 'ryze', 'mira', 'tovo', 'sael', 'brin', 'juno', 'kade',
+    'orin', 'pell', 'quin', 'rook', 'sable', 'tarn', 'ulla', 'vane', 'wren', 'yara',
+]
+ITEM_KINDS = [
+    ('Plasma Cutter', 'Industrial cutting tool'),
+    ('Medkit', 'Restores 2d4 hit points'),
+    ('Data Slate', 'Encrypted personal data pad'),
+    ('Oxygen Canister', 'Thirty minutes of breathable air'),
+    ('Mag Boots', 'Magnetic boots for zero-g hull work'),
+    ('Stun Baton', 'Non-lethal security baton'),
+    ('Ration Pack', 'Standard issue nutrient pack'),
+    ('Repair Drone', 'Small drone for hull patching'),
+    ('Holo Projector', 'Portable holographic display'),
+    ('Scanner', 'Handheld multi-spectrum scanner'),
+    ('Grav Grenade', 'Creates a local gravity well'),
+    ('Access Card', 'Opens restricted station doors'),
+]
+ITEM_GRADES = ['Worn', 'Standard', 'Military', 'Prototype', 'Salvaged', 'Ancient']
+NEWS_DESKS = ['BREAKING', 'MAINTENANCE ALERT', 'CREW ANNOUNCEMENT', 'CARGO UPDATE', 'SECURITY NOTICE', 'SCIENCE REPORT']
+NEWS_SUBJECTS = ['Quantum Drive', 'Life Support', 'Docking Ring', 'Hydroponics Bay', 'Reactor Core', 'Shuttle Bay', 'Medical Deck']
+NEWS_EVENTS = ['inspection completed', 'upgrade scheduled', 'fault reported', 'drill announced', 'shipment arrived', 'crew reassigned']
+FOODS = ['Protein Steak', 'Vegetables', 'Coffee', 'Nutrient Bars', 'Hydration Packets', 'Ice Cream', 'Rations', 'Preserves', 'Bread', 'Energy Drink']
+FOOD_STYLES = ['Synthetic', 'Fresh', 'Space', 'Deluxe', 'Frozen', 'Hydroponic']
+HATCH_TASKS = ['Filter Replacement', 'Conduit Inspection', 'Seal Test', 'Pressure Check', 'Coolant Flush', 'Sensor Calibration']
+PRIORITIES = ['HIGH', 'MEDIUM', 'LOW']
+
+
+def username(n):
+    """Username of generated user n"""
+    return f"{CALLSIGNS[n % len(CALLSIGNS)]}{n}"
+
+
+def _rng(seed, name):
+    """Independent generator for one file, so row counts of other files do not shift it"""
+    return random.Random(f"{seed}:{name}")
+
+
+def _write(path, lines):
+    """Stream lines into path through a temp file, returning the line count"""
+    count = 0
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', buffering=BUFFER_SIZE) as f:
+        for line in lines:
+            f.write(line)
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def user_lines(users, seed):
+    """users.txt lines; user 0 is always an ADMIN"""
+    rng = _rng(seed, 'users')
+    roles = [role for role, _, _ in ROLE_PERMISSIONS]
+    weights = [weight for _, _, weight in ROLE_PERMISSIONS]
+    for n in range(users):
+        password = ''.join(rng.choices('abcdefghjkmnpqrstuvwxyz23456789', k=8))
+        role = 'ADMIN' if n == 0 else rng.choices(roles, weights)[0]
+        yield f"{username(n)}:{password}:{role}\n"
+
+
+def permission_lines():
+    """permissions.txt lines for every generated role"""
+    for role, permissions, _ in ROLE_PERMISSIONS:
+        yield f"{role}:{permissions}\n"
+
+
+def holo_lines(users, seed):
+    """user_holos.txt lines with log-normally distributed balances"""
+    rng = _rng(seed, 'holos')
+    for n in range(users):
+        yield f"{username(n)}:{int(rng.lognormvariate(7, 0.8))}\n"
+
+
+def inventory_lines(users, items, skew, seed):
+    """user_inventory.txt lines, owners drawn from a power law so low-numbered users own the most"""
+    rng = _rng(seed, 'inventory')
+    exponent = 1 + skew
+    for _ in range(items):
+        owner = min(users - 1, int(users * rng.random() ** exponent))
+        kind, description = rng.choice(ITEM_KINDS)
+        quantity = 1 + int(rng.expovariate(0.7))
+        yield f"{username(owner)}:{rng.choice(ITEM_GRADES)} {kind}|{description}|{quantity}\n"
+
+
+def news_lines(news, seed):
+    """news.txt lines"""
+    rng = _rng(seed, 'news')
+    for n in range(news):
+        subject = rng.choice(NEWS_SUBJECTS)
+        event = rng.choice(NEWS_EVENTS)
+        yield (f"{rng.choice(NEWS_DESKS)}: {subject} {event.title()}|"
+               f"Bulletin {n + 1}: {subject} {event} on deck {rng.randint(1, 40)}. "
+               f"Crew should follow posted instructions and report anything unusual to the duty officer.\n")
+
+
+def food_lines(food, seed):
+    """food_menu.txt lines with unique item names"""
+    rng = _rng(seed, 'food')
+    for n in range(food):
+        name = f"{FOOD_STYLES[n % len(FOOD_STYLES)]} {FOODS[n // len(FOOD_STYLES) % len(FOODS)]}"
+        if n >= len(FOOD_STYLES) * len(FOODS):
+            name += f" {n // (len(FOOD_STYLES) * len(FOODS)) + 1}"
+        yield f"{name}|{rng.randint(5, 60)}\n"
+
+
+def maintenance_lines(hatches, seed):
+    """maintenance_notes.txt lines for HATCH-001 onwards"""
+    rng = _rng(seed, 'maintenance')
+    for n in range(1, hatches + 1):
+        task = rng.choice(HATCH_TASKS)
+        yield (f"HATCH-{n:03d}: {task}|{task} due in Hatch-{n:03d}. "
+               f"Last maintenance: {rng.randint(1, 90)} days ago. Priority: {rng.choice(PRIORITIES)}\n")
+
+
+def generate(out_dir, users=1000, items=10000, news=500, food=30, hatches=200, skew=1.0, seed=0, report=None):
+    """Write a full dataset into out_dir, returning {file name: rows written}
+
+    report, if given, is called with (file name, rows) as each file finishes.
+    """
+    if users < 1:
+        raise ValueError('need at least one user')
+    if skew < 0:
+        raise ValueError('skew must be 0 or more')
+    os.makedirs(out_dir, exist_ok=True)
+    files = [
+        ('users.txt', user_lines(users, seed)),
+        ('permissions.txt', permission_lines()),
+        ('user_holos.txt', holo_lines(users, seed)),
+        ('user_inventory.txt', inventory_lines(users, items, skew, seed)),
+        ('news.txt', news_lines(news, seed)),
+        ('food_menu.txt', food_lines(food, seed)),
+        ('maintenance_notes.txt', maintenance_lines(hatches, seed)),
+    ]
+    counts = {}
+    for name, lines in files:
+        counts[name] = _write(os.path.join(out_dir, name), lines)
+        if report is not None:
+            report(name, counts[name])
+    # Sidecars describe the files just replaced
+    for name in ('user_holos.ledger', 'user_holos.ledger.old', 'user_holos.bin', 'user_holos.notes',
+                 'deliveries.journal',
+                 'user_inventory.idx', 'news.idx', 'maintenance_notes.idx', 'search.idx'):
+        try:
+            os.remove(os.path.join(out_dir, name))
+        except FileNotFoundError:
+            pass
+    return counts
@@ -0,0 +1,61 @@
+"""Maintenance notes indexed by hatch ID and by priority
+
+Notes are headed `HATCH-XXX: Title` and end with `Priority: HIGH`,
+`MEDIUM` or `LOW`. HatchRegistry hashes every note under its hatch ID,
+so opening a hatch finds its notes without scanning the file, and keeps a
+secondary index from priority to notes for the filtered notes view. The
+station store builds one registry per version of maintenance_notes.txt.
+"""
+import re
+
+PRIORITIES = ('HIGH', 'MEDIUM', 'LOW')
+PRIORITY_STYLES = {'HIGH': 'bold red', 'MEDIUM': 'yellow', 'LOW': 'green'}
+
+PRIORITY = re.compile(r'Priority:\s*([A-Za-z]+)')
+HATCH_NUMBER = re.compile(r'^(?:HATCH[-\s]*)?0*(\d+)$')
+
+
+def hatch_id(hatch):
+    """Return the `HATCH-XXX` ID from a maintenance note heading like `HATCH-001: Title`"""
+    return hatch.split(':', 1)[0].strip().upper()
+
+
+def normalize_hatch(text):
+    """Turn what a player typed (`7`, `007`, `hatch-7`) into a hatch ID, or None"""
+    text = text.strip().upper()
+    match = HATCH_NUMBER.match(text)
+    if match:
+        return f"HATCH-{int(match.group(1)):03d}"
+    if text.startswith('HATCH-') and len(text) > len('HATCH-'):
+        return text
+    return None
+
+
+def note_priority(note):
+    """Return HIGH, MEDIUM or LOW from a note's `Priority:` tag, or None"""
+    match = PRIORITY.search(note)
+    if match and match.group(1).upper() in PRIORITIES:
+        return match.group(1).upper()
+    return None
+
+
+class HatchRegistry:
+    """Every maintenance note, by file order, by hatch ID and by priority"""
+
+    def __init__(self, notes):
+        self.notes = notes
+        self.by_hatch = {}
+        self.by_priority = {priority: [] for priority in PRIORITIES}
+        for hatch, note in notes:
+            self.by_hatch.setdefault(hatch_id(hatch), []).append((hatch, note))
+            priority = note_priority(note)
+            if priority is not None:
+                self.by_priority[priority].append((hatch, note))
+
+    def hatch(self, hatch):
+        """Return [(hatch, note)] filed under a hatch ID"""
+        return self.by_hatch.get(hatch.upper(), [])
+
+    def with_priority(self, priority):
+        """Return [(hatch, note)] tagged with priority"""
+        return self.by_priority.get(priority.upper(), [])
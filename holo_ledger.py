@@ -0,0 +1,278 @@
+"""Append-only ledger of holo debits and credits on top of user_holos.txt
+
+user_holos.txt is the checkpoint: a full set of balances, headed by a
+`#ledger-seq N` line naming the last ledger record already folded into it.
+Every debit or credit is appended to user_holos.ledger as one record, and
+balances are the checkpoint plus every ledger record with a higher seq.
+Once the ledger holds `compact_every` records it is rolled into a new
+checkpoint and moved aside to user_holos.ledger.old, which is kept so the
+bank can still show recent transactions.
+
+A post can carry notes: `#` lines written in the same append as its
+records, so a crash keeps both or neither. Balances skip them. When the
+ledger is moved aside the notes of the archive it replaces are copied to
+user_holos.notes, which keeps the newest NOTES_KEPT.
+
+Every read takes the checkpoint's FileLock shared and every append or
+compaction takes it exclusive, so terminals sharing the files never lose
+each other's records. Appends are fsynced through a GroupCommit. Session
+threads reading at the same time share one fold of the ledger.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from station_store import store, parse_user_holos
+from station_lock import GroupCommit, lock_for
+
+LedgerRecord = namedtuple('LedgerRecord', 'seq timestamp username delta memo')
+
+SEQ_HEADER = '#ledger-seq '
+DEFAULT_COMPACT_EVERY = 500
+NOTES_KEPT = 10000
+NO_RECORDS = ()  # one shared value for a missing ledger, so the fold cache still matches
+
+
+def parse_ledger(f):
+    """Parse ledger lines `seq|timestamp|username|delta|memo` into LedgerRecords"""
+    records = []
+    for line in f:
+        if not line.endswith('\n'):
+            break  # torn final write, never acknowledged to the player
+        if line.startswith('#'):
+            continue  # a note
+        parts = line.rstrip('\r\n').split('|', 4)
+        if len(parts) != 5:
+            continue
+        try:
+            records.append(LedgerRecord(int(parts[0]), parts[1], parts[2], int(parts[3]), parts[4]))
+        except ValueError:
+            continue
+    return records
+
+
+def format_record(record):
+    """Format a LedgerRecord as one ledger line"""
+    memo = record.memo.replace('\n', ' ')
+    return f"{record.seq}|{record.timestamp}|{record.username}|{record.delta}|{memo}\n"
+
+
+def read_notes(path):
+    """Return the notes in a ledger or notes file, oldest first and without their `#`"""
+    try:
+        with open(path, 'r') as f:
+            return [line[1:].rstrip('\r\n') for line in f if line.startswith('#') and line.endswith('\n')]
+    except FileNotFoundError:
+        return []
+
+
+class HoloLedger:
+    """Folds holo balances from a checkpoint file plus an append-only ledger tail"""
+
+    def __init__(self, checkpoint_path='user_holos.txt', ledger_path='user_holos.ledger', compact_every=None):
+        if compact_every is None:
+            compact_every = int(os.environ.get('IRON_RING_LEDGER_COMPACT_EVERY', DEFAULT_COMPACT_EVERY))
+        self.checkpoint_path = checkpoint_path
+        self.ledger_path = ledger_path
+        self.archive_path = ledger_path + '.old'
+        self.notes_path = os.path.splitext(ledger_path)[0] + '.notes'
+        self.compact_every = max(1, compact_every)
+        self._folded = None
+        self._fold_lock = threading.Lock()
+        self.lock = lock_for(checkpoint_path)
+        self.committer = GroupCommit(ledger_path)
+        store.parsers.setdefault(checkpoint_path, parse_user_holos)
+        store.parsers.setdefault(ledger_path, parse_ledger)
+        store.parsers.setdefault(self.archive_path, parse_ledger)
+
+    def _records(self, path=None):
+        try:
+            return store.get(path or self.ledger_path)
+        except FileNotFoundError:
+            return NO_RECORDS
+
+    def _checkpoint_seq(self):
+        with open(self.checkpoint_path, 'r') as f:
+            first = f.readline().strip()
+        if first.startswith(SEQ_HEADER):
+            try:
+                return int(first[len(SEQ_HEADER):])
+            except ValueError:
+                pass
+        return 0
+
+    def balances(self):
+        """Return {username: balance} folded from the checkpoint and the ledger tail"""
+        with self.lock.shared():
+            return self._balances()
+
+    def _balances(self):
+        holos = store.get(self.checkpoint_path)
+        records = self._records()
+
+        folded = self._folded
+        if folded is not None and folded[0] is holos and folded[1] is records and folded[2] == len(records):
+            return folded[4]
+
+        with self._fold_lock:
+            folded = self._folded
+            if folded is not None and folded[0] is holos and folded[1] is records and folded[2] == len(records):
+                return folded[4]
+            seq = self._checkpoint_seq()
+            balances = dict(holos)
+            for record in records:
+                if record.seq > seq:
+                    balances[record.username] = balances.get(record.username, 0) + record.delta
+            self._folded = (holos, records, len(records), seq, balances)
+            return balances
+
+    def balance(self, username):
+        """Return username's balance, or None if they have no account"""
+        return self.balances().get(username)
+
+    def last_seq(self):
+        """Return the highest seq folded into the current balances"""
+        self.balances()
+        return self._last_seq()
+
+    def _last_seq(self):
+        records = self._folded[1]
+        return max(self._folded[3], records[-1].seq if records else 0)
+
+    def post(self, entries, memo='', notes=()):
+        """Append one record per (username, delta) in entries and fold them in
+
+        All records for one call go out in a single write, so a transfer's
+        debit and credit land together, and the call returns once that
+        write has been fsynced. notes are written after the records in the
+        same write.
+        """
+        return self.post_many([(entries, memo)], notes)
+
+    def post_many(self, transactions, notes=()):
+        """Post several (entries, memo) transactions in one write and one fsync"""
+        with self.lock.exclusive():
+            balances = self._append(transactions, notes)
+            ticket = self.committer.written()
+            if self._pending() >= self.compact_every:
+                self.compact()
+        self.committer.wait(ticket)
+        return balances
+
+    def _pending(self):
+        """How many records the ledger tail holds"""
+        return len(self._folded[1])
+
+    def _append(self, transactions, notes=()):
+        balances = self._balances()
+        new_records = self._write_records(transactions, self._last_seq(), notes)
+
+        records = self._folded[1]
+        if records is NO_RECORDS:
+            records = []
+        records.extend(new_records)
+        store.put(self.ledger_path, records)
+        if any(record.username not in balances for record in new_records):
+            balances = dict(balances)  # readers on other threads may be iterating the old one
+        for record in new_records:
+            balances[record.username] = balances.get(record.username, 0) + record.delta
+        self._folded = (self._folded[0], records, len(records), self._folded[3], balances)
+        return balances
+
+    def _write_records(self, transactions, seq, notes=()):
+        """Append a record per entry, numbered on from seq, and the notes in one write; return the records"""
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        new_records = []
+        for entries, memo in transactions:
+            for username, delta in entries:
+                seq += 1
+                new_records.append(LedgerRecord(seq, timestamp, username, delta, memo))
+
+        payload = ''.join([*(format_record(r) for r in new_records),
+                           *(f"#{note.replace(chr(10), ' ')}\n" for note in notes)]).encode('utf-8')
+        fd = os.open(self.ledger_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and not self._ends_with_newline(size):
+                payload = b'\n' + payload
+            os.write(fd, payload)
+        finally:
+            os.close(fd)
+        return new_records
+
+    def _ends_with_newline(self, size):
+        with open(self.ledger_path, 'rb') as f:
+            f.seek(size - 1)
+            return f.read(1) == b'\n'
+
+    def checkpoint(self, balances):
+        """Write balances as the new checkpoint and retire the ledger tail"""
+        with self.lock.exclusive():
+            self._checkpoint(balances)
+
+    def _checkpoint(self, balances):
+        self._balances()
+        seq = self._last_seq()
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f"{SEQ_HEADER}{seq}\n")
+            for username, credit_amount in balances.items():
+                f.write(f"{username}:{credit_amount}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+        # Records at or below seq are now in the checkpoint, so a crash before
+        # this rename only leaves records that balances() already skips.
+        self._retire_ledger()
+        store.put(self.checkpoint_path, {u: b for u, b in balances.items()})
+        self._folded = None
+
+    def _retire_ledger(self):
+        """Move the ledger tail aside to the archive, where recent() still finds it"""
+        if os.path.exists(self.ledger_path):
+            self._keep_notes()
+            os.replace(self.ledger_path, self.archive_path)
+            store.invalidate(self.archive_path)
+        store.invalidate(self.ledger_path)
+
+    def _keep_notes(self):
+        """Copy the notes of the archive about to be replaced to the notes file"""
+        notes = read_notes(self.archive_path)
+        if not notes:
+            return
+        kept = (read_notes(self.notes_path) + notes)[-NOTES_KEPT:]
+        tmp_path = self.notes_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.writelines(f"#{note}\n" for note in kept)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.notes_path)
+
+    def notes(self):
+        """Return every note kept, archived or in the ledger tail, oldest first"""
+        with self.lock.shared():
+            return [note for path in (self.notes_path, self.archive_path, self.ledger_path)
+                    for note in read_notes(path)]
+
+    def compact(self):
+        """Roll the ledger tail into a new checkpoint"""
+        with self.lock.exclusive():
+            self._checkpoint(dict(self._balances()))
+
+    def recent(self, username, limit=5):
+        """Return the user's most recent ledger records, newest first"""
+        found = []
+        for path in (self.ledger_path, self.archive_path):
+            with self.lock.shared():
+                records = self._records(path)
+            for record in reversed(records):
+                if record.username == username:
+                    found.append(record)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+
+ledger = HoloLedger()
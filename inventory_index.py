@@ -0,0 +1,365 @@
+"""Per-user byte-offset index over user_inventory.txt
+
+The sidecar user_inventory.idx is an append-only log:
+
+    #inventory-index 1
+    username:offset:length      a record at offset in user_inventory.txt
+    -username:offset            that record was deleted (tombstoned)
+
+Deleting a row blanks its bytes in place, which every reader of the text
+file already skips, so no rewrite is needed. Once tombstones make up
+`compact_ratio` of the file a background thread rewrites it without them.
+Rows appended by other tools are picked up by scanning only the new bytes;
+a file edited by hand in the middle needs rebuild().
+
+Every purchase appends a row, so a user who buys the same thing ten times
+has ten rows. Users appended to are marked dirty, and a background pass
+merges each dirty user's rows that share an item name into one, summing
+their quantities (rows whose quantity isn't a whole number are left
+alone). The merged row overwrites the first of them when it fits, padded
+with spaces, and is appended otherwise; only then are the others blanked,
+so a crash part way through can count a row twice but never loses one.
+compact() merges every user's rows and then rewrites the file.
+
+Reads hold the data file's FileLock shared; appends, deletes and
+compaction hold it exclusive. Appends are fsynced through a GroupCommit.
+Within a process the in-memory offsets are guarded by a second lock,
+always taken after the FileLock. Readers hold it only while catching up
+with the file, so session threads read their rows in parallel.
+"""
+import os
+import threading
+
+from station_lock import GroupCommit, lock_for
+
+INDEX_HEADER = '#inventory-index 1\n'
+CONSOLIDATE_CHUNK = 100  # dirty users merged per hold of the lock
+
+
+def parse_item(raw):
+    """Parse one raw inventory line into (username, (item, description, quantity)), or None"""
+    line = raw.decode('utf-8', errors='replace').strip()
+    if not line or ':' not in line:
+        return None
+    username, item_info = line.split(':', 1)
+    parts = item_info.split('|')
+    if len(parts) != 3:
+        return None
+    return username, tuple(parts)
+
+
+def format_rows(rows):
+    """Format (username, item, description, quantity) rows as the bytes append_many() writes"""
+    return ''.join(f"{username}:{item_name}|{description}|{quantity}\n"
+                   for username, item_name, description, quantity in rows).encode('utf-8')
+
+
+class InventoryIndex:
+    """Maps each username to the offsets of that user's rows in user_inventory.txt"""
+
+    def __init__(self, data_path='user_inventory.txt', index_path='user_inventory.idx', compact_ratio=0.25):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self.lock = lock_for(data_path)
+        self.committer = GroupCommit(data_path)
+        self._offsets = None
+        self._covered = 0
+        self._dead = 0
+        self._index_signature = None
+        self._compactor = None
+        self._dirty = set()
+        self._consolidator = None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reset(self):
+        self._offsets = {}
+        self._covered = 0
+        self._dead = 0
+
+    def _load_index(self):
+        self._reset()
+        try:
+            with open(self.index_path, 'r') as f:
+                if f.readline() != INDEX_HEADER:
+                    return False
+                for line in f:
+                    line = line.rstrip('\n')
+                    if line.startswith('-'):
+                        username, offset = line[1:].rsplit(':', 1)
+                        length = self._offsets.get(username, {}).pop(int(offset), 0)
+                        self._dead += length
+                    elif line:
+                        username, offset, length = line.rsplit(':', 2)
+                        offset, length = int(offset), int(length)
+                        self._offsets.setdefault(username, {})[offset] = length
+                        self._covered = max(self._covered, offset + length)
+        except (FileNotFoundError, ValueError):
+            return False
+        self._index_signature = self._signature(self.index_path)
+        return True
+
+    def _looks_current(self, data_size):
+        if data_size < self._covered:
+            return False
+        last = None
+        for username, rows in self._offsets.items():
+            for offset in rows:
+                if last is None or offset > last[1]:
+                    last = (username, offset)
+        if last is None:
+            return True
+        with open(self.data_path, 'rb') as f:
+            f.seek(last[1])
+            return f.read(len(last[0]) + 1) == last[0].encode('utf-8') + b':'
+
+    def _write_index(self, entries):
+        with open(self.index_path, 'a') as f:
+            f.writelines(entries)
+        self._index_signature = self._signature(self.index_path)
+
+    def _scan(self, start):
+        """Index complete lines from start to end of file, returning the index lines to append"""
+        entries = []
+        with open(self.data_path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # partial line, picked up once it is finished
+                length = len(raw)
+                parsed = parse_item(raw)
+                if parsed is None:
+                    self._dead += length
+                else:
+                    username = parsed[0]
+                    self._offsets.setdefault(username, {})[offset] = length
+                    entries.append(f"{username}:{offset}:{length}\n")
+                offset += length
+        self._covered = offset
+        return entries
+
+    def _ensure(self):
+        data_signature = self._signature(self.data_path)
+        if data_signature is None:
+            raise FileNotFoundError(self.data_path)
+
+        if self._offsets is None or self._signature(self.index_path) != self._index_signature:
+            if not self._load_index() or not self._looks_current(data_signature[1]):
+                self._rebuild()
+                return
+
+        if data_signature[1] > self._covered:
+            self._write_index(self._scan(self._covered))
+        elif data_signature[1] < self._covered:
+            self._rebuild()
+
+    def rebuild(self):
+        """Re-scan user_inventory.txt from scratch and rewrite the sidecar index"""
+        with self.lock.exclusive(), self._lock:
+            return self._rebuild()
+
+    def _rebuild(self):
+        self._reset()
+        entries = self._scan(0)
+        # Readers may rebuild under a shared lock, so each process needs its own temp file
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(INDEX_HEADER)
+            f.writelines(entries)
+        os.replace(tmp_path, self.index_path)
+        self._index_signature = self._signature(self.index_path)
+        return sum(len(rows) for rows in self._offsets.values())
+
+    def _read_rows(self, username, offsets=None):
+        rows = []
+        if offsets is None:
+            offsets = sorted(self._offsets.get(username, {}).items())
+        if not offsets:
+            return rows
+        with open(self.data_path, 'rb') as f:
+            for offset, length in offsets:
+                f.seek(offset)
+                parsed = parse_item(f.read(length))
+                if parsed is not None and parsed[0] == username:
+                    rows.append((offset, length, parsed[1]))
+        return rows
+
+    def items(self, username):
+        """Return [(item, description, quantity)] for username in file order"""
+        with self.lock.shared():
+            with self._lock:
+                self._ensure()
+                offsets = sorted(self._offsets.get(username, {}).items())
+            return [item for _, _, item in self._read_rows(username, offsets)]
+
+    def append(self, username, item_name, description, quantity):
+        """Append one row for username and index it"""
+        self.append_many([(username, item_name, description, quantity)])
+
+    def append_many(self, rows):
+        """Append (username, item, description, quantity) rows in one write and one fsync"""
+        with self.lock.exclusive(), self._lock:
+            self._ensure()
+            self._append(format_rows(rows))
+            ticket = self.committer.written()
+            self._dirty.update(row[0] for row in rows)
+            self._maybe_consolidate()
+        self.committer.wait(ticket)
+
+    def size(self):
+        """Return the size of user_inventory.txt, which is where the next append starts"""
+        try:
+            return os.path.getsize(self.data_path)
+        except FileNotFoundError:
+            return 0
+
+    def appended_at(self, offset, rows):
+        """Whether user_inventory.txt holds what append_many(rows) writes, starting at offset"""
+        payload = format_rows(rows)
+        try:
+            with open(self.data_path, 'rb') as f:
+                f.seek(offset)
+                found = f.read(len(payload) + 1)
+        except FileNotFoundError:
+            return False
+        return found.startswith(payload) or found.startswith(b'\n' + payload)
+
+    def _append(self, payload):
+        with open(self.data_path, 'ab') as f:
+            if f.tell() > self._covered and not self._ends_with_newline(f.tell()):
+                payload = b'\n' + payload
+            f.write(payload)
+        self._write_index(self._scan(self._covered))
+
+    def _ends_with_newline(self, size):
+        with open(self.data_path, 'rb') as f:
+            f.seek(size - 1)
+            return f.read(1) == b'\n'
+
+    def delete_item(self, username, item_name):
+        """Tombstone every row of username named item_name, returning how many were removed"""
+        with self.lock.exclusive(), self._lock:
+            self._ensure()
+            removed = []
+            with open(self.data_path, 'r+b') as f:
+                for offset, length, item in self._read_rows(username):
+                    if item[0] == item_name:
+                        removed.append(self._blank(f, username, offset))
+            if removed:
+                self._write_index(removed)
+                self._maybe_compact()
+            return len(removed)
+
+    def _blank(self, f, username, offset):
+        """Overwrite one row with spaces, returning its tombstone index line"""
+        length = self._offsets[username].pop(offset)
+        f.seek(offset)
+        body = f.read(length).rstrip(b'\r\n')
+        f.seek(offset)
+        f.write(b' ' * len(body))
+        self._dead += length
+        return f"-{username}:{offset}\n"
+
+    def _consolidate(self, username):
+        """Merge username's rows that share an item name, returning how many rows were folded away"""
+        groups = {}
+        for offset, length, (item_name, description, quantity) in self._read_rows(username):
+            if quantity.strip().isdigit():
+                groups.setdefault(item_name, []).append((offset, length, description, int(quantity)))
+        groups = {item_name: rows for item_name, rows in groups.items() if len(rows) > 1}
+        if not groups:
+            return 0
+
+        appended, blanked = [], []
+        with open(self.data_path, 'r+b') as f:
+            for item_name, rows in groups.items():
+                offset, length, description, _ = rows[0]
+                line = f"{username}:{item_name}|{description}|{sum(row[3] for row in rows)}".encode('utf-8')
+                f.seek(offset)
+                room = len(f.read(length).rstrip(b'\r\n'))
+                if len(line) <= room:
+                    f.seek(offset)
+                    f.write(line.ljust(room))
+                    blanked.extend(rows[1:])
+                else:
+                    appended.append(line + b'\n')
+                    blanked.extend(rows)
+            f.flush()
+            if appended:
+                self._append(b''.join(appended))
+            self._write_index([self._blank(f, username, row[0]) for row in blanked])
+        return sum(len(rows) for rows in groups.values()) - len(groups)
+
+    def _maybe_consolidate(self):
+        if self._dirty and self._consolidator is None:
+            # Not a daemon, so a pass that has started finishes before the process exits
+            self._consolidator = threading.Thread(target=self._consolidate_dirty)
+            self._consolidator.start()
+
+    def _consolidate_dirty(self):
+        """Background pass merging the rows of users appended to since the last pass"""
+        try:
+            while True:
+                with self.lock.exclusive(), self._lock:
+                    if not self._dirty:
+                        self._consolidator = None
+                        return
+                    self._ensure()
+                    chunk = [self._dirty.pop() for _ in range(min(CONSOLIDATE_CHUNK, len(self._dirty)))]
+                    merged = sum(self._consolidate(username) for username in chunk)
+                    ticket = self.committer.written() if merged else None
+                    self._maybe_compact()
+                if ticket is not None:
+                    self.committer.wait(ticket)
+        except BaseException:
+            with self._lock:
+                self._consolidator = None
+            raise
+
+    def _maybe_compact(self):
+        size = os.path.getsize(self.data_path)
+        if size and self._dead >= size * self.compact_ratio:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self._compact_blanks, daemon=True)
+                self._compactor.start()
+
+    def _compact_blanks(self):
+        with self.lock.exclusive(), self._lock:
+            self._ensure()
+            self._rewrite()
+
+    def compact(self):
+        """Merge every user's duplicate rows, then rewrite user_inventory.txt without blanked rows
+
+        Returns how many rows were merged away.
+        """
+        with self.lock.exclusive(), self._lock:
+            self._ensure()
+            merged = sum(self._consolidate(username) for username in list(self._offsets))
+            self._dirty.clear()
+            self._rewrite()
+        return merged
+
+    def _rewrite(self):
+        """Rewrite user_inventory.txt without blanked rows and re-index it"""
+        tmp_path = self.data_path + '.tmp'
+        with open(self.data_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for raw in src:
+                if raw.strip():
+                    dst.write(raw.rstrip(b' \r\n') + raw[len(raw.rstrip(b'\r\n')):])
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.data_path)
+        self._rebuild()
+
+
+inventory = InventoryIndex()
@@ -0,0 +1,182 @@
+"""Fixed-width byte-offset index over a `left|right` record file
+
+news.txt only ever grows at the end, so instead of parsing all of it the
+terminal keeps a sidecar (news.idx) holding the byte offset of every
+record line. maintenance_notes.txt gets one too (maintenance_notes.idx).
+The sidecar is laid out as:
+
+    8 bytes     magic
+    8 bytes     how many bytes of the data file are indexed
+    8 bytes     how many records are indexed
+    8 bytes     offset of record 0, then record 1, ...
+
+All numbers are little-endian. Record N's offset sits at a fixed position,
+so fetching any record costs one 8-byte read plus one line read, whatever
+the size of the file. Lines appended since the last look are indexed by
+scanning only the new bytes. The header is written after the new
+offsets, so a crash mid-update leaves a header that still describes a
+valid prefix. A file that shrank or no longer lines up with its index is
+re-indexed from scratch; `python main.py rebuild-index` forces that after
+editing the middle of the file by hand.
+
+Updates and appends hold the data file's FileLock exclusive, reads hold
+it shared. Appends are fsynced through a GroupCommit.
+"""
+import os
+import struct
+import threading
+
+from station_lock import GroupCommit, lock_for
+
+MAGIC = b'IRLIDX01'
+HEADER = struct.Struct('<8sQQ')
+OFFSET = struct.Struct('<Q')
+
+
+def read_at(f, size, offset):
+    """Read size bytes at offset from a binary file object"""
+    f.seek(offset)
+    return f.read(size)
+
+
+def parse_record(raw):
+    """Parse one raw `left|right` line into (left, right), or None"""
+    line = raw.decode('utf-8', errors='replace').strip()
+    if not line or '|' not in line:
+        return None
+    left, right = line.split('|', 1)
+    return left, right
+
+
+class LineIndex:
+    """Offsets of every record line in a text file, kept in a fixed-width sidecar"""
+
+    def __init__(self, data_path, index_path=None):
+        self.data_path = data_path
+        self.index_path = index_path or os.path.splitext(data_path)[0] + '.idx'
+        self.lock = lock_for(data_path)
+        self.committer = GroupCommit(data_path)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._count = 0
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_header(self, idx):
+        raw = read_at(idx, HEADER.size, 0)
+        if len(raw) < HEADER.size:
+            return None
+        magic, covered, count = HEADER.unpack(raw)
+        if magic != MAGIC or os.fstat(idx.fileno()).st_size < HEADER.size + count * OFFSET.size:
+            return None
+        return covered, count
+
+    def _looks_current(self, idx, data, covered, count, size):
+        if size < covered:
+            return False
+        if covered and read_at(data, 1, covered - 1) != b'\n':
+            return False
+        if count:
+            (last,) = OFFSET.unpack(read_at(idx, OFFSET.size, HEADER.size + (count - 1) * OFFSET.size))
+            if last and read_at(data, 1, last - 1) != b'\n':
+                return False
+        return True
+
+    def _scan(self, data, start):
+        """Offsets of complete record lines from start, and where the last complete line ends"""
+        offsets = []
+        data.seek(start)
+        offset = start
+        for raw in data:
+            if not raw.endswith(b'\n'):
+                break  # partial line, picked up once it is finished
+            if parse_record(raw) is not None:
+                offsets.append(offset)
+            offset += len(raw)
+        return offsets, offset
+
+    def _refresh(self, force=False):
+        """Bring the sidecar up to date with the data file"""
+        signature = self._stat(self.data_path)
+        if signature is None:
+            raise FileNotFoundError(self.data_path)
+        if not force and signature == self._signature:
+            return
+
+        with self.lock.exclusive(), self._lock:
+            signature = self._stat(self.data_path)
+            with open(self.data_path, 'rb') as data, \
+                    os.fdopen(os.open(self.index_path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b') as idx:
+                header = None if force else self._read_header(idx)
+                if header is None or not self._looks_current(idx, data, *header, signature[1]):
+                    header = (0, 0)
+                covered, count = header
+                if signature[1] > covered or header == (0, 0):
+                    offsets, covered = self._scan(data, covered)
+                    if offsets:
+                        idx.seek(HEADER.size + count * OFFSET.size)
+                        idx.write(b''.join(OFFSET.pack(o) for o in offsets))
+                    count += len(offsets)
+                    idx.seek(0)
+                    idx.write(HEADER.pack(MAGIC, covered, count))
+                    idx.truncate(HEADER.size + count * OFFSET.size)
+            self._count = count
+            self._signature = signature
+
+    def rebuild(self):
+        """Re-index the data file from scratch, returning the record count"""
+        self._refresh(force=True)
+        return self._count
+
+    def count(self):
+        """Number of records in the file"""
+        self._refresh()
+        return self._count
+
+    def records(self, start, stop):
+        """Return [(left, right)] for records start..stop-1 in file order"""
+        self._refresh()
+        start = max(0, start)
+        stop = min(stop, self._count)
+        if start >= stop:
+            return []
+        with self.lock.shared():
+            with open(self.index_path, 'rb') as idx:
+                idx.seek(HEADER.size + start * OFFSET.size)
+                raw = idx.read((stop - start) * OFFSET.size)
+            offsets = [o for (o,) in OFFSET.iter_unpack(raw)]
+            records = []
+            with open(self.data_path, 'rb') as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    records.append(parse_record(f.readline()) or ('', ''))
+        return records
+
+    def append(self, left, right):
+        """Append one `left|right` record line to the data file"""
+        with self.lock.exclusive():
+            with open(self.data_path, 'a+b') as f:
+                line = f"{left}|{right}\n".encode('utf-8')
+                size = os.fstat(f.fileno()).st_size
+                if size and read_at(f, 1, size - 1) != b'\n':
+                    line = b'\n' + line  # a hand-edited file may not end with a newline
+                f.write(line)
+            ticket = self.committer.written()
+        self.committer.wait(ticket)
+
+    def record(self, n):
+        """Return record n (0-based) as (left, right)"""
+        found = self.records(n, n + 1)
+        if not found:
+            raise IndexError(n)
+        return found[0]
+
+
+news = LineIndex('news.txt', 'news.idx')
+maintenance_notes = LineIndex('maintenance_notes.txt', 'maintenance_notes.idx')
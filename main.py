@@ -1,35 +1,95 @@
-import typer
+# Keep imports here to what the login screen needs: the terminal is launched
+# once per player per scene, so every module loaded up front delays the first
+# prompt. rich.progress is imported by the screens that animate, and the
+# Typer CLI in cli.py only when command-line arguments are given.
+import os
+import sys
+import threading
 import time
-import random
-from rich.console import Console
+from rich.console import Console, Group
 from rich.panel import Panel
-from rich.progress import Progress, BarColumn, TextColumn, SpinnerColumn
 from rich.text import Text
-from rich.layout import Layout
-from rich.columns import Columns
 from rich.align import Align
 from rich.table import Table
-from rich.prompt import Prompt, Confirm, IntPrompt
-from rich.rule import Rule
-from rich.live import Live
+from rich.styled import Styled
 from rich import box
-import os
+from rich.markup import escape
+from audit_log import audit
+from bank import Refused, check_debit, check_transfer, new_key
+from inventory_index import inventory
+from menus import MenuRegistry
+from search_index import highlight_pattern
+from hatch_registry import PRIORITIES, PRIORITY_STYLES, normalize_hatch, note_priority
+from session import Session
+from storage import open_storage
+
+# Where the terminal was started from, before it moves to its data directory;
+# file arguments on the command line are relative to this
+LAUNCH_DIR = os.getcwd()
+if __name__ == "__main__":
+    # The data files sit next to main.py; move there before storage opens any
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-# Initialize Typer app and Rich console
-app = typer.Typer()
+# Initialize Rich console
 console = Console()
-
-# Global variables for current user
-current_user = None
-current_role = None
-user_permissions = []
-
-def clear_screen():
+storage = open_storage()
+
+NEWS_PAGE_SIZE = 5
+SEARCH_RESULTS = 8
+
+# Functions timed by --profile (see profiling.py)
+PROFILED_SCREENS = (
+    'loading_screen', 'login_screen', 'main_menu', 'station_news', 'search_archives', 'shuttle_status',
+    'food_delivery', 'bank_menu', 'check_balance', 'transfer_holos', 'maintenance_menu',
+    'open_maintenance_hatch', 'view_maintenance_notes', 'logout_user', 'exit_terminal', 'personal_menu',
+    'view_inventory', 'manage_inventory', 'add_inventory_item', 'delete_inventory_item',
+)
+PROFILED_LOADERS = (
+    'load_users', 'load_permissions', 'load_balance', 'send_holos',
+    'place_order', 'load_user_inventory', 'count_news', 'load_news', 'load_food_menu',
+    'load_maintenance_notes', 'load_hatch_notes',
+)
+
+# Menu screens and their options (see menus.py). Handlers are named here and
+# defined below; permissions are the option numbers in permissions.txt.
+menus = MenuRegistry(globals())
+menus.add('main_menu', status='main_menu_status', render='main_menu_options', show_restricted=True)
+menus.option('main_menu', '1', "PERSONAL", 'personal_menu', permission=1)
+menus.option('main_menu', '2', "STATION NEWS", 'station_news', permission=2)
+menus.option('main_menu', '3', "SHUTTLE STATUS", 'shuttle_status', permission=3)
+menus.option('main_menu', '4', "STORE", 'food_delivery', permission=4)
+menus.option('main_menu', '5', "BANK", 'bank_menu', permission=5)
+menus.option('main_menu', '6', "MAINTENANCE", 'maintenance_menu', permission=6)
+menus.option('main_menu', '7', "LOGOUT", 'logout_user', permission=7,
+             confirm="[bold red]CONFIRM LOGOUT?[/bold red]", leaves=True)
+
+menus.add('personal_menu', title="PERSONAL MENU", heading="PERSONAL OPTIONS:", status='balance_status', default='3')
+menus.option('personal_menu', '1', "Inventory - View Character Sheet & Items", 'view_inventory')
+menus.option('personal_menu', '2', "Manage Inventory - Add/Delete Items", 'manage_inventory')
+menus.option('personal_menu', '3', "Return to Main Menu", leaves=True)
+
+menus.add('manage_inventory', title="INVENTORY MANAGEMENT", heading="MANAGEMENT OPTIONS:", default='3')
+menus.option('manage_inventory', '1', "Add New Item", 'add_inventory_item')
+menus.option('manage_inventory', '2', "Delete Item", 'delete_inventory_item')
+menus.option('manage_inventory', '3', "Return to Personal Menu", leaves=True)
+
+menus.add('bank_menu', title="BANKING SYSTEM", heading="BANKING OPTIONS:", status='balance_status', default='3')
+menus.option('bank_menu', '1', "Check Balance", 'check_balance')
+menus.option('bank_menu', '2', "Transfer holos", 'transfer_holos')
+menus.option('bank_menu', '3', "Return to Main Menu", leaves=True)
+
+menus.add('maintenance_menu', title="MAINTENANCE SYSTEMS", heading="MAINTENANCE OPTIONS:", rule="=" * 40,
+          default='3')
+menus.option('maintenance_menu', '1', "Open Maintenance Hatch", 'open_maintenance_hatch')
+menus.option('maintenance_menu', '2', "View Maintenance Notes", 'view_maintenance_notes')
+menus.option('maintenance_menu', '3', "Return to Main Menu", leaves=True)
+
+def clear_screen(session):
     """Clear the console screen"""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    session.screen.clear()
 
-def print_ascii_art():
-    """Display retro ASCII art banner"""
+def ascii_banner(session):
+    """Build retro ASCII art banner"""
     banner = """
     ╔════════════════════════════════════════════════════════════════════╗
     ║                                                                    ║
@@ -45,18 +105,24 @@ def print_ascii_art():
     ║                                                                    ║
     ╚════════════════════════════════════════════════════════════════════╝
     """
-    console.print(banner, style="bright_cyan")
+    return Styled(session.console.render_str(banner), "bright_cyan")
+
+def print_ascii_art(session):
+    """Display retro ASCII art banner"""
+    session.console.print(session.render_cache.get('banner', lambda: ascii_banner(session)))
 
-def loading_screen():
+def loading_screen(session):
     """Display loading screen with progress bar"""
-    console.print("\n[bold green]INITIALIZING SYSTEM...[/bold green]\n")
+    from rich.progress import Progress, BarColumn, TextColumn, SpinnerColumn
+
+    session.console.print("\n[bold green]INITIALIZING SYSTEM...[/bold green]\n")
     
-    with Progress(
+    with session.pacing.animation(), Progress(
         SpinnerColumn(),
         TextColumn("[bold green]>>[/bold green] {task.description}"),
         BarColumn(bar_width=40, complete_style="bright_green", finished_style="bright_green"),
         TextColumn("[bold green]{task.percentage:>3.0f}%[/bold green]"),
-        console=console
+        console=session.console
     ) as progress:
         
         tasks = [
@@ -72,85 +138,104 @@ def loading_screen():
             task = progress.add_task(task_desc, total=total)
             while not progress.finished:
                 progress.update(task, advance=1)
-                time.sleep(random.uniform(0.02, 0.08))
+                session.pacing.uniform(0.02, 0.08)
             progress.remove_task(task)
     
-    console.print("\n[bold bright_green]SYSTEM READY![/bold bright_green]\n")
-    time.sleep(1)
+    session.console.print("\n[bold bright_green]SYSTEM READY![/bold bright_green]\n")
+    session.pacing.sleep(1)
 
-def load_users():
+def load_users(session):
     """Load user credentials from users.txt"""
-    users = {}
     try:
-        with open('users.txt', 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and ':' in line:
-                    username, password, role = line.split(':')
-                    users[username] = {'password': password, 'role': role}
+        return storage.users()
     except FileNotFoundError:
-        console.print("[red]ERROR: users.txt not found![/red]")
+        session.console.print("[red]ERROR: users.txt not found![/red]")
         return {}
-    return users
 
-def load_permissions():
+def load_permissions(session):
     """Load role permissions from permissions.txt"""
-    permissions = {}
     try:
-        with open('permissions.txt', 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and ':' in line:
-                    role, perms = line.split(':')
-                    permissions[role] = [int(x) for x in perms.split(',')]
+        return storage.permissions()
     except FileNotFoundError:
-        console.print("[red]ERROR: permissions.txt not found![/red]")
+        session.console.print("[red]ERROR: permissions.txt not found![/red]")
         return {}
-    return permissions
 
-def load_user_holos():
-    """Load user credit balances from user_holos.txt"""
-    holos = {}
+def load_balance(session, username):
+    """Load one user's holo balance, or None if they have no account"""
     try:
-        with open('user_holos.txt', 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and ':' in line:
-                    username, credit_amount = line.split(':')
-                    holos[username] = int(credit_amount)
+        return storage.balance(username)
     except FileNotFoundError:
-        console.print("[red]ERROR: user_holos.txt not found![/red]")
-        return {}
-    return holos
+        session.console.print("[red]ERROR: user_holos.txt not found![/red]")
+        return None
+
+def send_holos(session, recipient, amount, key):
+    """Transfer holos from the current user, returning a bank.Receipt or None if it didn't go through"""
+    try:
+        return storage.transfer(session.user, recipient, amount, key=key)
+    except Refused as e:
+        session.console.print(f"[red]ERROR: {escape(str(e))}![/red]")
+    except Exception as e:
+        session.console.print(f"[red]ERROR: Transfer failed: {e}[/red]")
+    return None
 
-def save_user_holos(holos):
-    """Save user credit balances to user_holos.txt"""
+def place_order(session, item_name, quantity, cost):
+    """Debit an order and deliver it to the current user's inventory"""
     try:
-        with open('user_holos.txt', 'w') as f:
-            for username, credit_amount in holos.items():
-                f.write(f"{username}:{credit_amount}\n")
+        storage.place_order(session.user, item_name, quantity, cost)
         return True
     except Exception as e:
-        console.print(f"[red]ERROR: Could not save holos: {e}[/red]")
+        session.console.print(f"[red]ERROR: Could not process order: {e}[/red]")
         return False
 
-def login_screen():
+def load_user_inventory(username):
+    """Load one user's inventory rows"""
+    return storage.inventory_items(username)
+
+def count_news():
+    """Count the articles in news.txt"""
+    return storage.news_count()
+
+def load_news(start, stop):
+    """Load news articles start..stop-1 from news.txt, oldest first"""
+    return storage.news_articles(start, stop)
+
+def load_food_menu():
+    """Load food items and prices from food_menu.txt"""
+    return storage.food_menu()
+
+def load_maintenance_notes(priority=None):
+    """Load maintenance notes from maintenance_notes.txt, optionally only one priority"""
+    if priority is None:
+        return storage.maintenance_notes()
+    return storage.maintenance_notes_by_priority(priority)
+
+def load_hatch_notes(hatch):
+    """Load the maintenance notes filed under one hatch ID"""
+    return storage.hatch_notes(hatch)
+
+def print_maintenance_note(session, hatch, note):
+    """Print one maintenance note with its heading coloured by priority"""
+    priority = note_priority(note)
+    style = PRIORITY_STYLES.get(priority, "bold bright_green")
+    session.console.print(f"\n[{style}]{escape(hatch)}[/{style}]" + (f" [dim]({priority})[/dim]" if priority else ""))
+    session.console.print(f"[white]{escape(note)}[/white]")
+    session.console.print("─" * 80, style="dim")
+
+def login_screen(session):
     """Display login screen and authenticate user"""
-    global current_user, current_role, user_permissions
-    
-    users = load_users()
-    permissions = load_permissions()
+    users = load_users(session)
+    permissions = load_permissions(session)
     
     if not users or not permissions:
-        console.print("[red]CRITICAL ERROR: Cannot load user database![/red]")
+        session.console.print("[red]CRITICAL ERROR: Cannot load user database![/red]")
         return False
     
     max_attempts = 3
     attempts = 0
     
     while attempts < max_attempts:
-        clear_screen()
-        print_ascii_art()
+        clear_screen(session)
+        print_ascii_art(session)
         
         # Display login panel
         login_panel = Panel(
@@ -160,190 +245,242 @@ def login_screen():
             border_style="bright_yellow",
             box=box.DOUBLE
         )
-        console.print(login_panel)
+        session.console.print(login_panel)
         
-        console.print("\n[bold cyan]ENTER CREDENTIALS:[/bold cyan]")
-        console.print("=" * 50, style="bright_yellow")
+        session.console.print("\n[bold cyan]ENTER CREDENTIALS:[/bold cyan]")
+        session.console.print("=" * 50, style="bright_yellow")
         
-        username = Prompt.ask("\n[bold green]USERNAME[/bold green]")
-        password = Prompt.ask("[bold green]PASSWORD[/bold green]", password=True)
+        username = session.ask("\n[bold green]USERNAME[/bold green]")
+        password = session.ask("[bold green]PASSWORD[/bold green]", password=True)
         
         if username in users and users[username]['password'] == password:
-            current_user = username
-            current_role = users[username]['role']
-            user_permissions = permissions.get(current_role, [])
+            role = users[username]['role']
+            session.login(username, role, permissions.get(role, []))
+            audit.emit('login', username, role=role)
             
-            console.print(f"\n[bold bright_green]ACCESS GRANTED![/bold bright_green]")
-            console.print(f"[green]Welcome, {username.upper()}[/green]")
-            console.print(f"[green]Role: {current_role}[/green]")
-            console.print(f"[green]Security Level: {len(user_permissions)}/7[/green]")
+            session.console.print(f"\n[bold bright_green]ACCESS GRANTED![/bold bright_green]")
+            session.console.print(f"[green]Welcome, {username.upper()}[/green]")
+            session.console.print(f"[green]Role: {session.role}[/green]")
+            session.console.print(f"[green]Security Level: {len(session.permissions)}/7[/green]")
             
-            time.sleep(2)
+            session.pacing.sleep(2)
             return True
         else:
             attempts += 1
             remaining = max_attempts - attempts
-            console.print(f"\n[bold red]ACCESS DENIED![/bold red]")
-            console.print(f"[red]Invalid credentials. {remaining} attempts remaining.[/red]")
-            time.sleep(2)
-    
-    console.print("\n[bold red]MAXIMUM LOGIN ATTEMPTS EXCEEDED![/bold red]")
-    console.print("[red]Terminal locked for security reasons.[/red]")
-    time.sleep(3)
+            audit.emit('login_failed', username, attempt=attempts)
+            session.console.print(f"\n[bold red]ACCESS DENIED![/bold red]")
+            session.console.print(f"[red]Invalid credentials. {remaining} attempts remaining.[/red]")
+            session.pacing.sleep(2)
+    
+    audit.emit('login_locked', username, attempts=attempts)
+    session.console.print("\n[bold red]MAXIMUM LOGIN ATTEMPTS EXCEEDED![/bold red]")
+    session.console.print("[red]Terminal locked for security reasons.[/red]")
+    session.pacing.sleep(3)
     return False
 
-def check_permission(menu_option):
+def check_permission(session, menu_option):
     """Check if current user has permission to access a menu option"""
-    return menu_option in user_permissions
+    return menu_option in session.permissions
 
-def main_menu():
+def main_menu_status(session):
+    """Print the banner and the logged-in user's panel above the main menu"""
+    print_ascii_art(session)
+    
+    # Display user info panel
+    user_panel = Panel(
+        f"USER: {session.user.upper()} | ROLE: {session.role} | SECURITY: {len(session.permissions)}/7",
+        border_style="bright_cyan",
+        box=box.ASCII
+    )
+    session.console.print(user_panel)
+
+def main_menu_options(menu, options, permissions):
+    """Build main menu header and option table for a role's permissions"""
+    menu_panel = Panel(
+        Align.center(
+            Text("MAIN TERMINAL MENU", style="bold bright_cyan")
+        ),
+        border_style="bright_cyan",
+        box=box.DOUBLE
+    )
+    
+    # Create menu table with permission indicators
+    table = Table(show_header=False, box=box.ASCII2, border_style="bright_cyan")
+    table.add_column("Option", style="bright_green", width=10)
+    table.add_column("Description", style="white", width=50)
+    table.add_column("Access", style="yellow", width=15)
+    
+    for option in options:
+        if option.permission in permissions:
+            status = "[green]ACCESSIBLE[/green]"
+            option_style = f"[{option.key}]"
+        else:
+            status = "[red]RESTRICTED[/red]"
+            option_style = f"[dim][{option.key}][/dim]"
+    
+        table.add_row(option_style, option.label, status)
+    
+    return Group(menu_panel, table, Styled(Text("\n" + "="*60), "bright_cyan"))
+
+def main_menu(session):
     """Display main menu with options based on user permissions"""
-    global current_user, current_role, user_permissions
+    menus.run(session, 'main_menu')
+
+def station_news(session):
+    """Page through station news articles, newest first"""
+    newest_first = True
+    top = 0  # position of the page's first article in reading order
+    message = None
     
     while True:
-        clear_screen()
-        print_ascii_art()
-        
-        # Display user info panel
-        user_panel = Panel(
-            f"USER: {current_user.upper()} | ROLE: {current_role} | SECURITY: {len(user_permissions)}/7",
-            border_style="bright_cyan",
-            box=box.ASCII
-        )
-        console.print(user_panel)
+        try:
+            total = count_news()
+        except FileNotFoundError:
+            clear_screen(session)
+            session.console.print(Panel("[bold cyan]STATION NEWS NETWORK[/bold cyan]", border_style="cyan"))
+            session.console.print("[red]ERROR: news.txt not found![/red]")
+            session.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
+            return
         
-        menu_panel = Panel(
-            Align.center(
-                Text("MAIN TERMINAL MENU", style="bold bright_cyan")
-            ),
-            border_style="bright_cyan",
-            box=box.DOUBLE
-        )
-        console.print(menu_panel)
-        
-        # Create menu table with permission indicators
-        table = Table(show_header=False, box=box.ASCII2, border_style="bright_cyan")
-        table.add_column("Option", style="bright_green", width=10)
-        table.add_column("Description", style="white", width=50)
-        table.add_column("Access", style="yellow", width=15)
-        
-        menu_options = [
-            (1, "PERSONAL", "Personal Belongings, and Information"),
-            (2, "STATION NEWS", "Latest news and announcements"),
-            (3, "SHUTTLE STATUS", "Shuttle fleet status"),
-            (4, "STORE", "Order food and supplies"),
-            (5, "BANK", "Credit management and transfers"),
-            (6, "MAINTENANCE", "Maintenance systems and notes"),
-            (7, "LOGOUT", "Return to login")
-        ]
+        # Articles are numbered 1..total in the order they were posted
+        top = max(0, min(top, total - 1))
+        if newest_first:
+            numbers = list(range(total - top, max(total - top - NEWS_PAGE_SIZE, 0), -1))
+        else:
+            numbers = list(range(top + 1, min(top + NEWS_PAGE_SIZE, total) + 1))
+        first, last = (min(numbers), max(numbers)) if numbers else (1, 0)
+        articles = dict(zip(range(first, last + 1), load_news(first - 1, last)))
         
-        for option, description, access_desc in menu_options:
-            if check_permission(option):
-                status = "[green]ACCESSIBLE[/green]"
-                option_style = f"[{option}]"
+        with session.screen.frame():
+            session.console.print(Panel("[bold cyan]STATION NEWS NETWORK[/bold cyan]", border_style="cyan"))
+            
+            if not total:
+                session.console.print("[yellow]No news articles available.[/yellow]")
             else:
-                status = "[red]RESTRICTED[/red]"
-                option_style = f"[dim][{option}][/dim]"
+                pages = (total + NEWS_PAGE_SIZE - 1) // NEWS_PAGE_SIZE
+                order = "newest first" if newest_first else "oldest first"
+                session.console.print(
+                    f"[dim]Articles {numbers[0]}-{numbers[-1]} of {total} ({order}) | "
+                    f"Page {top // NEWS_PAGE_SIZE + 1}/{pages}[/dim]"
+                )
+                for number in numbers:
+                    title, body = articles[number]
+                    session.console.print(f"\n[bold bright_green]{number}. {escape(title)}[/bold bright_green]")
+                    session.console.print(f"[white]{escape(body)}[/white]")
+                    session.console.print("─" * 80, style="dim")
+                session.console.print("\n[cyan][N][/cyan] Next page  [cyan][P][/cyan] Previous page  "
+                                      "[cyan]\\[#][/cyan] Jump to article  [cyan][O][/cyan] Flip order  "
+                                      "[cyan][S][/cyan] Search  [cyan][ENTER][/cyan] Main menu")
             
-            table.add_row(option_style, description, status)
-        
-        console.print(table)
-        console.print("\n" + "="*60, style="bright_cyan")
+            if message:
+                session.console.print(f"\n[red]{message}[/red]")
+                message = None
         
-        # Only allow selection of accessible options
-        accessible_options = [str(opt) for opt in user_permissions]
-        choice = Prompt.ask(
-            "\n[bold bright_green]SELECT OPTION[/bold bright_green]",
-            choices=accessible_options,
-            default=accessible_options[0] if accessible_options else "6"
-        )
+        command = session.ask("\n[bold green]NEWS[/bold green]", default="", show_default=False).strip().lower()
         
-        choice = int(choice)
-        
-        if choice == 1 and check_permission(1):
-            personal_menu()
-        elif choice == 2 and check_permission(2):
-            station_news()
-        elif choice == 3 and check_permission(3):
-            shuttle_status()
-        elif choice == 4 and check_permission(4):
-            food_delivery()
-        elif choice == 5 and check_permission(5):
-            bank_menu()
-        elif choice == 6 and check_permission(6):
-            maintenance_menu()
-        elif choice == 7:
-            if Confirm.ask("[bold red]CONFIRM LOGOUT?[/bold red]"):
-                logout_user()
-                break
-
-def station_news():
-    """Display station news articles"""
-    clear_screen()
-    console.print(Panel("[bold cyan]STATION NEWS NETWORK[/bold cyan]", border_style="cyan"))
-    
-    try:
-        with open('news.txt', 'r') as f:
-            news_articles = []
-            for line in f:
-                line = line.strip()
-                if line and '|' in line:
-                    title, body = line.split('|', 1)
-                    news_articles.append((title, body))
-        
-        if not news_articles:
-            console.print("[yellow]No news articles available.[/yellow]")
+        if command in ("", "q"):
+            return
+        elif command == "n":
+            if top + NEWS_PAGE_SIZE < total:
+                top += NEWS_PAGE_SIZE
+            else:
+                message = "ERROR: Already on the last page!"
+        elif command == "p":
+            top = max(0, top - NEWS_PAGE_SIZE)
+        elif command == "s":
+            search_archives(session)
+        elif command == "o":
+            # Keep the article at the top of the page in view
+            shown = numbers[0] if numbers else 1
+            newest_first = not newest_first
+            top = total - shown if newest_first else shown - 1
+        elif command.isdigit():
+            number = int(command)
+            if 1 <= number <= total:
+                top = total - number if newest_first else number - 1
+            else:
+                message = f"ERROR: No article {number}! Articles run from 1 to {total}."
         else:
-            for i, (title, body) in enumerate(news_articles, 1):
-                console.print(f"\n[bold bright_green]{i}. {title}[/bold bright_green]")
-                console.print(f"[white]{body}[/white]")
-                console.print("─" * 80, style="dim")
-        
-    except FileNotFoundError:
-        console.print("[red]ERROR: news.txt not found![/red]")
-    
-    Prompt.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
+            message = "ERROR: Unknown command!"
 
-def shuttle_status():
+def search_archives(session):
+    """Search station news, and maintenance notes for crew with maintenance access"""
+    sources = None if check_permission(session, 6) else ["news"]
+    results = None
+    
+    while True:
+        with session.screen.frame():
+            session.console.print(Panel("[bold cyan]STATION ARCHIVE SEARCH[/bold cyan]", border_style="cyan"))
+            session.console.print("[dim]Every word must appear. reac* matches word starts, "
+                                  "\"life support\" matches a phrase.[/dim]")
+            
+            if results is not None:
+                query, matches, exact, hits, elapsed = results
+                count = f"{matches}" if exact else f"up to {matches}"
+                session.console.print(f"\n[green]{count} matches for '{escape(query)}' ({elapsed:.1f} ms)[/green]")
+                pattern = highlight_pattern(query)
+                for score, source, number, (title, body) in hits:
+                    label = f"NEWS #{number + 1}" if source == "news" else "MAINTENANCE"
+                    heading = Text(f"[{label}] ", style="cyan")
+                    heading.append(title, style="bold bright_green")
+                    text = Text(body, style="white")
+                    if pattern:
+                        heading.highlight_regex(pattern, "black on yellow")
+                        text.highlight_regex(pattern, "black on yellow")
+                    session.console.print()
+                    session.console.print(heading)
+                    session.console.print(text)
+                if not hits:
+                    session.console.print("[yellow]Nothing in the archives matches that search.[/yellow]")
+        
+        query = session.ask("\n[bold green]SEARCH (ENTER to return)[/bold green]", default="", show_default=False).strip()
+        if not query:
+            return
+        try:
+            pending = storage.search_pending()
+            if pending > 1000:
+                session.console.print(f"[yellow]Indexing {pending} new archive entries...[/yellow]")
+            started = time.perf_counter()
+            matches, exact, hits = storage.search(query, sources, SEARCH_RESULTS)
+            results = (query, matches, exact, hits, (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            session.console.print(f"[red]ERROR: {e}[/red]")
+            session.ask("\n[bold green]Press ENTER to continue[/bold green]")
+
+def shuttle_status(session):
     """Display ominous shuttle status"""
-    clear_screen()
-    console.print(Panel("[bold red]SHUTTLE FLEET STATUS[/bold red]", border_style="red"))
+    clear_screen(session)
+    session.console.print(Panel("[bold red]SHUTTLE FLEET STATUS[/bold red]", border_style="red"))
     
-    console.print("\n" * 5)
-    console.print(Align.center("[bold red]ALL SHUTTLES OFFLINE[/bold red]"))
-    console.print("\n" * 2)
-    console.print(Align.center("[red]EMERGENCY PROTOCOLS ACTIVATED[/red]"))
-    console.print("\n" * 2)
-    console.print(Align.center("[dim]Contact engineering for assistance...[/dim]"))
-    console.print("\n" * 5)
+    session.console.print("\n" * 5)
+    session.console.print(Align.center("[bold red]ALL SHUTTLES OFFLINE[/bold red]"))
+    session.console.print("\n" * 2)
+    session.console.print(Align.center("[red]EMERGENCY PROTOCOLS ACTIVATED[/red]"))
+    session.console.print("\n" * 2)
+    session.console.print(Align.center("[dim]Contact engineering for assistance...[/dim]"))
+    session.console.print("\n" * 5)
     
-    Prompt.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
 
-def food_delivery():
+def food_delivery(session):
     """Food delivery system with credit deduction"""
-    clear_screen()
-    console.print(Panel("[bold cyan]GOODS DELIVERY SYSTEM[/bold cyan]", border_style="cyan"))
+    clear_screen(session)
+    session.console.print(Panel("[bold cyan]GOODS DELIVERY SYSTEM[/bold cyan]", border_style="cyan"))
     
     # Load user holos
-    holos = load_user_holos()
-    user_balance = holos.get(current_user, 0)
+    user_balance = load_balance(session, session.user) or 0
     
-    console.print(f"\n[green]Current Balance: {user_balance} holos[/green]")
-    console.print("=" * 50)
+    session.console.print(f"\n[green]Current Balance: {user_balance} holos[/green]")
+    session.console.print("=" * 50)
     
     # Load food menu
     try:
-        with open('food_menu.txt', 'r') as f:
-            food_items = []
-            for line in f:
-                line = line.strip()
-                if line and '|' in line:
-                    item, price = line.split('|')
-                    food_items.append((item, int(price)))
+        food_items = load_food_menu()
         
         if not food_items:
-            console.print("[yellow]No items available.[/yellow]")
-            Prompt.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
+            session.console.print("[yellow]No items available.[/yellow]")
+            session.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
             return
         
         # Display food menu
@@ -353,491 +490,353 @@ def food_delivery():
         food_table.add_column("Item #", style="white")
         
         for i, (item, price) in enumerate(food_items, 1):
-            food_table.add_row(item, f"{price} holos", str(i))
+            food_table.add_row(escape(item), f"{price} holos", str(i))
         
-        console.print(food_table)
+        session.console.print(food_table)
         
         # Get user selection
-        choice = IntPrompt.ask(
+        choice = session.ask_int(
             "\n[bold green]Select item number to order[/bold green]"
         )
 
-        quantity = IntPrompt.ask(
+        quantity = session.ask_int(
             "\n[bold green]How many would you like to order?[/bold green]"
         )
         
-        if 1 <= choice <= len(food_items):
+        if quantity < 1:
+            session.console.print("[red]ERROR: Invalid quantity![/red]")
+        elif 1 <= choice <= len(food_items):
             selected_item, price = food_items[choice - 1]
+            cost = price * quantity
             
-            if user_balance >= price:
+            try:
+                check_debit(session.user, user_balance, cost)
+            except Refused:
+                session.console.print(f"\n[bold red]INSUFFICIENT FUNDS![/bold red]")
+                session.console.print(f"[red]Order costs {cost} holos, but you only have {user_balance} holos.[/red]")
+            else:
                 # Process order
-                holos[current_user] -= price * quantity
-                if save_user_holos(holos):
-                    console.print(f"\n[bold bright_green]ORDER CONFIRMED![/bold bright_green]")
-                    console.print(f"[green]You ordered: {selected_item}[/green]")
-                    console.print(f"[green]Cost: {price * quantity} holos[/green]")
-                    console.print(f"[green]New Balance: {holos[current_user]} holos[/green]")
-                    console.print(f"\n[yellow]Your order will be delivered to your quarters within 30 minutes.[/yellow]")
-
-                    try:
-                        with open('user_inventory.txt', 'a') as f:
-                            f.write(f"{current_user}:{selected_item}|{selected_item}|{quantity}\n")
-                    except Exception as e:
-                        console.print(f"[red]ERROR: Could not add item to inventory: {e}[/red]")
-                        Prompt.ask("\n[bold green]Press ENTER to return to Item delivery menu[/bold green]")
-                        return
+                if place_order(session, selected_item, quantity, cost):
+                    audit.emit('order', session.user, item=selected_item, quantity=quantity, cost=cost)
+                    session.console.print(f"\n[bold bright_green]ORDER CONFIRMED![/bold bright_green]")
+                    session.console.print(f"[green]You ordered: {escape(selected_item)}[/green]")
+                    session.console.print(f"[green]Cost: {cost} holos[/green]")
+                    session.console.print(f"[green]New Balance: {load_balance(session, session.user)} holos[/green]")
+                    session.console.print(f"\n[yellow]Your order will be delivered to your quarters within 30 minutes.[/yellow]")
                 else:
-                    console.print("[red]ERROR: Could not process payment![/red]")
-            else:
-                console.print(f"\n[bold red]INSUFFICIENT FUNDS![/bold red]")
-                console.print(f"[red]Item costs {price} holos, but you only have {user_balance} holos.[/red]")
+                    session.console.print("[red]ERROR: Could not process payment![/red]")
         
     except FileNotFoundError:
-        console.print("[red]ERROR: food_menu.txt not found![/red]")
+        session.console.print("[red]ERROR: food_menu.txt not found![/red]")
     
-    Prompt.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to main menu[/bold green]")
 
-def bank_menu():
+def balance_status(session):
+    """Print the player's current balance under a menu title"""
+    user_balance = load_balance(session, session.user) or 0
+    
+    session.console.print(f"\n[green]Current Balance: {user_balance} holos[/green]")
+    session.console.print("=" * 50)
+
+def bank_menu(session):
     """Bank menu with credit management options"""
-    while True:
-        clear_screen()
-        console.print(Panel("[bold cyan]BANKING SYSTEM[/bold cyan]", border_style="cyan"))
-        
-        # Load user holos
-        holos = load_user_holos()
-        user_balance = holos.get(current_user, 0)
-        
-        console.print(f"\n[green]Current Balance: {user_balance} holos[/green]")
-        console.print("=" * 50)
-        
-        console.print("\n[bold yellow]BANKING OPTIONS:[/bold yellow]")
-        
-        bank_table = Table(show_header=False, box=box.ASCII2, border_style="cyan")
-        bank_table.add_column("Option", style="bright_green", width=10)
-        bank_table.add_column("Description", style="white", width=50)
-        
-        bank_options = [
-            ("1", "Check Balance"),
-            ("2", "Transfer holos"),
-            ("3", "Return to Main Menu")
-        ]
-        
-        for option, description in bank_options:
-            bank_table.add_row(f"[{option}]", description)
-        
-        console.print(bank_table)
-        
-        choice = Prompt.ask(
-            "\n[bold bright_green]SELECT OPTION[/bold bright_green]",
-            choices=["1", "2", "3"],
-            default="3"
-        )
-        
-        if choice == "1":
-            check_balance()
-        elif choice == "2":
-            transfer_holos()
-        elif choice == "3":
-            break
+    menus.run(session, 'bank_menu')
 
-def check_balance():
+def check_balance(session):
     """Display current user's credit balance"""
-    clear_screen()
-    console.print(Panel("[bold cyan]ACCOUNT BALANCE[/bold cyan]", border_style="cyan"))
+    clear_screen(session)
+    session.console.print(Panel("[bold cyan]ACCOUNT BALANCE[/bold cyan]", border_style="cyan"))
     
     # Load user holos
-    holos = load_user_holos()
-    user_balance = holos.get(current_user, 0)
+    user_balance = load_balance(session, session.user) or 0
     
-    console.print("\n" * 3)
-    console.print(Align.center(f"[bold bright_green]CURRENT BALANCE[/bold bright_green]"))
-    console.print(Align.center(f"[bold bright_green]{user_balance} holos[/bold bright_green]"))
-    console.print("\n" * 3)
+    session.console.print("\n" * 3)
+    session.console.print(Align.center(f"[bold bright_green]CURRENT BALANCE[/bold bright_green]"))
+    session.console.print(Align.center(f"[bold bright_green]{user_balance} holos[/bold bright_green]"))
+    session.console.print("\n" * 3)
     
-    # Show recent transactions (placeholder for future enhancement)
-    console.print("[dim]Recent transactions will appear here in future updates.[/dim]")
+    # Show recent transactions from the holo ledger
+    recent = storage.recent_transactions(session.user)
+    if not recent:
+        session.console.print("[dim]No recent transactions.[/dim]")
+    else:
+        history_table = Table(title="Recent Transactions", box=box.ASCII2, border_style="cyan")
+        history_table.add_column("Time", style="white")
+        history_table.add_column("Amount", style="yellow", justify="right")
+        history_table.add_column("Details", style="bright_green")
+        
+        for record in recent:
+            history_table.add_row(record.timestamp, f"{record.delta:+d} holos", escape(record.memo))
+        
+        session.console.print(history_table)
     
-    Prompt.ask("\n[bold green]Press ENTER to return to bank menu[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to bank menu[/bold green]")
 
-def transfer_holos():
+def transfer_holos(session):
     """Transfer holos between users"""
-    clear_screen()
-    console.print(Panel("[bold cyan]CREDIT TRANSFER SYSTEM[/bold cyan]", border_style="cyan"))
-    
-    # Load user holos
-    holos = load_user_holos()
-    user_balance = holos.get(current_user, 0)
-    
-    console.print(f"\n[green]Your Balance: {user_balance} holos[/green]")
-    console.print("=" * 50)
-    
-    # Get recipient
-    recipient = Prompt.ask("\n[bold green]Enter recipient username[/bold green]")
-    
-    if recipient not in holos:
-        console.print(f"[red]ERROR: User '{recipient}' not found![/red]")
-        Prompt.ask("\n[bold green]Press ENTER to retry transfer[/bold green]")
-        transfer_holos()
-    
-    
-    # Get transfer amount
-    try:
-        amount = IntPrompt.ask(
-            "[bold green]Enter amount to transfer[/bold green]"
-        )
-        if amount > user_balance and recipient != current_user:
-            console.print(f"[red]ERROR: Insufficient funds! You only have {user_balance} holos.[/red]")
-            Prompt.ask("\n[bold green]Press ENTER to retry transfer[/bold green]")
-            transfer_holos()
-        if amount < 0:
-            console.print("[red]ERROR: Invalid amount![/red]")
-            Prompt.ask("\n[bold green]Press ENTER to retry transfer[/bold green]")
-            transfer_holos()
-    except ValueError:
-        console.print("[red]ERROR: Invalid amount![/red]")
-        Prompt.ask("\n[bold green]Press ENTER to return to bank menu[/bold green]")
-        return
+    key = new_key()  # kept across retries, so a transfer that went through isn't repeated
     
-    # Confirm transfer
-    if Confirm.ask(f"[bold yellow]Confirm transfer of {amount} holos to {recipient}?[/bold yellow]"):
-        # Process transfer
-        if recipient == current_user:
-            holos[current_user] += amount
-        else:
-            holos[current_user] -= amount
-            holos[recipient] += amount
-        
-        if save_user_holos(holos):
-            console.print(f"\n[bold bright_green]TRANSFER SUCCESSFUL![/bold bright_green]")
-            console.print(f"[green]Transferred {amount} holos to {recipient}[/green]")
-            console.print(f"[green]Your new balance: {holos[current_user]} holos[/green]")
-            console.print(f"[green]{recipient}'s new balance: {holos[recipient]} holos[/green]")
-        else:
-            console.print("[red]ERROR: Transfer failed![/red]")
-    
-    Prompt.ask("\n[bold green]Press ENTER to return to bank menu[/bold green]")
-    return
-
-def maintenance_menu():
-    """Maintenance menu with sub-options"""
     while True:
-        clear_screen()
-        console.print(Panel("[bold cyan]MAINTENANCE SYSTEMS[/bold cyan]", border_style="cyan"))
+        clear_screen(session)
+        session.console.print(Panel("[bold cyan]CREDIT TRANSFER SYSTEM[/bold cyan]", border_style="cyan"))
         
-        console.print("\n[bold yellow]MAINTENANCE OPTIONS:[/bold yellow]")
-        console.print("=" * 40)
-        
-        maintenance_table = Table(show_header=False, box=box.ASCII2, border_style="cyan")
-        maintenance_table.add_column("Option", style="bright_green", width=10)
-        maintenance_table.add_column("Description", style="white", width=50)
+        # Load user holos
+        user_balance = load_balance(session, session.user) or 0
         
-        maintenance_options = [
-            ("1", "Open Maintenance Hatch"),
-            ("2", "View Maintenance Notes"),
-            ("3", "Return to Main Menu")
-        ]
+        session.console.print(f"\n[green]Your Balance: {user_balance} holos[/green]")
+        session.console.print("=" * 50)
         
-        for option, description in maintenance_options:
-            maintenance_table.add_row(f"[{option}]", description)
+        # Get recipient; a blank answer leaves the transfer
+        recipient = session.ask("\n[bold green]Enter recipient username (blank to cancel)[/bold green]")
+        if not recipient:
+            return
         
-        console.print(maintenance_table)
+        if load_balance(session, recipient) is None:
+            session.console.print(f"[red]ERROR: User '{escape(recipient)}' not found![/red]")
+            session.ask("\n[bold green]Press ENTER to retry transfer[/bold green]")
+            continue
         
-        choice = Prompt.ask(
-            "\n[bold bright_green]SELECT OPTION[/bold bright_green]",
-            choices=["1", "2", "3"],
-            default="3"
-        )
+        # Get transfer amount
+        answer = session.ask("[bold green]Enter amount to transfer (blank to cancel)[/bold green]")
+        if not answer:
+            return
+        try:
+            amount = int(answer)
+        except ValueError:
+            session.console.print("[red]ERROR: Invalid amount![/red]")
+            session.ask("\n[bold green]Press ENTER to retry transfer[/bold green]")
+            continue
+        try:
+            check_transfer(session.user, recipient, amount, lambda username: load_balance(session, username))
+        except Refused as e:
+            session.console.print(f"[red]ERROR: {escape(str(e))}![/red]")
+            session.ask("\n[bold green]Press ENTER to retry transfer[/bold green]")
+            continue
+        break
+    
+    # Confirm transfer
+    if session.confirm(f"[bold yellow]Confirm transfer of {amount} holos to {escape(recipient)}?[/bold yellow]"):
+        receipt = send_holos(session, recipient, amount, key)
+        while receipt is None and session.confirm("[bold yellow]Retry transfer?[/bold yellow]"):
+            receipt = send_holos(session, recipient, amount, key)
         
-        if choice == "1":
-            open_maintenance_hatch()
-        elif choice == "2":
-            view_maintenance_notes()
-        elif choice == "3":
-            break
+        if receipt is not None:
+            audit.emit('transfer', session.user, recipient=recipient, amount=amount)
+            session.console.print(f"\n[bold bright_green]TRANSFER SUCCESSFUL![/bold bright_green]")
+            session.console.print(f"[green]Transferred {amount} holos to {escape(recipient)}[/green]")
+            session.console.print(f"[green]Your new balance: {load_balance(session, session.user)} holos[/green]")
+            session.console.print(f"[green]{escape(recipient)}'s new balance: {load_balance(session, recipient)} holos[/green]")
+    
+    session.ask("\n[bold green]Press ENTER to return to bank menu[/bold green]")
+
+def maintenance_menu(session):
+    """Maintenance menu with sub-options"""
+    menus.run(session, 'maintenance_menu')
 
-def open_maintenance_hatch():
+def open_maintenance_hatch(session):
     """Open maintenance hatch with user input"""
-    clear_screen()
-    console.print(Panel("[bold cyan]MAINTENANCE HATCH ACCESS[/bold cyan]", border_style="cyan"))
+    clear_screen(session)
+    session.console.print(Panel("[bold cyan]MAINTENANCE HATCH ACCESS[/bold cyan]", border_style="cyan"))
     
-    console.print("\n[yellow]Enter maintenance hatch number to access:[/yellow]")
+    session.console.print("\n[yellow]Enter maintenance hatch number to access:[/yellow]")
     
     try:
-        hatch_number = Prompt.ask("[bold green]Hatch Number[/bold green]")
+        hatch = normalize_hatch(session.ask("[bold green]Hatch Number[/bold green]"))
         
-        if hatch_number:
-            console.print(f"\n[green]Accessing Hatch-{hatch_number}...[/green]")
-            time.sleep(1)
+        if hatch:
+            session.console.print(f"\n[green]Accessing {escape(hatch)}...[/green]")
+            session.pacing.sleep(1)
             
             # Simulate hatch opening
-            with Progress(
+            from rich.progress import Progress, BarColumn, TextColumn, SpinnerColumn
+            with session.pacing.animation(), Progress(
                 SpinnerColumn(),
                 TextColumn("[bold green]>>[/bold green] {task.description}"),
                 BarColumn(bar_width=30, complete_style="bright_green"),
-                console=console
+                console=session.console
             ) as progress:
                 task = progress.add_task("OPENING HATCH", total=100)
                 while not progress.finished:
                     progress.update(task, advance=1)
-                    time.sleep(0.02)
+                    session.pacing.sleep(0.02)
+            
+            session.console.print(f"\n[bold bright_green]{escape(hatch)} OPENED SUCCESSFULLY[/bold bright_green]")
+            session.console.print(f"[green]Maintenance access granted.[/green]")
             
-            console.print(f"\n[bold bright_green]HATCH-{hatch_number} OPENED SUCCESSFULLY[/bold bright_green]")
-            console.print(f"[green]Maintenance access granted.[/green]")
+            notes = load_hatch_notes(hatch)
+            if notes:
+                priorities = [note_priority(note) for _, note in notes]
+                # The most urgent note sets the hatch's priority
+                priority = next((p for p in PRIORITIES if p in priorities), None)
+                if priority:
+                    style = PRIORITY_STYLES[priority]
+                    session.console.print(f"\n[{style}]PRIORITY: {priority}[/{style}]")
+                for heading, note in notes:
+                    print_maintenance_note(session, heading, note)
+            else:
+                session.console.print(f"\n[yellow]No maintenance notes on file for {escape(hatch)}.[/yellow]")
         else:
-            console.print("[red]ERROR: Invalid hatch number![/red]")
+            session.console.print("[red]ERROR: Invalid hatch number![/red]")
     
     except Exception as e:
-        console.print(f"[red]ERROR: {e}[/red]")
+        session.console.print(f"[red]ERROR: {escape(str(e))}[/red]")
     
-    Prompt.ask("\n[bold green]Press ENTER to return to maintenance menu[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to maintenance menu[/bold green]")
 
-def view_maintenance_notes():
-    """Display maintenance notes from file"""
-    clear_screen()
-    console.print(Panel("[bold cyan]MAINTENANCE NOTES[/bold cyan]", border_style="cyan"))
+def view_maintenance_notes(session):
+    """Display maintenance notes from file, optionally only one priority"""
+    choice = session.ask(
+        "\n[bold green]Show priority[/bold green]",
+        choices=["ALL", *PRIORITIES],
+        default="ALL",
+        case_sensitive=False
+    ).upper()
+    priority = None if choice == "ALL" else choice
+    
+    clear_screen(session)
+    title = "MAINTENANCE NOTES" if priority is None else f"MAINTENANCE NOTES: {priority} PRIORITY"
+    session.console.print(Panel(f"[bold cyan]{title}[/bold cyan]", border_style="cyan"))
     
     try:
-        with open('maintenance_notes.txt', 'r') as f:
-            notes = []
-            for line in f:
-                line = line.strip()
-                if line and '|' in line:
-                    hatch, note = line.split('|', 1)
-                    notes.append((hatch, note))
+        notes = load_maintenance_notes(priority)
         
         if not notes:
-            console.print("[yellow]No maintenance notes available.[/yellow]")
+            session.console.print("[yellow]No maintenance notes available.[/yellow]")
         else:
             for hatch, note in notes:
-                console.print(f"\n[bold bright_green]{hatch}[/bold bright_green]")
-                console.print(f"[white]{note}[/white]")
-                console.print("─" * 80, style="dim")
+                print_maintenance_note(session, hatch, note)
         
     except FileNotFoundError:
-        console.print("[red]ERROR: maintenance_notes.txt not found![/red]")
+        session.console.print("[red]ERROR: maintenance_notes.txt not found![/red]")
     
-    Prompt.ask("\n[bold green]Press ENTER to return to maintenance menu[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to maintenance menu[/bold green]")
 
-def logout_user():
+def logout_user(session):
     """Logout current user and return to login"""
-    global current_user, current_role, user_permissions
+    with session.pacing.animation():
+        session.console.print(f"\n[bold yellow]Logging out {session.user}...[/bold yellow]")
+        session.pacing.sleep(1)
+        session.console.print("[green]User session terminated successfully.[/green]")
+        session.pacing.sleep(1)
     
-    console.print(f"\n[bold yellow]Logging out {current_user}...[/bold yellow]")
-    time.sleep(1)
-    console.print("[green]User session terminated successfully.[/green]")
-    time.sleep(1)
-    
-    current_user = None
-    current_role = None
-    user_permissions = []
+    audit.emit('logout', session.user)
+    session.logout()
 
-def exit_terminal():
+def exit_terminal(session):
     """Exit terminal with shutdown sequence"""
-    console.print("\n[bold red]INITIATING SHUTDOWN SEQUENCE...[/bold red]")
-    time.sleep(1)
-    console.print("[red]Logging out user...[/red]")
-    time.sleep(1)
-    console.print("[red]Closing all connections...[/red]")
-    time.sleep(1)
-    console.print("[bold bright_green]Goodbye, user. Iron Ring terminal signing off.[/bold bright_green]")
-    time.sleep(2)
-
-def personal_menu():
+    with session.pacing.animation():
+        session.console.print("\n[bold red]INITIATING SHUTDOWN SEQUENCE...[/bold red]")
+        session.pacing.sleep(1)
+        session.console.print("[red]Logging out user...[/red]")
+        session.pacing.sleep(1)
+        session.console.print("[red]Closing all connections...[/red]")
+        session.pacing.sleep(1)
+        session.console.print("[bold bright_green]Goodbye, user. Iron Ring terminal signing off.[/bold bright_green]")
+        session.pacing.sleep(2)
+
+def personal_menu(session):
     """Personal menu with inventory management options"""
-    while True:
-        clear_screen()
-        console.print(Panel("[bold cyan]PERSONAL MENU[/bold cyan]", border_style="cyan"))
-        
-        # Load user holos for display
-        holos = load_user_holos()
-        user_balance = holos.get(current_user, 0)
-        
-        console.print(f"\n[green]Current Balance: {user_balance} holos[/green]")
-        console.print("=" * 50)
-        
-        console.print("\n[bold yellow]PERSONAL OPTIONS:[/bold yellow]")
-        
-        personal_table = Table(show_header=False, box=box.ASCII2, border_style="cyan")
-        personal_table.add_column("Option", style="bright_green", width=10)
-        personal_table.add_column("Description", style="white", width=50)
-        
-        personal_options = [
-            ("1", "Inventory - View Character Sheet & Items"),
-            ("2", "Manage Inventory - Add/Delete Items"),
-            ("3", "Return to Main Menu")
-        ]
-        
-        for option, description in personal_options:
-            personal_table.add_row(f"[{option}]", description)
-        
-        console.print(personal_table)
-        
-        choice = Prompt.ask(
-            "\n[bold bright_green]SELECT OPTION[/bold bright_green]",
-            choices=["1", "2", "3"],
-            default="3"
-        )
-        
-        if choice == "1":
-            view_inventory()
-        elif choice == "2":
-            manage_inventory()
-        elif choice == "3":
-            break
+    menus.run(session, 'personal_menu')
 
-def view_inventory():
+def view_inventory(session):
     """Display user's character sheet and inventory"""
-    clear_screen()
-    console.print(Panel("[bold cyan]CHARACTER INVENTORY[/bold cyan]", border_style="cyan"))
+    clear_screen(session)
+    session.console.print(Panel("[bold cyan]CHARACTER INVENTORY[/bold cyan]", border_style="cyan"))
     
     # Load user holos
-    holos = load_user_holos()
-    user_balance = holos.get(current_user, 0)
+    user_balance = load_balance(session, session.user) or 0
     
     # Display character info
-    console.print(f"\n[bold bright_green]CHARACTER INFORMATION[/bold bright_green]")
-    console.print("=" * 50)
-    console.print(f"[white]Username: {current_user.upper()}[/white]")
-    console.print(f"[white]Role: {current_role}[/white]")
-    console.print(f"[white]Holo Balance: {user_balance} holos[/white]")
-    console.print(f"[white]Security Level: {len(user_permissions)}/7[/white]")
+    session.console.print(f"\n[bold bright_green]CHARACTER INFORMATION[/bold bright_green]")
+    session.console.print("=" * 50)
+    session.console.print(f"[white]Username: {session.user.upper()}[/white]")
+    session.console.print(f"[white]Role: {session.role}[/white]")
+    session.console.print(f"[white]Holo Balance: {user_balance} holos[/white]")
+    session.console.print(f"[white]Security Level: {len(session.permissions)}/7[/white]")
 
-    console.print("\n" + "=" * 50)
+    session.console.print("\n" + "=" * 50)
     
     # Load and display inventory
     try:
-        with open('user_inventory.txt', 'r') as f:
-            user_items = []
-            for line in f:
-                line = line.strip()
-                if line and ':' in line:
-                    username, item_info = line.split(':', 1)
-                    if username == current_user:
-                        if '|' in item_info:
-                            item_name, description, quantity = item_info.split('|')
-                            user_items.append((item_name, description, quantity))
+        user_items = load_user_inventory(session.user)
+        
+        if not user_items:
+            session.console.print("\n[yellow]No items in inventory.[/yellow]")
+        else:
+            session.console.print(f"\n[bold bright_green]INVENTORY ITEMS ({len(user_items)} items)[/bold bright_green]")
             
-            if not user_items:
-                console.print("\n[yellow]No items in inventory.[/yellow]")
-            else:
-                console.print(f"\n[bold bright_green]INVENTORY ITEMS ({len(user_items)} items)[/bold bright_green]")
-                
-                inventory_table = Table(title="Personal Inventory", box=box.ASCII2, border_style="cyan")
-                inventory_table.add_column("Item", style="bright_green")
-                inventory_table.add_column("Description", style="white")
-                inventory_table.add_column("Quantity", style="yellow")
-                
-                for item_name, description, quantity in user_items:
-                    inventory_table.add_row(item_name, description, quantity)
-                
-                console.print(inventory_table)
+            inventory_table = Table(title="Personal Inventory", box=box.ASCII2, border_style="cyan")
+            inventory_table.add_column("Item", style="bright_green")
+            inventory_table.add_column("Description", style="white")
+            inventory_table.add_column("Quantity", style="yellow")
+            
+            for item_name, description, quantity in user_items:
+                inventory_table.add_row(escape(item_name), escape(description), escape(quantity))
+            
+            session.console.print(inventory_table)
         
     except FileNotFoundError:
-        console.print("[red]ERROR: user_inventory.txt not found![/red]")
+        session.console.print("[red]ERROR: user_inventory.txt not found![/red]")
     
-    Prompt.ask("\n[bold green]Press ENTER to return to personal menu[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to personal menu[/bold green]")
 
-def manage_inventory():
+def manage_inventory(session):
     """Manage inventory - add or delete items"""
-    while True:
-        clear_screen()
-        console.print(Panel("[bold cyan]INVENTORY MANAGEMENT[/bold cyan]", border_style="cyan"))
-        
-        console.print("\n[bold yellow]MANAGEMENT OPTIONS:[/bold yellow]")
-        
-        manage_table = Table(show_header=False, box=box.ASCII2, border_style="cyan")
-        manage_table.add_column("Option", style="bright_green", width=10)
-        manage_table.add_column("Description", style="white", width=50)
-        
-        manage_options = [
-            ("1", "Add New Item"),
-            ("2", "Delete Item"),
-            ("3", "Return to Personal Menu")
-        ]
-        
-        for option, description in manage_options:
-            manage_table.add_row(f"[{option}]", description)
-        
-        console.print(manage_table)
-        
-        choice = Prompt.ask(
-            "\n[bold bright_green]SELECT OPTION[/bold bright_green]",
-            choices=["1", "2", "3"],
-            default="3"
-        )
-        
-        if choice == "1":
-            add_inventory_item()
-        elif choice == "2":
-            delete_inventory_item()
-        elif choice == "3":
-            break
+    menus.run(session, 'manage_inventory')
 
-def add_inventory_item():
+def add_inventory_item(session):
     """Add a new item to user's inventory"""
-    clear_screen()
-    console.print(Panel("[bold cyan]ADD INVENTORY ITEM[/bold cyan]", border_style="cyan"))
+    clear_screen(session)
+    session.console.print(Panel("[bold cyan]ADD INVENTORY ITEM[/bold cyan]", border_style="cyan"))
     
-    console.print("\n[yellow]Enter item details:[/yellow]")
+    session.console.print("\n[yellow]Enter item details:[/yellow]")
     
-    item_name = Prompt.ask("[bold green]Item Name[/bold green]")
+    item_name = session.ask("[bold green]Item Name[/bold green]")
     if not item_name:
-        console.print("[red]ERROR: Item name cannot be empty![/red]")
-        Prompt.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
+        session.console.print("[red]ERROR: Item name cannot be empty![/red]")
+        session.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
         return
     
-    description = Prompt.ask("[bold green]Item Description[/bold green]")
+    description = session.ask("[bold green]Item Description[/bold green]")
     if not description:
-        console.print("[red]ERROR: Item description cannot be empty![/red]")
-        Prompt.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
+        session.console.print("[red]ERROR: Item description cannot be empty![/red]")
+        session.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
         return
     
-    quantity = Prompt.ask(
+    quantity = session.ask(
         "[bold green]Quantity[/bold green]",
         default="1"
     )
     
     # Add item to inventory file
     try:
-        with open('user_inventory.txt', 'a') as f:
-            f.write(f"{current_user}:{item_name}|{description}|{quantity}\n")
+        storage.add_inventory_item(session.user, item_name, description, quantity)
         
-        console.print(f"\n[bold bright_green]ITEM ADDED SUCCESSFULLY![/bold bright_green]")
-        console.print(f"[green]Added: {item_name}[/green]")
-        console.print(f"[green]Quantity: {quantity}[/green]")
+        session.console.print(f"\n[bold bright_green]ITEM ADDED SUCCESSFULLY![/bold bright_green]")
+        session.console.print(f"[green]Added: {escape(item_name)}[/green]")
+        session.console.print(f"[green]Quantity: {escape(quantity)}[/green]")
         
     except Exception as e:
-        console.print(f"[red]ERROR: Could not add item: {e}[/red]")
+        session.console.print(f"[red]ERROR: Could not add item: {escape(str(e))}[/red]")
     
-    Prompt.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
 
-def delete_inventory_item():
+def delete_inventory_item(session):
     """Delete an item from user's inventory"""
-    clear_screen()
-    console.print(Panel("[bold cyan]DELETE INVENTORY ITEM[/bold cyan]", border_style="cyan"))
+    clear_screen(session)
+    session.console.print(Panel("[bold cyan]DELETE INVENTORY ITEM[/bold cyan]", border_style="cyan"))
     
     # Load current inventory
     try:
-        with open('user_inventory.txt', 'r') as f:
-            lines = f.readlines()
-        
-        user_items = []
-        for line in lines:
-            line = line.strip()
-            if line and ':' in line:
-                username, item_info = line.split(':', 1)
-                if username == current_user:
-                    if '|' in item_info:
-                        item_name, description, quantity = item_info.split('|')
-                        user_items.append((item_name, description, quantity))
+        user_items = load_user_inventory(session.user)
         
         if not user_items:
-            console.print("\n[yellow]No items in inventory to delete.[/yellow]")
-            Prompt.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
+            session.console.print("\n[yellow]No items in inventory to delete.[/yellow]")
+            session.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
             return
         
         # Display items for selection
-        console.print(f"\n[bold yellow]SELECT ITEM TO DELETE:[/bold yellow]")
+        session.console.print(f"\n[bold yellow]SELECT ITEM TO DELETE:[/bold yellow]")
         
         delete_table = Table(title="Your Inventory", box=box.ASCII2, border_style="cyan")
         delete_table.add_column("Item #", style="bright_green")
@@ -846,78 +845,74 @@ def delete_inventory_item():
         delete_table.add_column("Quantity", style="yellow")
         
         for i, (item_name, description, quantity) in enumerate(user_items, 1):
-            delete_table.add_row(str(i), item_name, description, quantity)
+            delete_table.add_row(str(i), escape(item_name), escape(description), escape(quantity))
         
-        console.print(delete_table)
+        session.console.print(delete_table)
         
         # Get user selection
         try:
-            choice = IntPrompt.ask(
+            choice = session.ask_int(
                 "\n[bold green]Select item number to delete[/bold green]"
             )
             
             if 1 <= choice <= len(user_items):
                 selected_item = user_items[choice - 1][0]
                 
-                if Confirm.ask(f"[bold red]Confirm deletion of '{selected_item}'?[/bold red]"):
-                    # Remove the item from the file
-                    new_lines = []
-                    item_found = False
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if line and ':' in line:
-                            username, item_info = line.split(':', 1)
-                            if username == current_user and item_info.startswith(selected_item + '|'):
-                                item_found = True
-                                continue  # Skip this line (delete the item)
-                        new_lines.append(line)
-                    
-                    if item_found:
-                        # Write back the file without the deleted item
-                        with open('user_inventory.txt', 'w') as f:
-                            for line in new_lines:
-                                f.write(line + '\n')
-                        
-                        console.print(f"\n[bold bright_green]ITEM DELETED SUCCESSFULLY![/bold bright_green]")
-                        console.print(f"[green]Deleted: {selected_item}[/green]")
+                if session.confirm(f"[bold red]Confirm deletion of '{escape(selected_item)}'?[/bold red]"):
+                    # Tombstone the item's rows; compaction removes them later
+                    if storage.delete_inventory_item(session.user, selected_item):
+                        session.console.print(f"\n[bold bright_green]ITEM DELETED SUCCESSFULLY![/bold bright_green]")
+                        session.console.print(f"[green]Deleted: {escape(selected_item)}[/green]")
                     else:
-                        console.print("[red]ERROR: Item not found in inventory![/red]")
+                        session.console.print("[red]ERROR: Item not found in inventory![/red]")
                 
         except ValueError:
-            console.print("[red]ERROR: Invalid selection![/red]")
+            session.console.print("[red]ERROR: Invalid selection![/red]")
         
     except FileNotFoundError:
-        console.print("[red]ERROR: user_inventory.txt not found![/red]")
+        session.console.print("[red]ERROR: user_inventory.txt not found![/red]")
     except Exception as e:
-        console.print(f"[red]ERROR: {e}[/red]")
+        session.console.print(f"[red]ERROR: {escape(str(e))}[/red]")
     
-    Prompt.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
+    session.ask("\n[bold green]Press ENTER to return to inventory management[/bold green]")
 
-@app.command()
-def main():
-    """Iron Ring Space Station Terminal - Retro DOS Style CLI"""
+def boot(session):
+    """Play the boot sequence while the data files load in the background"""
+    loader = threading.Thread(target=storage.preload, daemon=True)
+    loader.start()
+    loading_screen(session)
+    loader.join()
+
+def run_terminal(session=None):
+    """Run login and menu sessions until the player exits"""
+    if session is None:
+        session = Session(console)
     try:
         while True:
-            clear_screen()
-            print_ascii_art()
-            loading_screen()
+            clear_screen(session)
+            print_ascii_art(session)
+            boot(session)
             
-            if not login_screen():
-                console.print("\n[bold red]TERMINAL LOCKED. EXITING.[/bold red]")
+            if not login_screen(session):
+                session.console.print("\n[bold red]TERMINAL LOCKED. EXITING.[/bold red]")
                 break
             
-            main_menu()
+            main_menu(session)
             
             # After logout, ask if user wants to exit completely
-            if Confirm.ask("\n[bold yellow]Exit terminal completely?[/bold yellow]"):
-                exit_terminal()
+            if session.confirm("\n[bold yellow]Exit terminal completely?[/bold yellow]"):
+                exit_terminal(session)
                 break
                 
     except KeyboardInterrupt:
-        console.print("\n\n[bold red]TERMINAL INTERRUPTED BY USER[/bold red]")
-        exit_terminal()
+        session.console.print("\n\n[bold red]TERMINAL INTERRUPTED BY USER[/bold red]")
+        exit_terminal(session)
 
 if __name__ == "__main__":
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    app()
+    if len(sys.argv) > 1:
+        # Imported as a module so cli.py drives this same copy of the screens
+        sys.modules.setdefault('main', sys.modules['__main__'])
+        from cli import app
+        app()
+    else:
+        run_terminal()
@@ -0,0 +1,160 @@
+"""Declarative menu screens, compiled once per role
+
+A menu is a Menu of MenuOptions. Each option names the key the player
+types, its label, the function that handles it and the permission (a
+number from permissions.txt) it needs, if any, so adding a screen is one
+registration:
+
+    menus.option('bank_menu', '4', "Loan Office", 'loan_office')
+
+Handlers are named rather than passed, and looked up in the registry's
+namespace (main's globals) each time they are chosen, so the wrappers
+--profile puts around main's functions are what runs.
+
+For a role, compiled() turns a menu into a CompiledMenu: the keys the
+player may choose, a dict from key to option and the option table as a
+ready-built renderable. It is built on first use and kept, so a menu
+loop does a dict lookup per choice and never rebuilds its table.
+"""
+import threading
+
+from rich import box
+from rich.console import Group
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+
+
+class MenuOption:
+    """One choice in a menu"""
+
+    def __init__(self, key, label, handler=None, permission=None, confirm=None, leaves=False):
+        self.key = key
+        self.label = label
+        self.handler = handler        # name of a function taking the session, or None
+        self.permission = permission  # needed permission number, or None for everyone
+        self.confirm = confirm        # question to confirm before handling, or None
+        self.leaves = leaves          # whether the menu closes once the option is handled
+
+
+class Menu:
+    """A menu screen: a title, an optional status block and a table of options
+
+    status names a function printing the parts of the screen that change
+    between visits (such as the balance); render names a function building
+    the options renderable from (menu, options, permissions) in place of
+    the default heading, rule and table. Options the role lacks permission
+    for are left out, or listed but not selectable with show_restricted.
+    """
+
+    def __init__(self, name, title=None, heading=None, rule=None, status=None, render=None,
+                 default=None, show_restricted=False):
+        self.name = name
+        self.title = title
+        self.heading = heading
+        self.rule = rule
+        self.status = status
+        self.render = render
+        self.default = default
+        self.show_restricted = show_restricted
+        self.options = []
+
+
+class CompiledMenu:
+    """A menu as one role sees it"""
+
+    def __init__(self, menu, title, body, choices, dispatch, default):
+        self.menu = menu
+        self.title = title
+        self.body = body
+        self.choices = choices
+        self.dispatch = dispatch
+        self.default = default
+
+
+def options_table(menu, options, permissions):
+    """The default options renderable: heading, rule and a two-column table"""
+    table = Table(show_header=False, box=box.ASCII2, border_style="cyan")
+    table.add_column("Option", style="bright_green", width=10)
+    table.add_column("Description", style="white", width=50)
+    for option in options:
+        table.add_row(f"[{option.key}]", option.label)
+    parts = []
+    if menu.heading:
+        parts.append(Text.from_markup(f"\n[bold yellow]{menu.heading}[/bold yellow]"))
+    if menu.rule:
+        parts.append(Text(menu.rule))
+    return Group(*parts, table)
+
+
+class MenuRegistry:
+    """Menus by name, compiled per (role, permissions) on first use"""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.menus = {}
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, **kwargs):
+        """Register a menu screen (see Menu for the options)"""
+        self.menus[name] = Menu(name, **kwargs)
+        self._compiled = {}
+
+    def option(self, menu, key, label, handler=None, **kwargs):
+        """Add an option to a registered menu (see MenuOption for the options)"""
+        self.menus[menu].options.append(MenuOption(key, label, handler, **kwargs))
+        self._compiled = {}
+
+    def compiled(self, name, role, permissions):
+        """Return the CompiledMenu for the role, building it the first time"""
+        key = (name, role, permissions)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = self._compiled[key] = self._compile(self.menus[name], permissions)
+        return compiled
+
+    def _compile(self, menu, permissions):
+        allowed = [option for option in menu.options
+                   if option.permission is None or option.permission in permissions]
+        shown = menu.options if menu.show_restricted else allowed
+        if menu.render:
+            body = self.namespace[menu.render](menu, shown, permissions)
+        else:
+            body = options_table(menu, shown, permissions)
+        title = Panel(f"[bold cyan]{menu.title}[/bold cyan]", border_style="cyan") if menu.title else None
+        choices = [option.key for option in allowed]
+        default = menu.default if menu.default in choices else (choices[0] if choices else None)
+        return CompiledMenu(menu, title, body, choices, {option.key: option for option in allowed}, default)
+
+    def run(self, session, name):
+        """Show a menu and handle the player's choices until one leaves it"""
+        while True:
+            menu = self.compiled(name, session.role, session.permissions)
+            with session.screen.frame():
+                if menu.title is not None:
+                    session.console.print(session.render_cache.get(name + '_title', lambda: menu.title))
+                if menu.menu.status:
+                    self.namespace[menu.menu.status](session)
+                session.console.print(session.render_cache.get(
+                    name, lambda: menu.body, role=session.role, version=menu
+                ))
+
+            choice = session.ask(
+                "\n[bold bright_green]SELECT OPTION[/bold bright_green]",
+                choices=menu.choices,
+                default=menu.default
+            )
+
+            option = menu.dispatch.get(choice)
+            if option is None:
+                return  # the role has nothing it may choose here
+            if option.confirm and not session.confirm(option.confirm):
+                continue
+            if option.handler:
+                self.namespace[option.handler](session)
+            if option.leaves:
+                return
@@ -0,0 +1,112 @@
+"""Pacing profiles for the terminal's boot sequences, progress bars and pauses
+
+Every animation sleeps through pacing.sleep(), which scales the delay by
+the active profile and returns early once the player presses a key.
+A keypress skips the rest of the current animation, so wrap a multi-step
+sequence in `with pacing.animation():` to let one key skip all of it.
+
+Choose the profile with `--pacing` or IRON_RING_PACING. Sessions that
+are not on this process's terminal (such as players connected to the
+terminal server) use a Pacing with skippable=False, which never reads
+stdin.
+"""
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import termios
+    import tty
+    import select
+except ImportError:  # Windows
+    termios = None
+    import msvcrt
+
+PROFILES = {
+    'cinematic': 1.0,
+    'brisk': 0.25,
+    'instant': 0.0,
+}
+DEFAULT_PROFILE = 'cinematic'
+
+
+class Pacing:
+    """Scales animation delays by the active profile and lets a keypress skip them"""
+
+    def __init__(self, profile=None, skippable=True):
+        profile = profile or os.environ.get('IRON_RING_PACING', DEFAULT_PROFILE)
+        self.set_profile(profile if profile in PROFILES else DEFAULT_PROFILE)
+        self.skippable = skippable
+        self.skipped = False
+        self._depth = 0
+        self._saved_tty = None
+
+    def set_profile(self, name):
+        """Switch to the named profile"""
+        if name not in PROFILES:
+            raise ValueError(f"Unknown pacing profile '{name}' (choose from {', '.join(PROFILES)})")
+        self.profile = name
+        self.scale = PROFILES[name]
+
+    def _interactive(self):
+        if not self.skippable:
+            return False
+        try:
+            return sys.stdin.isatty()
+        except (AttributeError, ValueError):
+            return False
+
+    @contextmanager
+    def animation(self):
+        """Group delays so that one keypress skips all of them"""
+        outermost = self._depth == 0
+        if outermost:
+            self.skipped = False
+            if termios is not None and self.scale and self._interactive():
+                fd = sys.stdin.fileno()
+                self._saved_tty = termios.tcgetattr(fd)
+                tty.setcbreak(fd)
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if outermost and self._saved_tty is not None:
+                termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self._saved_tty)
+                self._saved_tty = None
+
+    def sleep(self, seconds):
+        """Pause for seconds scaled by the profile, unless the animation was skipped"""
+        # skipped belongs to the animation in progress; a pause on its own starts afresh
+        if self.scale == 0 or (self.skipped and self._depth):
+            return
+        with self.animation():
+            self._wait(seconds * self.scale)
+
+    def uniform(self, low, high):
+        """Pause for a random duration between low and high seconds"""
+        self.sleep(random.uniform(low, high))
+
+    def _wait(self, seconds):
+        if not self._interactive():
+            time.sleep(seconds)
+            return
+        if termios is not None:
+            ready, _, _ = select.select([sys.stdin], [], [], seconds)
+            if ready:
+                os.read(sys.stdin.fileno(), 64)
+                self.skipped = True
+            return
+
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if msvcrt.kbhit():
+                msvcrt.getwch()
+                self.skipped = True
+                return
+            time.sleep(0.01)
+
+
+pacing = Pacing()
@@ -0,0 +1,243 @@
+"""Per-call instrumentation of screens and loaders, off unless --profile is given
+
+Nothing is wrapped until enable() is called, so an unprofiled terminal
+runs exactly the code it always did. Once enabled, instrument() rebinds
+the named functions of a module to wrappers that record, per call:
+
+    call_seconds        wall time, including the time spent in calls it makes
+    input_wait_seconds  time spent waiting at a prompt
+    render_seconds      time spent in Rich printing and drawing frames
+    file_opens          files opened (through an audit hook)
+    read_bytes          bytes read, from /proc/thread-self/io (Linux only)
+    written_bytes       bytes written, likewise
+
+Each is observed into a histogram keyed by (metric, kind, name) in the
+registry. Counters are kept per thread, so sessions running side by side
+on the terminal server don't bleed into each other. dump() writes the
+registry as JSON and in the Prometheus text format.
+"""
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+SECONDS_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BYTES_BUCKETS = (0, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+METRICS = {
+    'call_seconds': ('Wall time per call', SECONDS_BUCKETS),
+    'input_wait_seconds': ('Time per call spent waiting for the player', SECONDS_BUCKETS),
+    'render_seconds': ('Time per call spent rendering with Rich', SECONDS_BUCKETS),
+    'file_opens': ('Files opened per call', COUNT_BUCKETS),
+    'read_bytes': ('Bytes read per call', BYTES_BUCKETS),
+    'written_bytes': ('Bytes written per call', BYTES_BUCKETS),
+}
+PROC_IO = '/proc/thread-self/io'
+
+
+class Histogram:
+    """Observations counted into fixed buckets, with their count, sum and maximum"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def cumulative(self):
+        """[(upper bound, observations at or below it)], ending with +Inf"""
+        total = 0
+        rows = []
+        for bound, n in zip(self.bounds + (float('inf'),), self.buckets):
+            total += n
+            rows.append((bound, total))
+        return rows
+
+
+class Registry:
+    """Histograms keyed by (metric, kind, name)"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric, kind, name, value):
+        with self._lock:
+            histogram = self._histograms.get((metric, kind, name))
+            if histogram is None:
+                histogram = self._histograms[(metric, kind, name)] = Histogram(METRICS[metric][1])
+            histogram.observe(value)
+
+    def snapshot(self):
+        """Return {(metric, kind, name): Histogram} sorted by key"""
+        with self._lock:
+            return dict(sorted(self._histograms.items()))
+
+    def to_json(self):
+        calls = {}
+        for (metric, kind, name), histogram in self.snapshot().items():
+            entry = calls.setdefault((kind, name), {'kind': kind, 'name': name, 'metrics': {}})
+            entry['metrics'][metric] = {
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'mean': histogram.sum / histogram.count,
+                'max': histogram.max,
+                'p50': histogram.quantile(0.5),
+                'p90': histogram.quantile(0.9),
+                'p99': histogram.quantile(0.99),
+                'buckets': [['+Inf' if bound == float('inf') else bound, n]
+                            for bound, n in histogram.cumulative()],
+            }
+        return json.dumps({'calls': list(calls.values())}, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        described = set()
+        for (metric, kind, name), histogram in self.snapshot().items():
+            full = f"iron_ring_{metric}"
+            if metric not in described:
+                described.add(metric)
+                lines.append(f"# HELP {full} {METRICS[metric][0]}")
+                lines.append(f"# TYPE {full} histogram")
+            labels = f'kind="{kind}",name="{name}"'
+            for bound, n in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{full}_bucket{{{labels},le="{le}"}} {n}')
+            lines.append(f"{full}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{full}_count{{{labels}}} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    """Wraps functions to record per-call metrics into a Registry once enabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.registry = Registry()
+        self._local = threading.local()
+
+    def _counters(self):
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = {'opens': 0, 'render': 0.0, 'input': 0.0, 'io_reads': 0}
+            try:
+                self._local.io = os.open(PROC_IO, os.O_RDONLY)
+                first, second = self._io(), self._io()
+                self._local.io_overhead = second[0] - first[0]  # what reading the file itself costs
+            except OSError:
+                self._local.io = None
+        return counters
+
+    def _io(self):
+        if self._local.io is None:
+            return None
+        fields = dict(line.split(': ') for line in os.pread(self._local.io, 4096, 0).decode().splitlines())
+        self._local.counters['io_reads'] += 1
+        return int(fields['rchar']), int(fields['wchar'])
+
+    def _audit(self, event, args):
+        if event == 'open' and self.enabled:
+            counters = getattr(self._local, 'counters', None)
+            if counters is not None:
+                counters['opens'] += 1
+
+    def enable(self):
+        """Start recording: install the open hook and time Rich output and prompts"""
+        if self.enabled:
+            return
+        self.enabled = True
+        sys.addaudithook(self._audit)
+
+        from rich.console import Console
+        from renderer import ScreenRenderer
+        from session import Session
+        for cls, names in ((Console, ('print', 'log')), (ScreenRenderer, ('draw',))):
+            for name in names:
+                setattr(cls, name, self._timed(getattr(cls, name), 'render'))
+        for name in ('ask', 'ask_int', 'confirm'):
+            setattr(Session, name, self._timed(getattr(Session, name), 'input'))
+
+    def _timed(self, func, counter):
+        """Wrap func to add its run time to this thread's counter (outermost call only)"""
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            counters = self._counters()
+            flag = 'in_' + counter
+            if getattr(self._local, flag, False):
+                return func(*args, **kwargs)
+            setattr(self._local, flag, True)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                counters[counter] += time.perf_counter() - started
+                setattr(self._local, flag, False)
+        return timed
+
+    def wrap(self, kind, func, name=None):
+        """Return func recording a call's metrics under (kind, name)"""
+        name = name or func.__name__
+        registry = self.registry
+
+        @functools.wraps(func)
+        def instrumented(*args, **kwargs):
+            counters = self._counters()
+            opens, render, waited = counters['opens'], counters['render'], counters['input']
+            io = self._io()
+            reads = counters['io_reads']
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                registry.observe('call_seconds', kind, name, elapsed)
+                registry.observe('input_wait_seconds', kind, name, counters['input'] - waited)
+                registry.observe('render_seconds', kind, name, counters['render'] - render)
+                registry.observe('file_opens', kind, name, counters['opens'] - opens)
+                if io is not None:
+                    # Each reading of the io file, ours and those of nested calls, shows up in rchar
+                    own = (counters['io_reads'] - reads + 1) * self._local.io_overhead
+                    after = self._io()
+                    registry.observe('read_bytes', kind, name, max(0, after[0] - io[0] - own))
+                    registry.observe('written_bytes', kind, name, after[1] - io[1])
+        return instrumented
+
+    def instrument(self, namespace, kind, names):
+        """Rebind each named function in a module (or instance) to its instrumented wrapper"""
+        if not self.enabled:
+            return
+        for name in names:
+            setattr(namespace, name, self.wrap(kind, getattr(namespace, name), name))
+
+    def dump(self, prefix):
+        """Write the registry to prefix.json and prefix.prom, returning the paths"""
+        paths = (prefix + '.json', prefix + '.prom')
+        with open(paths[0], 'w') as f:
+            f.write(self.registry.to_json())
+        with open(paths[1], 'w') as f:
+            f.write(self.registry.to_prometheus())
+        return paths
+
+
+profiler = Profiler()
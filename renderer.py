@@ -0,0 +1,121 @@
+"""In-process screen renderer for the menu screens
+
+Screens used to shell out to `clear` and reprint everything on every
+transition. ScreenRenderer clears with ANSI sequences instead, and menu
+loops draw inside `with screen.frame():`. Everything printed to the
+console inside that block is captured as one frame, compared line by line
+with the frame before it, and only the lines that changed are rewritten.
+The diff assumes the rows under the frame still hold it, so the session's
+prompts invalidate the renderer whenever they re-prompt (an invalid answer
+prints more lines and may scroll the terminal).
+
+RenderCache keeps the parts of a frame that never change for a role, such
+as the banner and the menu tables, as ready-made Rich segments.
+"""
+from contextlib import contextmanager
+
+from rich.segment import Segments
+
+CLEAR = '\x1b[H\x1b[2J'
+ERASE_LINE = '\x1b[K'
+ERASE_BELOW = '\x1b[J'
+
+# Rows left free under a frame for the prompt and the player's answer. A
+# taller frame would scroll the terminal and move every row, so it is
+# always repainted in full.
+PROMPT_ROWS = 4
+
+
+def move_to(row):
+    """ANSI sequence placing the cursor at the start of 1-based row"""
+    return f'\x1b[{row};1H'
+
+
+class ScreenRenderer:
+    """Keeps the last frame in memory and repaints only the lines that changed"""
+
+    def __init__(self, console):
+        self.console = console
+        self._lines = None
+        self._size = None
+
+    def _can_diff(self):
+        return self.console.is_terminal and not self.console.legacy_windows
+
+    def _write(self, text):
+        self.console.file.write(text)
+        self.console.file.flush()
+
+    def clear(self):
+        """Clear the terminal and forget the previous frame"""
+        self._lines = None
+        if self._can_diff():
+            self._write(CLEAR)
+        elif self.console.is_terminal:
+            self.console.clear()
+
+    @contextmanager
+    def frame(self):
+        """Capture everything printed in the block and draw it as one frame"""
+        with self.console.capture() as capture:
+            yield
+        self.draw(capture.get())
+
+    def draw(self, text):
+        """Draw pre-rendered text as the new frame"""
+        if not self._can_diff():
+            self.clear()
+            self._write(text)
+            return
+
+        lines = text.split('\n')
+        if lines and lines[-1] == '':
+            lines.pop()
+        size = self.console.size
+        previous = self._lines
+        if previous is None or size != self._size or len(lines) + PROMPT_ROWS > size.height:
+            previous = None
+
+        out = [CLEAR] if previous is None else []
+        for row, line in enumerate(lines):
+            if previous is None:
+                out.append(line + ERASE_LINE + '\n')
+            elif row >= len(previous) or previous[row] != line:
+                out.append(move_to(row + 1) + line + ERASE_LINE)
+        if previous is not None:
+            out.append(move_to(len(lines) + 1) + ERASE_BELOW)
+        self._write(''.join(out))
+
+        self._lines = lines
+        self._size = size
+
+    def invalidate(self):
+        """Force the next frame to be drawn in full"""
+        self._lines = None
+
+
+class RenderCache:
+    """Pre-rendered segments for screen parts that only change with role and terminal width
+
+    Entries are keyed by (name, role, terminal width) and hold the Rich
+    segments of the renderable, so printing one skips Rich's layout pass.
+    Passing a different version (such as the role's permissions) replaces
+    the entry.
+    """
+
+    def __init__(self, console):
+        self.console = console
+        self._entries = {}
+
+    def get(self, name, build, role=None, version=None):
+        """Return the cached Segments for name, rendering build() on a miss"""
+        key = (name, role, self.console.width)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            segments = Segments(list(self.console.render(build(), self.console.options)))
+            entry = self._entries[key] = (version, segments)
+        return entry[1]
+
+    def invalidate(self):
+        """Drop every cached entry"""
+        self._entries.clear()
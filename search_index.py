@@ -0,0 +1,619 @@
+"""On-disk inverted index over station news and maintenance notes
+
+The index maps every word to the records that contain it and where in
+each record it appears, so the search screen can rank matches, expand
+prefixes (`reac*`) and check phrases (`"life support"`) without reading
+the archives.
+
+search.idx is a header followed by segments. Each segment indexes a run
+of newly added records and is laid out as:
+
+    segment header      magic, body length, serial, docs, terms, a crc32
+                        of the body, and per source how many records are
+                        covered plus a crc32 of the last one
+    doc table           source (B) and record number (I) of each doc
+    term table          sorted terms, and per term its doc count and
+                        where its postings start
+    postings            per term: doc ids (I), weights (H), position
+                        offsets (I) and positions (H)
+
+When news or notes grow, only the new records are tokenized into a new
+segment at the end of the file. Small segments at the tail are merged
+into their neighbour so searches never touch more than a handful. If a
+source shrank or its last indexed record changed, the index is rebuilt.
+Segments are written without fsync, and merging rewrites the tail in
+place, so after a crash the file can end in a short segment or one whose
+bytes never all reached the disk. Either fails its length or body crc32
+when the file is next read, and it is cut off there with everything after
+it; the records it covered are simply indexed again.
+
+Writes hold search.idx's FileLock exclusive, searches hold it shared.
+The in-memory segment tables are guarded by a second lock, always taken
+after the FileLock.
+"""
+import heapq
+import itertools
+import math
+import os
+import re
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+
+from line_index import read_at
+from station_lock import lock_for
+
+MAGIC = b'IRSRCH02'
+SEGMENT_MAGIC = b'SEG2'
+SEGMENT_HEADER = struct.Struct('<4sQQIII')
+SOURCE_STATE = struct.Struct('<QI')
+MAX_SEGMENT_DOCS = 100000
+BUILD_CHUNK = 5000
+TITLE_WEIGHT = 3
+PREFIX_LIMIT = 200
+
+WORD = re.compile(r"[a-z0-9]+")
+QUERY_PART = re.compile(r'"([^"]*)"?|(\S+)')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has in is it of on or that the this to was were will with'.split()
+)
+
+
+def tokenize(text):
+    """Yield (position, word) for every indexable word in text"""
+    for position, match in enumerate(WORD.finditer(text.lower())):
+        word = match.group()
+        if word not in STOP_WORDS:
+            yield position, word
+
+
+def parse_query(query):
+    """Split a query into ('term', word), ('prefix', start) and ('phrase', [(offset, word)]) parts"""
+    parts = []
+    for match in QUERY_PART.finditer(query):
+        quoted, bare = match.groups()
+        text = quoted if quoted is not None else bare
+        prefix = quoted is None and text.endswith('*')
+        words = list(tokenize(text.rstrip('*') if prefix else text))
+        if not words:
+            continue
+        if len(words) == 1:
+            parts.append(('prefix' if prefix else 'term', words[0][1]))
+        else:
+            start = words[0][0]
+            parts.append(('phrase', [(position - start, word) for position, word in words]))
+    return parts
+
+
+def highlight_pattern(query):
+    """A case-insensitive regex matching the words of query, for highlighting hits"""
+    words = []
+    for kind, value in parse_query(query):
+        if kind == 'phrase':
+            words.extend(word for _, word in value)
+        elif kind == 'prefix':
+            words.append(value + '[a-z0-9]*')
+        else:
+            words.append(value)
+    if not words:
+        return None
+    return r'(?i)(?<![a-z0-9])(' + '|'.join(words) + r')(?![a-z0-9])'
+
+
+def _array(typecode, raw):
+    """An array of typecode holding the machine values in raw"""
+    values = array(typecode)
+    values.frombytes(raw)
+    return values
+
+
+def _record_crc(record):
+    return zlib.crc32('|'.join(record).encode('utf-8'))
+
+
+class Segment:
+    """One segment's doc and term tables, with its postings read from disk on demand"""
+
+    def __init__(self, offset, header, sources, body):
+        _, length, self.serial, self.docs, self.terms_count, self.crc = SEGMENT_HEADER.unpack_from(header)
+        self.offset = offset
+        self.length = length
+        self.state = [SOURCE_STATE.unpack_from(header, SEGMENT_HEADER.size + i * SOURCE_STATE.size)
+                      for i in range(sources)]
+        view = memoryview(body)
+        pos = 0
+        self.doc_sources = _array('B', view[pos:pos + self.docs])
+        pos += self.docs
+        self.doc_records = _array('I', view[pos:pos + 4 * self.docs])
+        pos += 4 * self.docs
+        (blob_length,) = struct.unpack_from('<Q', view, pos)
+        pos += 8
+        blob = bytes(view[pos:pos + blob_length]).decode('utf-8')
+        self.terms = blob.split('\n') if blob else []
+        pos += blob_length
+        self.df = _array('I', view[pos:pos + 4 * self.terms_count])
+        pos += 4 * self.terms_count
+        self.postings_at = _array('Q', view[pos:pos + 8 * self.terms_count])
+        pos += 8 * self.terms_count
+        self.postings_start = offset + self.header_size(sources) + pos
+        # Docs of one source sit in contiguous runs: [(source, first doc, end)]
+        self.runs = []
+        doc = 0
+        for source, group in itertools.groupby(self.doc_sources):
+            length = sum(1 for _ in group)
+            self.runs.append((source, doc, doc + length))
+            doc += length
+
+    @staticmethod
+    def header_size(sources):
+        return SEGMENT_HEADER.size + sources * SOURCE_STATE.size
+
+    def find(self, word):
+        """Index of word in the term table, or None"""
+        i = bisect_left(self.terms, word)
+        return i if i < len(self.terms) and self.terms[i] == word else None
+
+    def find_prefix(self, start):
+        """Indexes of every term beginning with start"""
+        i = bisect_left(self.terms, start)
+        j = i
+        while j < len(self.terms) and self.terms[j].startswith(start):
+            j += 1
+        return range(i, j)
+
+
+class Postings:
+    """Doc ids and weights of one term in one segment, with positions loaded when asked"""
+
+    def __init__(self, f, segment, term):
+        self.f = f
+        self.df = segment.df[term]
+        self.at = segment.postings_start + segment.postings_at[term]
+        raw = read_at(f, 6 * self.df, self.at)
+        self.docs = _array('I', raw[:4 * self.df])
+        self.weights = _array('H', raw[4 * self.df:])
+        self._offsets = None
+        self._positions = None
+        self._positions_at = self.at + 6 * self.df + 4 * (self.df + 1)
+
+    def find(self, doc):
+        """Position of doc in this term's postings, or None"""
+        i = bisect_left(self.docs, doc)
+        return i if i < self.df and self.docs[i] == doc else None
+
+    def offsets(self):
+        """Where each posting's positions start in the positions array, plus the end"""
+        self._load_positions()
+        return self._offsets
+
+    def _load_positions(self):
+        if self._positions is None:
+            self._offsets = _array('I', read_at(self.f, 4 * (self.df + 1), self.at + 6 * self.df))
+            self._positions = _array('H', read_at(self.f, 2 * self._offsets[-1], self._positions_at))
+
+    def positions(self, i=None):
+        """Word positions of the i'th posting, or of every posting"""
+        self._load_positions()
+        if i is None:
+            return self._positions
+        return self._positions[self._offsets[i]:self._offsets[i + 1]]
+
+    def best_weight(self):
+        """The highest weight of any posting"""
+        return max(self.weights)
+
+
+class SegmentBuilder:
+    """Accumulates tokenized records into the postings of a new segment"""
+
+    def __init__(self):
+        self.doc_sources = array('B')
+        self.doc_records = array('I')
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.doc_records)
+
+    def add(self, source, record_number, record):
+        """Tokenize one (left, right) record into the segment"""
+        doc = len(self.doc_records)
+        self.doc_sources.append(source)
+        self.doc_records.append(record_number)
+        left, right = record
+        title_words = len(WORD.findall(left.lower()))
+        found = {}
+        for position, word in enumerate(WORD.findall(f"{left} {right}".lower())[:0x10000]):
+            if word in STOP_WORDS:
+                continue
+            positions = found.get(word)
+            if positions is None:
+                found[word] = [position]
+            else:
+                positions.append(position)
+        postings = self.postings
+        for word, positions in found.items():
+            weight = len(positions)
+            if positions[0] < title_words:
+                weight += (TITLE_WEIGHT - 1) * bisect_left(positions, title_words)
+            entry = postings.get(word)
+            if entry is None:
+                entry = postings[word] = (array('I'), array('H'), array('I', [0]), array('H'))
+            docs, weights, offsets, all_positions = entry
+            docs.append(doc)
+            weights.append(min(weight, 0xFFFF))
+            all_positions.extend(positions)
+            offsets.append(len(all_positions))
+
+    def encode(self, serial, state):
+        """Serialize the segment, returning its bytes"""
+        terms = sorted(self.postings)
+        blob = '\n'.join(terms).encode('utf-8')
+        df = array('I')
+        postings_at = array('Q')
+        chunks = []
+        at = 0
+        for term in terms:
+            docs, weights, offsets, positions = self.postings[term]
+            df.append(len(docs))
+            postings_at.append(at)
+            for part in (docs, weights, offsets, positions):
+                raw = part.tobytes()
+                chunks.append(raw)
+                at += len(raw)
+        body = b''.join([
+            self.doc_sources.tobytes(), self.doc_records.tobytes(),
+            struct.pack('<Q', len(blob)), blob, df.tobytes(), postings_at.tobytes(),
+        ] + chunks)
+        header = SEGMENT_HEADER.pack(SEGMENT_MAGIC, len(body), serial, len(self.doc_records), len(terms),
+                                     zlib.crc32(body))
+        header += b''.join(SOURCE_STATE.pack(covered, crc) for covered, crc in state)
+        return header + body
+
+
+def merge_segments(f, segments):
+    """Combine consecutive segments into one SegmentBuilder"""
+    merged = SegmentBuilder()
+    for segment in segments:
+        base = len(merged)
+        merged.doc_sources.extend(segment.doc_sources)
+        merged.doc_records.extend(segment.doc_records)
+        for term_number, term in enumerate(segment.terms):
+            postings = Postings(f, segment, term_number)
+            entry = merged.postings.get(term)
+            if entry is None:
+                entry = merged.postings[term] = (array('I'), array('H'), array('I', [0]), array('H'))
+            docs, weights, offsets, positions = entry
+            shift = len(positions)
+            docs.extend(doc + base for doc in postings.docs)
+            weights.extend(postings.weights)
+            offsets.extend(offset + shift for offset in postings.offsets()[1:])
+            positions.extend(postings.positions())
+    return merged
+
+
+class SearchIndex:
+    """Ranked full-text search over several record sources
+
+    sources is a list of (name, count, records): count() returns how many
+    records the source has and records(start, stop) returns them as
+    (left, right) pairs in order.
+    """
+
+    def __init__(self, path, sources):
+        self.path = path
+        self.sources = sources
+        self.names = [name for name, _, _ in sources]
+        self.lock = lock_for(path)
+        self._lock = threading.RLock()
+        self._segments = []
+        self._signature = None
+
+    def _counts(self):
+        counts = []
+        for _, count, _ in self.sources:
+            try:
+                counts.append(count())
+            except FileNotFoundError:
+                counts.append(0)
+        return counts
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self, f):
+        """Re-read the segment tables if another writer changed the file"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        size = os.fstat(f.fileno()).st_size
+        header_size = Segment.header_size(len(self.sources))
+        known = {(s.offset, s.serial, s.length, s.crc): s for s in self._segments}
+        segments = []
+        offset = len(MAGIC)
+        if read_at(f, len(MAGIC), 0) == MAGIC:
+            while offset + header_size <= size:
+                header = read_at(f, header_size, offset)
+                magic, length, serial, _, _, crc = SEGMENT_HEADER.unpack_from(header)
+                if magic != SEGMENT_MAGIC or offset + header_size + length > size:
+                    break
+                segment = known.get((offset, serial, length, crc))
+                if segment is None:
+                    body = read_at(f, length, offset + header_size)
+                    if zlib.crc32(body) != crc:
+                        break  # torn or never fully written
+                    segment = Segment(offset, header, len(self.sources), body)
+                segments.append(segment)
+                offset += header_size + length
+        self._segments = segments
+        self._end = offset
+        self._signature = signature
+
+    def _state(self):
+        if self._segments:
+            return self._segments[-1].state
+        return [(0, 0)] * len(self.sources)
+
+    def _stale(self, counts):
+        """'rebuild', 'append' or None, comparing the index with the sources"""
+        for (_, _, records), (covered, crc), count in zip(self.sources, self._state(), counts):
+            if count < covered:
+                return 'rebuild'
+            if covered and _record_crc(records(covered - 1, covered)[0]) != crc:
+                return 'rebuild'
+        if any(count > covered for (covered, _), count in zip(self._state(), counts)):
+            return 'append'
+        return None
+
+    def refresh(self, force=False):
+        """Index records added since the last refresh, rebuilding if a source was rewritten"""
+        counts = self._counts()
+        if not force and self._segments and self._signature == self._file_signature() \
+                and self._stale(counts) is None:
+            return
+        with self.lock.exclusive(), self._lock:
+            try:
+                with os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b') as f:
+                    self._load(f)
+                    action = 'rebuild' if force or read_at(f, len(MAGIC), 0) != MAGIC else self._stale(counts)
+                    if action == 'rebuild':
+                        f.truncate(0)
+                        f.seek(0)
+                        f.write(MAGIC)
+                        self._segments = []
+                        self._end = len(MAGIC)
+                    if action is not None:
+                        self._index(f, counts)
+            finally:
+                self._signature = self._file_signature()
+
+    def pending(self):
+        """How many records were added to the sources since they were last indexed"""
+        counts = self._counts()
+        if self._signature != self._file_signature() and os.path.exists(self.path):
+            with self.lock.shared(), self._lock:
+                with open(self.path, 'rb') as f:
+                    self._load(f)
+        return sum(max(0, count - covered) for (covered, _), count in zip(self._state(), counts))
+
+    def rebuild(self):
+        """Re-index every source from scratch, returning the number of records indexed"""
+        self.refresh(force=True)
+        return sum(segment.docs for segment in self._segments)
+
+    def _index(self, f, counts):
+        state = [list(s) for s in self._state()]
+        builder = SegmentBuilder()
+        for source, ((_, _, records), count) in enumerate(zip(self.sources, counts)):
+            start = state[source][0]
+            while start < count:
+                chunk = records(start, min(start + BUILD_CHUNK, count))
+                if not chunk:
+                    break
+                for number, record in enumerate(chunk, start):
+                    builder.add(source, number, record)
+                start += len(chunk)
+                state[source] = [start, _record_crc(chunk[-1])]
+                if len(builder) >= MAX_SEGMENT_DOCS:
+                    self._append(f, builder, state)
+                    builder = SegmentBuilder()
+        if len(builder) or not self._segments:
+            self._append(f, builder, state)
+        self._merge_tail(f)
+
+    def _append(self, f, builder, state):
+        serial = self._segments[-1].serial + 1 if self._segments else 1
+        raw = builder.encode(serial, state)
+        f.seek(self._end)
+        f.write(raw)
+        f.truncate(self._end + len(raw))
+        header_size = Segment.header_size(len(self.sources))
+        self._segments.append(Segment(self._end, raw[:header_size], len(self.sources), raw[header_size:]))
+        self._end += len(raw)
+
+    def _merge_tail(self, f):
+        """Merge the last two segments while the older one is not much bigger"""
+        segments = self._segments
+        while len(segments) >= 2 and segments[-2].docs <= 2 * max(segments[-1].docs, 1) \
+                and segments[-2].docs + segments[-1].docs <= MAX_SEGMENT_DOCS:
+            tail = segments[-2:]
+            merged = merge_segments(f, tail)
+            state = tail[-1].state
+            del segments[-2:]
+            self._end = tail[0].offset
+            self._append(f, merged, state)
+
+    def search(self, query, sources=None, limit=10):
+        """Return (matches, exact, [(score, source name, record number)]) for the best limit matches
+
+        sources limits the search to those source names. Ranking stops as
+        soon as no remaining record can beat the ones found, so for phrase
+        queries matches may count records whose phrase was never checked;
+        exact says whether it did not.
+        """
+        parts = parse_query(query)
+        if not parts:
+            return 0, True, []
+        self.refresh()
+        allowed = {i for i, name in enumerate(self.names) if sources is None or name in sources}
+        with self.lock.shared():
+            with open(self.path, 'rb') as f:
+                with self._lock:
+                    self._load(f)
+                    segments = list(self._segments)
+                total_docs = sum(segment.docs for segment in segments) or 1
+                resolved = [(segment, self._resolve(f, segment, parts)) for segment in segments]
+                idf = self._idf(total_docs, [segment_parts for _, segment_parts in resolved])
+                best = []
+                matches = 0
+                exact = True
+                # Newest segment first, so older records only fill what is left
+                for segment, segment_parts in reversed(resolved):
+                    if segment_parts is None:
+                        continue
+                    found, ranked = self._rank(segment, segment_parts, idf, allowed, limit, best)
+                    matches += found
+                    exact = exact and ranked
+        best.sort(key=lambda hit: hit[:3], reverse=True)
+        return matches, exact, [(score, self.names[segment.doc_sources[doc]], segment.doc_records[doc])
+                                for score, _, doc, segment in best]
+
+    @staticmethod
+    def _resolve(f, segment, parts):
+        """Postings for each query part in one segment, or None if some part can't match there"""
+        resolved = []
+        for kind, value in parts:
+            if kind == 'term':
+                term = segment.find(value)
+                if term is None:
+                    return None
+                resolved.append((kind, [(value, Postings(f, segment, term), 0)]))
+            elif kind == 'prefix':
+                terms = segment.find_prefix(value)[:PREFIX_LIMIT]
+                if not terms:
+                    return None
+                resolved.append((kind, [(segment.terms[t], Postings(f, segment, t), 0) for t in terms]))
+            else:
+                words = []
+                for offset, word in value:
+                    term = segment.find(word)
+                    if term is None:
+                        return None
+                    words.append((word, Postings(f, segment, term), offset))
+                resolved.append((kind, words))
+        return resolved
+
+    @staticmethod
+    def _idf(total_docs, resolved):
+        df = {}
+        for parts in resolved:
+            for _, terms in parts or []:
+                for word, postings, _ in terms:
+                    df[word] = df.get(word, 0) + postings.df
+        return {word: math.log(1 + total_docs / count) for word, count in df.items()}
+
+    @staticmethod
+    def _rank(segment, parts, idf, allowed, limit, best):
+        """Push one segment's best matches onto the best heap
+
+        Returns how many records match and whether they were all checked.
+        """
+        def keep(score, doc):
+            item = (score, segment.serial, doc, segment)
+            if len(best) < limit:
+                heapq.heappush(best, item)
+            elif item[:3] > best[0][:3]:
+                heapq.heapreplace(best, item)
+
+        runs = [(start, stop) for source, start, stop in segment.runs if source in allowed]
+
+        if len(parts) == 1 and parts[0][0] == 'term':
+            # One word: rank straight off its postings, one slice per allowed run
+            word, postings, _ = parts[0][1][0]
+            matches = 0
+            for start, stop in runs:
+                i, j = bisect_left(postings.docs, start), bisect_left(postings.docs, stop)
+                matches += j - i
+                for weight, doc in heapq.nlargest(limit, zip(postings.weights[i:j], postings.docs[i:j])):
+                    keep(idf[word] * (1 + math.log(weight)), doc)
+            return matches, True
+
+        # Records holding every word of the query; phrases are checked while ranking
+        doc_sets = []
+        for kind, terms in parts:
+            if kind == 'prefix' and len(terms) > 1:
+                doc_sets.append(set().union(*(postings.docs for _, postings, _ in terms)))
+            else:
+                doc_sets.extend(postings.docs for _, postings, _ in terms)
+        doc_sets.sort(key=len)
+        candidates = set(doc_sets[0])
+        for docs in doc_sets[1:]:
+            candidates.intersection_update(docs)
+            if not candidates:
+                return 0, True
+        candidates = sorted(candidates, reverse=True)
+        if len(runs) < len(segment.runs):
+            ascending = candidates[::-1]
+            candidates = []
+            for start, stop in reversed(runs):
+                candidates.extend(reversed(ascending[bisect_left(ascending, start):bisect_left(ascending, stop)]))
+
+        has_phrase = any(kind == 'phrase' for kind, _ in parts)
+        ceiling = SearchIndex._ceiling(parts, idf)
+        matches = 0
+        for checked, doc in enumerate(candidates):
+            if len(best) >= limit and best[0][0] >= ceiling:
+                # Nothing left in this segment can outrank these; older segments are ranked on their own
+                if has_phrase:
+                    return matches + len(candidates) - checked, False
+                return len(candidates), True
+            score = 0.0
+            for kind, terms in parts:
+                part_score = SearchIndex._match(kind, terms, idf, doc)
+                if part_score is None:
+                    break
+                score += part_score
+            else:
+                matches += 1
+                keep(score, doc)
+        return matches, True
+
+    @staticmethod
+    def _ceiling(parts, idf):
+        """The highest score any record could reach"""
+        ceiling = 0.0
+        for kind, terms in parts:
+            scores = [idf[word] * (1 + math.log(postings.best_weight())) for word, postings, _ in terms]
+            ceiling += max(scores) if kind == 'prefix' else sum(scores)
+        return ceiling
+
+    @staticmethod
+    def _match(kind, terms, idf, doc):
+        """Score of one query part for doc, or None if it doesn't match
+
+        A word scores its idf times 1 + log(weight). A prefix scores its
+        best expansion and a phrase the sum of its words.
+        """
+        scores = []
+        for word, postings, _ in terms:
+            i = postings.find(doc)
+            if i is not None:
+                scores.append(idf[word] * (1 + math.log(postings.weights[i])))
+            elif kind != 'prefix':
+                return None
+        if not scores:
+            return None
+        if kind != 'phrase':
+            return max(scores)
+        starts = None
+        for word, postings, offset in terms:
+            shifted = {p - offset for p in postings.positions(postings.find(doc))}
+            starts = shifted if starts is None else starts & shifted
+            if not starts:
+                return None
+        return sum(scores)
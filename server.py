@@ -0,0 +1,253 @@
+"""Terminal server: many players on one process over TCP or telnet
+
+    python main.py serve --port 2323
+    telnet localhost 2323
+
+One asyncio event loop accepts connections and moves bytes to and from
+every socket. Each connection gets its own Session, whose Rich console
+writes to that socket and reads the player's typed lines from it. Every
+session shares the same storage and parsed data, so the party costs one
+interpreter and one copy of the station's data.
+
+The screens themselves are ordinary blocking code (Prompt.ask waits for a
+line), so each session's menu loop runs on a SessionRunner worker thread
+and hands its I/O to the event loop.
+
+Telnet clients are asked for their window size (NAWS) so screens fit the
+player's window. Echo is switched off while a password is typed. Use
+raw=True (`--raw`) for clients such as netcat that don't speak telnet.
+"""
+import asyncio
+import queue
+
+from rich.console import Console
+
+from pacing import Pacing
+from session import Session, SessionRunner
+
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+ECHO, SUPPRESS_GO_AHEAD, NAWS = 1, 3, 31
+
+DEFAULT_SIZE = (100, 40)
+
+
+class TelnetParser:
+    """Splits incoming bytes into lines, stripping telnet commands and noting window sizes"""
+
+    def __init__(self, on_resize):
+        self.on_resize = on_resize
+        self._state = 'data'
+        self._line = bytearray()
+        self._sub = bytearray()
+
+    def feed(self, data):
+        """Consume bytes, returning the complete lines they finish"""
+        lines = []
+        for byte in data:
+            state = self._state
+            if state == 'cr':
+                self._state = 'data'
+                if byte in (0, 10):
+                    continue  # CR LF or CR NUL ends one line, not two
+                state = 'data'
+            if state == 'data':
+                if byte == IAC:
+                    self._state = 'iac'
+                elif byte in (10, 13):
+                    lines.append(self._line.decode('utf-8', errors='replace'))
+                    self._line.clear()
+                    if byte == 13:
+                        self._state = 'cr'
+                elif byte in (8, 127):
+                    del self._line[-1:]
+                else:
+                    self._line.append(byte)
+            elif state == 'iac':
+                if byte == IAC:
+                    self._line.append(IAC)
+                    self._state = 'data'
+                elif byte in (WILL, WONT, DO, DONT):
+                    self._state = 'option'
+                elif byte == SB:
+                    self._sub.clear()
+                    self._state = 'sub'
+                else:
+                    self._state = 'data'
+            elif state == 'option':
+                self._state = 'data'
+            elif state == 'sub':
+                if byte == IAC:
+                    self._state = 'sub-iac'
+                else:
+                    self._sub.append(byte)
+            elif state == 'sub-iac':
+                if byte == SE:
+                    self._subnegotiation(bytes(self._sub))
+                    self._state = 'data'
+                else:
+                    self._sub.append(byte)
+                    self._state = 'sub'
+        return lines
+
+    def _subnegotiation(self, sub):
+        if len(sub) >= 5 and sub[0] == NAWS:
+            width = sub[1] << 8 | sub[2]
+            height = sub[3] << 8 | sub[4]
+            if width and height:
+                self.on_resize(width, height)
+
+
+class Connection:
+    """One client socket, seen by its session thread as a file plus a line source"""
+
+    def __init__(self, loop, writer, telnet=True):
+        self.loop = loop
+        self.writer = writer
+        self.telnet = telnet
+        self.lines = queue.Queue()
+        self.console = None
+        self.parser = TelnetParser(self._resize)
+
+    # File interface used by Rich, called from the session thread
+    def write(self, text):
+        data = text.replace('\n', '\r\n').encode('utf-8', errors='replace')
+        self.write_bytes(data)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return True
+
+    def _send(self, data):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def _command(self, *codes):
+        if self.telnet:
+            self.write_bytes(bytes((IAC,) + codes))
+
+    def write_bytes(self, data):
+        """Queue raw bytes for the socket from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._send, data)
+        except RuntimeError:
+            pass  # event loop closed: the server is shutting down
+
+    def _resize(self, width, height):
+        if self.console is not None:
+            self.console.size = (width, height)
+
+    def readline(self, password=False):
+        """Block the session thread until the player sends a line"""
+        if password:
+            self._command(WILL, ECHO)  # the client stops echoing; we don't echo either
+        line = self.lines.get()
+        if password:
+            self._command(WONT, ECHO)
+            self.write('\n')
+        if line is None:
+            raise EOFError('connection closed')
+        return line
+
+    def close_input(self):
+        """Wake a session waiting for input so it ends with EOFError"""
+        self.lines.put(None)
+
+    async def pump(self, reader):
+        """Feed lines from the socket to the session until the client disconnects"""
+        if self.telnet:
+            self._send(bytes((IAC, DO, NAWS, IAC, WILL, SUPPRESS_GO_AHEAD)))
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                for line in self.parser.feed(data):
+                    self.lines.put(line)
+        finally:
+            self.close_input()
+
+
+class RemoteConsole(Console):
+    """Rich console drawing to a Connection and reading prompts from it"""
+
+    def __init__(self, connection):
+        width, height = DEFAULT_SIZE
+        super().__init__(file=connection, force_terminal=True, width=width, height=height,
+                         color_system='256', legacy_windows=False)
+        self.connection = connection
+        connection.console = self
+
+    def input(self, prompt='', *, markup=True, emoji=True, password=False, stream=None):
+        if prompt:
+            self.print(prompt, markup=markup, emoji=emoji, end='')
+        return self.connection.readline(password=password)
+
+
+class TerminalServer:
+    """Accepts terminal connections and runs run_session(session) for each"""
+
+    def __init__(self, run_session, host='127.0.0.1', port=2323, max_sessions=32,
+                 pacing_profile=None, telnet=True, log=print):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.pacing_profile = pacing_profile
+        self.telnet = telnet
+        self.log = log
+        self.sessions = {}
+        self.runner = SessionRunner(run_session, max_sessions)
+        self._next_id = 1
+
+    async def handle(self, reader, writer):
+        """Serve one connection from connect to disconnect"""
+        peer = writer.get_extra_info('peername')
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b'IRON RING TERMINAL: all terminals are in use. Try again later.\r\n')
+            await writer.drain()
+            writer.close()
+            return
+
+        loop = asyncio.get_running_loop()
+        connection = Connection(loop, writer, telnet=self.telnet)
+        session = Session(RemoteConsole(connection), Pacing(self.pacing_profile, skippable=False))
+        session_id = self._next_id
+        self._next_id += 1
+        self.sessions[session_id] = session
+        self.log(f"session {session_id} connected from {peer}")
+
+        pump = asyncio.create_task(connection.pump(reader))
+        try:
+            await asyncio.wrap_future(self.runner.submit(session))
+        except EOFError:
+            pass
+        except Exception as e:
+            self.log(f"session {session_id} failed: {e!r}")
+        finally:
+            connection.close_input()
+            pump.cancel()
+            del self.sessions[session_id]
+            self.log(f"session {session_id} closed")
+            writer.close()
+
+    async def serve(self):
+        """Listen until cancelled"""
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.log(f"Iron Ring terminal server listening on {self.host}:{self.port}")
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                for session in list(self.sessions.values()):
+                    session.console.connection.close_input()
+
+    def run(self):
+        """Serve until interrupted, then let open sessions wind down"""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.runner.shutdown(wait=True)
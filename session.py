@@ -0,0 +1,90 @@
+"""Per-player terminal session
+
+A Session holds everything one player's screens need: who is logged in,
+their role and permissions, the console they are looking at and how their
+animations are paced. Every screen in main.py takes the session as its
+first argument instead of reading module globals, so one process can run
+many sessions side by side (see server.py).
+
+SessionRunner hosts those sessions on a pool of worker threads. The data
+layer they share (station store, holo ledger, inventory index, SQLite
+storage) is safe to call from any thread.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.console import Console
+from rich.prompt import Prompt, IntPrompt, Confirm
+
+from pacing import Pacing, pacing as default_pacing
+from renderer import ScreenRenderer, RenderCache
+
+
+class RepaintOnReprompt:
+    """Prompt mixin that makes self.screen repaint in full after an invalid answer
+
+    Each re-prompt prints an error and the prompt again under the frame,
+    which can scroll the terminal, so the rows no longer hold the lines
+    the renderer remembers.
+    """
+    screen = None
+
+    def on_validate_error(self, value, error):
+        super().on_validate_error(value, error)
+        self.screen.invalidate()
+
+
+class Session:
+    """Login state, console and pacing of one player's terminal"""
+
+    def __init__(self, console=None, pacing=None):
+        self.console = console or Console()
+        # Its own Pacing, so one player's keypress or animation never skips another's
+        self.pacing = pacing or Pacing(profile=default_pacing.profile)
+        self.screen = ScreenRenderer(self.console)
+        self._prompts = {base: type(base.__name__, (RepaintOnReprompt, base), {'screen': self.screen})
+                         for base in (Prompt, IntPrompt, Confirm)}
+        self.render_cache = RenderCache(self.console)
+        self.user = None
+        self.role = None
+        self.permissions = frozenset()
+
+    def login(self, user, role, permissions):
+        """Record a successful login, freezing the role's permissions for O(1) checks"""
+        self.user = user
+        self.role = role
+        self.permissions = frozenset(permissions)
+
+    def logout(self):
+        """Forget the logged-in user"""
+        self.user = None
+        self.role = None
+        self.permissions = frozenset()
+
+    def ask(self, prompt, **kwargs):
+        """Prompt.ask on this session's console"""
+        return self._prompts[Prompt].ask(prompt, console=self.console, **kwargs)
+
+    def ask_int(self, prompt, **kwargs):
+        """IntPrompt.ask on this session's console"""
+        return self._prompts[IntPrompt].ask(prompt, console=self.console, **kwargs)
+
+    def confirm(self, prompt, **kwargs):
+        """Confirm.ask on this session's console"""
+        return self._prompts[Confirm].ask(prompt, console=self.console, **kwargs)
+
+
+class SessionRunner:
+    """Runs run_session(session) for many sessions on a shared thread pool"""
+
+    def __init__(self, run_session, max_sessions=32):
+        self.run_session = run_session
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix='session')
+
+    def submit(self, session):
+        """Start the session on a worker thread and return its Future"""
+        return self._executor.submit(self.run_session, session)
+
+    def shutdown(self, wait=True):
+        """Stop accepting sessions, optionally waiting for running ones to finish"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,387 @@
+"""Render screens to text, ANSI or HTML instead of the terminal
+
+Every screen prints to session.console, so running one against a
+SnapshotConsole shows what the player would have seen without a terminal.
+snapshot() logs a session in, answers the screen's prompts from a list
+and returns a Snapshot of the screen as it stood at each prompt:
+
+    shot = snapshot(main.bank_menu, ['1', '', '3'], login=('captain', 'COMMAND', perms))
+    print(shot.text())
+
+Menu screens are drawn by ScreenRenderer, which repaints only the lines
+that changed, and the boot animation is redrawn in place by Rich, so the
+console's output can't simply be recorded: it is replayed into a
+TerminalScreen, which keeps the rows a terminal would show. That also
+means a snapshot shows the result of the repaint, not of the print calls.
+
+The same TerminalScreen mirrors a live terminal to a browser: with
+`--mirror PORT` the GM's console is a MirrorConsole, which writes to the
+terminal as usual and to a TerminalScreen served as a web page by
+MirrorServer.
+
+snapshots/check.py compares the screens with golden snapshots.
+"""
+import io
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rich.console import Console
+from rich.terminal_theme import MONOKAI
+from rich.text import Text
+
+from pacing import Pacing
+from session import Session
+
+WIDTH = 100
+HEIGHT = 40
+
+# Cursor and erase sequences (written by renderer.py and Rich's Live),
+# SGR styles, OSC strings, carriage returns and line feeds
+CONTROL = re.compile(r'\x1b\[([0-9;?]*)([A-Za-z])|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|[\r\n]')
+
+MIRROR_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>Iron Ring Terminal</title>
+<style>
+{stylesheet}
+body {{ color: {foreground}; background-color: {background}; }}
+pre {{ font-family: Menlo, 'DejaVu Sans Mono', consolas, 'Courier New', monospace; line-height: 1.2; }}
+</style>
+</head>
+<body>
+<pre id="screen"><code>{code}</code></pre>
+<script>
+let version = -1;
+async function poll() {{
+  try {{
+    const response = await fetch('/screen?since=' + version);
+    if (response.status === 200) {{
+      version = Number(response.headers.get('X-Screen-Version'));
+      document.querySelector('#screen code').innerHTML = await response.text();
+    }}
+  }} catch (e) {{}}
+  setTimeout(poll, 250);
+}}
+poll();
+</script>
+</body>
+</html>
+"""
+
+
+class ScriptExhausted(Exception):
+    """The screen asked for more input than the script's answers provide"""
+
+
+def ansi_to_html(ansi, width=WIDTH, code_format=None):
+    """Convert ANSI text to HTML with inline styles (a whole page unless code_format is given)"""
+    console = Console(record=True, file=io.StringIO(), width=width, force_terminal=True,
+                      color_system='truecolor', legacy_windows=False, no_color=False)
+    console.print(Text.from_ansi(ansi), soft_wrap=True)
+    if code_format is None:
+        return console.export_html(theme=MONOKAI, inline_styles=True)
+    return console.export_html(theme=MONOKAI, inline_styles=True, code_format=code_format)
+
+
+def ansi_to_text(ansi):
+    """Strip the styles from ANSI text, and the spaces from the ends of its lines"""
+    return '\n'.join(Text.from_ansi(line).plain.rstrip() for line in ansi.split('\n'))
+
+
+class TerminalScreen:
+    """A file that keeps what is written to it as the rows a terminal would show
+
+    It understands the terminal output of this program, not terminals in
+    general: whole lines are written at the start of a row (after a line
+    feed, a carriage return or a cursor move) and replace what the row
+    held, as ScreenRenderer and Rich's Live always erase or overwrite the
+    whole row. Rows past the bottom of the screen scroll off the top.
+    """
+
+    def __init__(self, height=HEIGHT):
+        self.height = height
+        self.rows = ['']
+        self.row = 0
+        self.fresh = True  # the cursor is at the start of its row
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            start = 0
+            for match in CONTROL.finditer(text):
+                self._text(text[start:match.start()])
+                start = match.end()
+                self._control(match)
+            self._text(text[start:])
+            self.version += 1
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def _text(self, text):
+        if not text:
+            return
+        if self.fresh:
+            self.rows[self.row] = text
+            self.fresh = False
+        else:
+            self.rows[self.row] += text
+
+    def _move(self, row):
+        self.row = max(0, row)
+        self.rows.extend([''] * (self.row + 1 - len(self.rows)))
+        self.fresh = True
+
+    def _control(self, match):
+        token = match.group(0)
+        if token == '\n':
+            self._move(self.row + 1)
+            if self.row >= self.height:
+                del self.rows[:self.row - self.height + 1]
+                self.row = self.height - 1
+        elif token == '\r':
+            self.fresh = True
+        elif token.startswith('\x1b]'):
+            pass  # window titles and hyperlinks
+        else:
+            params, command = match.groups()
+            count = int(params) if params.isdigit() else 1
+            if command == 'm':
+                self._text(token)
+            elif command == 'H':
+                self._move(int(params.split(';')[0] or 1) - 1)
+            elif command == 'A':
+                self._move(self.row - count)
+            elif command == 'B':
+                self._move(self.row + count)
+            elif command == 'G':
+                self.fresh = True
+            elif command == 'J' and params == '2':
+                self.rows = [''] * len(self.rows)
+            elif command == 'J':
+                del self.rows[self.row + 1:]
+                if self.fresh:
+                    self.rows[self.row] = ''
+            elif command == 'K' and (self.fresh or params == '2'):
+                self.rows[self.row] = ''
+
+    def ansi(self):
+        """The screen as ANSI text, without the empty rows under the last one written"""
+        with self._lock:
+            rows = list(self.rows)
+        while rows and not rows[-1]:
+            rows.pop()
+        return '\n'.join(rows)
+
+
+class NullFile:
+    """A write-only file that discards everything"""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class ScriptedConsole(Console):
+    """A console that answers prompts from a script instead of the keyboard
+
+    shown() is called once each prompt is printed and next_answer() takes
+    its answer from the script, so subclasses can look at the screen or
+    time the answers. Past the end of the script it raises ScriptExhausted.
+    """
+
+    def __init__(self, answers=(), file=None, width=WIDTH, height=HEIGHT):
+        super().__init__(file=file if file is not None else NullFile(), force_terminal=True, width=width,
+                         height=height, color_system='truecolor', legacy_windows=False, no_color=False)
+        self.answers = iter(answers)
+
+    def input(self, prompt='', *, markup=True, emoji=True, password=False, stream=None):
+        if prompt:
+            self.print(prompt, markup=markup, emoji=emoji, end='')
+        self.shown(prompt)
+        return self.next_answer(prompt)
+
+    def shown(self, prompt):
+        """Called with each prompt once it is on the screen"""
+
+    def next_answer(self, prompt):
+        """The script's next answer"""
+        try:
+            return next(self.answers)
+        except StopIteration:
+            raise ScriptExhausted(f"no answer for prompt {prompt!r}") from None
+
+
+class SnapshotConsole(ScriptedConsole):
+    """A scripted console drawing into a TerminalScreen
+
+    The screen is copied into shots each time a prompt is shown, and the
+    answer echoed after it as the player's terminal would.
+    """
+
+    def __init__(self, answers=(), width=WIDTH, height=HEIGHT):
+        super().__init__(answers, TerminalScreen(height), width, height)
+        self.shots = []
+
+    def input(self, prompt='', *, markup=True, emoji=True, password=False, stream=None):
+        answer = super().input(prompt, markup=markup, emoji=emoji, password=password, stream=stream)
+        self.file.write(('' if password else answer) + '\n')
+        return answer
+
+    def shown(self, prompt):
+        self.shots.append(self.file.ansi())
+
+
+class Snapshot:
+    """The screens a snapshot() run showed, one per prompt plus the last one"""
+
+    def __init__(self, shots, width=WIDTH):
+        self.shots = shots
+        self.width = width
+
+    def ansi(self):
+        """Every screen as ANSI text, each under a `--- screen N ---` line"""
+        return ''.join(f"--- screen {n} ---\n{shot}\n" for n, shot in enumerate(self.shots, 1))
+
+    def text(self):
+        """Every screen as plain text"""
+        return ansi_to_text(self.ansi())
+
+    def html(self):
+        """Every screen as one HTML page"""
+        return ansi_to_html(self.ansi(), self.width)
+
+
+def snapshot(screen, answers=(), login=None, width=WIDTH, height=HEIGHT):
+    """Run screen(session) on a SnapshotConsole and return a Snapshot of what it showed
+
+    login is (username, role, permissions) to log the session in first.
+    The screen runs until it returns or asks for an answer past the end of
+    answers; animations run at the instant pacing.
+    """
+    console = SnapshotConsole(answers, width, height)
+    session = Session(console, Pacing('instant', skippable=False))
+    if login is not None:
+        session.login(*login)
+    try:
+        screen(session)
+    except ScriptExhausted:
+        pass
+    else:
+        last = console.file.ansi()
+        if not console.shots or console.shots[-1] != last:
+            console.shots.append(last)
+    return Snapshot(console.shots, width)
+
+
+class MirrorFile:
+    """Writes to a stream and a TerminalScreen at once"""
+
+    def __init__(self, stream, screen):
+        self.stream = stream
+        self.screen = screen
+
+    def write(self, text):
+        self.screen.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)  # isatty, fileno and encoding decide how Rich writes
+
+
+class MirrorConsole(Console):
+    """The terminal's own console, also drawn into a TerminalScreen for MirrorServer"""
+
+    def __init__(self, stream=None, **kwargs):
+        self.screen = TerminalScreen()
+        super().__init__(file=MirrorFile(stream or sys.stdout, self.screen), **kwargs)
+        self.screen.height = self.height
+
+    def input(self, prompt='', *, markup=True, emoji=True, password=False, stream=None):
+        answer = super().input(prompt, markup=markup, emoji=emoji, password=password, stream=stream)
+        # The player's terminal echoed the answer; the mirror has to be told
+        self.screen.height = self.height
+        self.screen.write(('' if password else answer) + '\n')
+        return answer
+
+
+class MirrorServer:
+    """Serves a TerminalScreen as a web page that follows it as it changes"""
+
+    def __init__(self, screen, host='127.0.0.1', port=8023, width=WIDTH):
+        self.screen = screen
+        self.width = width
+        self._html = (None, '')
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def fragment(self):
+        """The screen as HTML spans and its version, rebuilt only when it has changed"""
+        with self._lock:
+            version = self.screen.version
+            if self._html[0] != version:
+                self._html = (version, ansi_to_html(self.screen.ansi(), self.width, code_format='{code}'))
+            return self._html
+
+    def _handler(self):
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                if path == '/':
+                    body = ansi_to_html(mirror.screen.ansi(), mirror.width, code_format=MIRROR_PAGE)
+                    self._send(200, body, 'text/html')
+                elif path == '/screen':
+                    version, body = mirror.fragment()
+                    if query == f"since={version}":
+                        self._send(204, '')
+                    else:
+                        self._send(200, body, 'text/html', version)
+                else:
+                    self._send(404, 'not found', 'text/plain')
+
+            def _send(self, status, body, content_type=None, version=None):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                if content_type:
+                    self.send_header('Content-Type', content_type + '; charset=utf-8')
+                if version is not None:
+                    self.send_header('X-Screen-Version', str(version))
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # keep the player's screen clean
+
+        return Handler
+
+    def start(self):
+        """Serve from a background thread"""
+        threading.Thread(target=self.httpd.serve_forever, name='mirror', daemon=True).start()
+        return self
@@ -0,0 +1,177 @@
+"""Golden snapshots: checks the terminal's screens still render as they did
+
+Generates a small dataset (the same one every time), runs each screen in
+CASES against a SnapshotConsole (see snapshot.py) with canned answers and
+compares every screen it showed, styles included, with
+snapshots/golden/CASE.ansi. It runs headless in a second or two, so it is
+the check to run after touching anything that draws: a rendering change
+that was meant to be invisible must leave every snapshot as it was.
+
+    python snapshots/check.py                   # exits 1 and prints a diff if a screen changed
+    python snapshots/check.py --update          # rewrite the golden files after an intended change
+    python snapshots/check.py bank store        # only these cases
+    python snapshots/check.py --html /tmp/shots # also write each case as an HTML page
+
+`cat snapshots/golden/bank.ansi` shows a golden file in colour. The
+screens must look the same on every backend:
+
+    python snapshots/check.py --backend sqlite
+"""
+import argparse
+import difflib
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+GOLDEN = os.path.join(HERE, 'golden')
+sys.path.insert(0, ROOT)
+
+import datagen
+
+DATASET = dict(users=90, items=120, news=6, food=6, hatches=4, seed=0)
+ROLES = ('ADMIN', 'COMMAND', 'ENGINEERING', 'SECURITY', 'MEDICAL', 'SCIENCE', 'CARGO', 'USER')
+
+# Text that breaks Rich markup unless it is escaped: a news article and a
+# ledger memo carrying it are added to the dataset
+MARKUP = "[/red] closed nothing, [bold]stays plain[/]"
+TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+
+# (case, screen in main.py, role of the user logged in or None, answers).
+# Each case logs in the first user with its role and no two cases that
+# change data share a role, so any case can run on its own. {recipient}
+# is the first ENGINEERING user. Timestamps are replaced by a fixed one.
+CASES = [
+    ('banner', 'print_ascii_art', None, []),
+    ('boot', 'loading_screen', None, []),
+    ('login', 'login_screen', None, []),
+] + [
+    (f"main_menu_{role.lower()}", 'main_menu', role, []) for role in ROLES
+] + [
+    ('main_menu_invalid_choice', 'main_menu', 'USER', ['9', '9', '9', '7', 'n']),
+    ('store', 'food_delivery', 'CARGO', ['1', '2', '']),
+    ('store_insufficient_funds', 'food_delivery', 'SCIENCE', ['5', '99', '']),
+    ('bank', 'bank_menu', 'SECURITY', ['1', '', '2', 'nobody', '', '{recipient}', '5', 'y', '', '3']),
+    ('bank_transfer_cancel', 'bank_menu', 'COMMAND',
+     ['2', '{recipient}', 'lots', '', '{recipient}', '999999', '', '', '3']),
+    ('inventory', 'personal_menu', 'MEDICAL',
+     ['1', '', '2', '1', 'Plasma Torch', 'Cuts bulkheads', '2', '', '3', '1', '', '3']),
+    ('inventory_markup', 'personal_menu', 'USER',
+     ['2', '1', '[/red]Relic', '[bold]Cursed[/] blade', '1', '', '3', '1', '', '3']),
+    ('news_markup', 'station_news', 'USER', ['']),
+    ('balance_markup_memo', 'check_balance', 'ADMIN', ['']),
+]
+
+
+def first_users(path):
+    """The first username with each role in users.txt"""
+    users = {}
+    with open(os.path.join(path, 'users.txt')) as f:
+        for line in f:
+            username, _, role = line.strip().split(':')
+            users.setdefault(role, username)
+    return users
+
+
+def golden_path(case):
+    return os.path.join(GOLDEN, case + '.ansi')
+
+
+def read_golden(case):
+    try:
+        with open(golden_path(case), encoding='utf-8', newline='') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_file(path, text):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+
+
+def show_diff(case, expected, actual):
+    """Print how a case's screens changed, as plain text if the text changed, else as escaped ANSI"""
+    from snapshot import ansi_to_text
+    before, after = ansi_to_text(expected), ansi_to_text(actual)
+    if before == after:
+        print(f"  {case}: same text, different styles")
+        before, after = [repr(line) for line in expected.split('\n')], [repr(line) for line in actual.split('\n')]
+    else:
+        before, after = before.split('\n'), after.split('\n')
+    for line in difflib.unified_diff(before, after, 'golden', 'now', lineterm='', n=2):
+        print('  ' + line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('cases', nargs='*', help='cases to run (default all)')
+    parser.add_argument('--update', action='store_true', help='rewrite the golden files with the screens as they are now')
+    parser.add_argument('--html', metavar='DIR', help='also write each case to DIR/CASE.html')
+    parser.add_argument('--backend', choices=('flat', 'mmap', 'sqlite'), default='flat',
+                        help='storage backend to run the screens on (default flat)')
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.cases or case[0] in args.cases]
+    unknown = set(args.cases) - {case[0] for case in CASES}
+    if unknown:
+        parser.error(f"unknown case {', '.join(sorted(unknown))}")
+
+    data_dir = tempfile.mkdtemp(prefix='iron-ring-snapshots-')
+    datagen.generate(data_dir, **DATASET)
+    users = first_users(data_dir)
+    with open(os.path.join(data_dir, 'news.txt'), 'a') as f:
+        f.write(f"NOTICE: {MARKUP}|{MARKUP}\n")
+
+    # The terminal reads its data files relative to the working directory
+    os.environ['IRON_RING_STORAGE'] = 'sqlite' if args.backend == 'sqlite' else 'flat'
+    os.environ['IRON_RING_BALANCES'] = 'mmap' if args.backend == 'mmap' else 'text'
+    os.environ.pop('IRON_RING_DB', None)
+    os.chdir(data_dir)
+    if args.backend == 'sqlite':
+        from storage import import_flat_files
+        import_flat_files('iron_ring.db', data_dir)
+    import main as terminal
+    from audit_log import audit
+    from snapshot import snapshot
+
+    permissions = terminal.storage.permissions()
+    terminal.storage.apply_batch([(1, {'type': 'reward', 'user': users['ADMIN'], 'amount': '5', 'memo': MARKUP}, None)])
+    changed = missing = 0
+    try:
+        for case, screen, role, answers in cases:
+            login = (users[role], role, permissions[role]) if role else None
+            answers = [answer.format(recipient=users['ENGINEERING']) for answer in answers]
+            shot = snapshot(getattr(terminal, screen), answers, login=login)
+            actual = TIMESTAMP.sub('2000-01-01 00:00:00', shot.ansi())
+            if args.html:
+                os.makedirs(args.html, exist_ok=True)
+                write_file(os.path.join(args.html, case + '.html'), shot.html())
+            expected = read_golden(case)
+            if args.update:
+                if actual != expected:
+                    os.makedirs(GOLDEN, exist_ok=True)
+                    write_file(golden_path(case), actual)
+                    print(f"updated {case}")
+            elif expected is None:
+                missing += 1
+                print(f"MISSING {case} (run with --update to create it)")
+            elif actual != expected:
+                changed += 1
+                print(f"CHANGED {case}")
+                show_diff(case, expected, actual)
+    finally:
+        audit.close()
+        os.chdir(ROOT)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if not args.update:
+        print(f"{len(cases) - changed - missing} of {len(cases)} snapshots unchanged")
+    return 1 if changed or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
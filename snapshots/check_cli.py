@@ -0,0 +1,67 @@
+"""Checks the scripting CLI answers the same from any working directory
+
+`python /path/to/main.py ...` moves to the directory holding main.py and
+reads the data files there, whatever directory it was started from. This
+runs a few read-only subcommands from that directory and from an empty
+temporary one, on the flat and the SQLite backend (a database imported
+from the data files, named relative to the data directory), and fails if
+any answer differs or the run leaves a file behind in the other
+directory.
+
+    python snapshots/check_cli.py
+"""
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+DB_NAME = 'iron_ring.db.check'  # relative, so it has to be found in ROOT
+
+
+def run(args, cwd, env):
+    """Run main.py with args from cwd, returning (exit status, stdout)"""
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), *args], cwd=cwd, env=env,
+                            capture_output=True, text=True)
+    return result.returncode, result.stdout
+
+
+def main():
+    from storage import import_flat_files
+
+    with open(os.path.join(ROOT, 'users.txt')) as f:
+        username = f.readline().split(':')[0]
+    commands = [['balance', username], ['inventory', 'list', username], ['menu', 'list']]
+
+    elsewhere = tempfile.mkdtemp(prefix='iron-ring-cwd-')
+    import_flat_files(os.path.join(ROOT, DB_NAME), ROOT)
+    failed = 0
+    try:
+        for backend in ('flat', 'sqlite'):
+            env = dict(os.environ, IRON_RING_STORAGE=backend, IRON_RING_DB=DB_NAME)
+            for args in commands:
+                here, there = run(args, ROOT, env), run(args, elsewhere, env)
+                if here != there or here[0] != 0:
+                    failed += 1
+                    print(f"DIFFERS {backend} {' '.join(args)}\n  from {ROOT}: {here}\n  from {elsewhere}: {there}")
+        left = os.listdir(elsewhere)
+        if left:
+            failed += 1
+            print(f"LEFT BEHIND in the launch directory: {', '.join(sorted(left))}")
+    finally:
+        shutil.rmtree(elsewhere, ignore_errors=True)
+        for path in glob.glob(os.path.join(ROOT, DB_NAME + '*')):
+            os.remove(path)
+
+    if not failed:
+        print(f"{2 * len(commands)} commands answer the same from any directory")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
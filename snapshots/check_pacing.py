@@ -0,0 +1,78 @@
+"""Checks a keypress skips the rest of its own animation and nothing after it
+
+Runs pauses on a Pacing whose waits are recorded instead of slept, with a
+key "pressed" during chosen ones, and fails if a pause that should have
+waited was skipped or the other way round.
+
+    python snapshots/check_pacing.py
+"""
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from pacing import Pacing
+
+
+class RecordingPacing(Pacing):
+    """A Pacing that records each wait and presses a key during the ones listed"""
+
+    def __init__(self, press_during=()):
+        super().__init__(profile='cinematic')
+        self.press_during = set(press_during)
+        self.waits = []
+
+    def _wait(self, seconds):
+        if len(self.waits) in self.press_during:
+            self.skipped = True
+        self.waits.append(seconds)
+
+
+def standalone_pauses():
+    pacing = RecordingPacing(press_during={0})
+    pacing.sleep(1)
+    pacing.sleep(2)
+    pacing.sleep(3)
+    return pacing.waits, [1, 2, 3]
+
+
+def skipped_animation():
+    pacing = RecordingPacing(press_during={1})
+    with pacing.animation():
+        for seconds in (1, 2, 3, 4):
+            pacing.sleep(seconds)
+    pacing.sleep(5)
+    return pacing.waits, [1, 2, 5]
+
+
+def nested_animation():
+    pacing = RecordingPacing(press_during={0})
+    with pacing.animation():
+        pacing.sleep(1)
+        with pacing.animation():
+            pacing.sleep(2)
+        pacing.sleep(3)
+    with pacing.animation():
+        pacing.sleep(4)
+    return pacing.waits, [1, 4]
+
+
+CASES = [standalone_pauses, skipped_animation, nested_animation]
+
+
+def main():
+    failed = 0
+    for case in CASES:
+        waited, expected = case()
+        if waited != expected:
+            failed += 1
+            print(f"FAILED {case.__name__}: waited {waited}, expected {expected}")
+    if not failed:
+        print(f"{len(CASES)} pacing cases skip as expected")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
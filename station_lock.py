@@ -0,0 +1,159 @@
+"""Cross-process locking and group commit for the shared data files
+
+Several terminals may run against the same directory, so every
+read-modify-write of a data file happens under a FileLock: readers take
+it shared and writers exclusive. The lock lives in a `<file>.lock`
+sidecar, because data files are swapped out with os.replace() and a lock
+on the old file would not cover the new one.
+
+GroupCommit lets writers append without fsyncing under the lock. The
+first writer to wait becomes the leader and fsyncs once for every append
+made so far, so a burst of purchases shares one fsync.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Shared/exclusive lock on a data file, held across processes and threads"""
+
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self._mutex = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._fd = None
+
+    def _acquire(self, exclusive):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+
+    def _release(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def shared(self):
+        """Hold the lock for reading; a no-op inside this thread's exclusive hold"""
+        me = threading.get_ident()
+        with self._mutex:
+            if self._writer == me:
+                nested = True
+            else:
+                nested = False
+                while self._writer is not None:
+                    self._mutex.wait()
+                if self._readers == 0:
+                    self._acquire(exclusive=False)
+                self._readers += 1
+        try:
+            yield
+        finally:
+            if not nested:
+                with self._mutex:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._release()
+                        self._mutex.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the lock for a read-modify-write cycle; re-entrant per thread"""
+        me = threading.get_ident()
+        with self._mutex:
+            if self._writer == me:
+                self._depth += 1
+            else:
+                while self._writer is not None or self._readers:
+                    self._mutex.wait()
+                self._writer = me
+                self._depth = 1
+                self._acquire(exclusive=True)
+        try:
+            yield
+        finally:
+            with self._mutex:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._writer = None
+                    self._release()
+                    self._mutex.notify_all()
+
+
+_locks = {}
+_locks_mutex = threading.Lock()
+
+
+def lock_for(path):
+    """Return the process-wide FileLock for path
+
+    flock() locks belong to an open file, so two FileLocks on one path in
+    the same process would block each other; always share one.
+    """
+    with _locks_mutex:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = FileLock(path)
+        return lock
+
+
+class GroupCommit:
+    """Coalesces fsyncs of an append-only file across concurrent writers"""
+
+    def __init__(self, path):
+        self.path = path
+        self._cond = threading.Condition()
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+
+    def written(self):
+        """Record an unsynced append, returning the ticket to wait on"""
+        with self._cond:
+            self._written += 1
+            return self._written
+
+    def wait(self, ticket):
+        """Block until the append behind ticket is on disk"""
+        with self._cond:
+            while self._synced < ticket:
+                if not self._syncing:
+                    break
+                self._cond.wait()
+            else:
+                return
+            self._syncing = True
+            target = self._written
+
+        try:
+            self._fsync()
+        finally:
+            with self._cond:
+                self._synced = max(self._synced, target)
+                self._syncing = False
+                self._cond.notify_all()
+
+    def _fsync(self):
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return  # compacted away; the checkpoint that replaced it was fsynced
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,144 @@
+"""In-memory cache of the station's flat data files"""
+import os
+import threading
+
+from hatch_registry import HatchRegistry
+
+
+def parse_users(f):
+    """Parse users.txt into {username: {'password', 'role'}}"""
+    users = {}
+    for line in f:
+        line = line.strip()
+        if line and ':' in line:
+            username, password, role = line.split(':')
+            users[username] = {'password': password, 'role': role}
+    return users
+
+
+def parse_permissions(f):
+    """Parse permissions.txt into {role: [menu options]}"""
+    permissions = {}
+    for line in f:
+        line = line.strip()
+        if line and ':' in line:
+            role, perms = line.split(':')
+            permissions[role] = [int(x) for x in perms.split(',')]
+    return permissions
+
+
+def parse_user_holos(f):
+    """Parse user_holos.txt into {username: balance}"""
+    holos = {}
+    for line in f:
+        line = line.strip()
+        if line and ':' in line:
+            username, credit_amount = line.split(':')
+            holos[username] = int(credit_amount)
+    return holos
+
+
+def parse_pipe_pairs(f):
+    """Parse a `left|right` file (news, maintenance notes) into a list of pairs"""
+    pairs = []
+    for line in f:
+        line = line.strip()
+        if line and '|' in line:
+            left, right = line.split('|', 1)
+            pairs.append((left, right))
+    return pairs
+
+
+def parse_maintenance_notes(f):
+    """Parse maintenance_notes.txt into a HatchRegistry"""
+    return HatchRegistry(parse_pipe_pairs(f))
+
+
+def parse_food_menu(f):
+    """Parse food_menu.txt into [(item, price)]"""
+    food_items = []
+    for line in f:
+        line = line.strip()
+        if line and '|' in line:
+            item, price = line.split('|')
+            food_items.append((item, int(price)))
+    return food_items
+
+
+DATA_FILES = {
+    'users.txt': parse_users,
+    'permissions.txt': parse_permissions,
+    'user_holos.txt': parse_user_holos,
+    'food_menu.txt': parse_food_menu,
+    'maintenance_notes.txt': parse_maintenance_notes,
+}
+
+
+class StationStore:
+    """Parses each data file once and re-reads it only when its mtime or size changes.
+
+    Values handed out by get() are shared by every caller, so treat them as
+    read-only unless you write the file back and call put() straight after.
+    Safe to share between session threads: when a file changes, the first
+    thread to notice parses it and the others wait for that result.
+    """
+
+    def __init__(self, parsers=None):
+        self.parsers = dict(DATA_FILES if parsers is None else parsers)
+        self._entries = {}
+        self._loading = {}
+        self._loading_lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, path):
+        """Return the parsed contents of path, re-parsing only if it changed on disk"""
+        signature = self._signature(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with self._path_lock(path):
+            signature = self._signature(path)
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]  # another thread parsed it while we waited
+            with open(path, 'r') as f:
+                value = self.parsers[path](f)
+            self._entries[path] = (signature, value)
+            return value
+
+    def _path_lock(self, path):
+        with self._loading_lock:
+            lock = self._loading.get(path)
+            if lock is None:
+                lock = self._loading[path] = threading.Lock()
+            return lock
+
+    def put(self, path, value):
+        """Record value as the contents of path after we have just written it"""
+        try:
+            self._entries[path] = (self._signature(path), value)
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+
+    def invalidate(self, path=None):
+        """Forget the cached copy of path, or of every file when path is None"""
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(path, None)
+
+    def preload(self):
+        """Parse every known data file up front, skipping any that are missing"""
+        for path in self.parsers:
+            try:
+                self.get(path)
+            except FileNotFoundError:
+                pass
+
+
+store = StationStore()
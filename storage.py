@@ -0,0 +1,724 @@
+"""Storage backends for the station's data
+
+FlatFileStorage serves the original .txt files (through the station store,
+holo ledger and inventory index). SQLiteStorage keeps the same data in a
+local SQLite database with indexes on username, hatch ID and note
+priority, and applies transfers and orders in a single transaction. Both
+check transfers and orders against the bank's rules (see bank.py) while
+holding their write lock.
+import_flat_files() bulk loads the .txt files into a database.
+
+Pick the backend with IRON_RING_STORAGE=flat|sqlite (default flat) and the
+database file with IRON_RING_DB (default iron_ring.db).
+"""
+import json
+import os
+import threading
+import time
+
+from station_store import store, parse_users, parse_permissions
+from holo_ledger import HoloLedger, ledger, parse_ledger, read_notes, LedgerRecord
+from balance_store import MmapHoloLedger
+from inventory_index import inventory, parse_item
+from line_index import news, maintenance_notes
+from search_index import SearchIndex
+from hatch_registry import hatch_id, note_priority
+from batch import plan
+from bank import Receipt, TransferKeys, check_debit, check_key, check_transfer, parse_keys, replay, transfer_memo
+
+DEFAULT_DB_PATH = 'iron_ring.db'
+SEARCH_INDEX_PATH = 'search.idx'
+DELIVERY_JOURNAL_PATH = 'deliveries.journal'
+IMPORT_BATCH_SIZE = 5000
+
+
+class Storage:
+    """Interface shared by every storage backend"""
+
+    def preload(self):
+        """Warm any caches before the first screen is drawn"""
+
+    def users(self):
+        """Return {username: {'password', 'role'}}"""
+        raise NotImplementedError
+
+    def get_user(self, username):
+        """Return {'password', 'role'} for username, or None"""
+        return self.users().get(username)
+
+    def permissions(self):
+        """Return {role: [menu options]}"""
+        raise NotImplementedError
+
+    def balances(self):
+        """Return {username: holo balance}"""
+        raise NotImplementedError
+
+    def balance(self, username):
+        """Return username's holo balance, or None if they have no account"""
+        return self.balances().get(username)
+
+    def transfer(self, sender, recipient, amount, memo='', key=None):
+        """Move amount from sender to recipient as one transaction, returning a bank.Receipt
+
+        Raises bank.Refused if the bank's rules forbid it. If key was used
+        before, nothing is posted and the first transfer's receipt comes
+        back marked replayed.
+        """
+        raise NotImplementedError
+
+    def recent_transactions(self, username, limit=5):
+        """Return username's latest LedgerRecords, newest first"""
+        raise NotImplementedError
+
+    def inventory_items(self, username):
+        """Return [(item, description, quantity)] owned by username"""
+        raise NotImplementedError
+
+    def add_inventory_item(self, username, item_name, description, quantity):
+        """Add one inventory row for username"""
+        raise NotImplementedError
+
+    def delete_inventory_item(self, username, item_name):
+        """Remove username's rows named item_name, returning how many were removed"""
+        raise NotImplementedError
+
+    def compact_inventory(self):
+        """Merge each user's rows for the same item into one, returning how many rows were merged away"""
+        raise NotImplementedError
+
+    def place_order(self, username, item_name, quantity, cost):
+        """Debit cost and deliver quantity of item_name to username together
+
+        Raises bank.Refused if username can't afford it.
+        """
+        raise NotImplementedError
+
+    def apply_batch(self, rows, dry_run=False):
+        """Check batch rows (see batch.read_rows) against current balances and apply the good ones
+
+        Nobody else can post while the batch is checked and written.
+        Returns the batch.Plan; with dry_run nothing is written.
+        """
+        raise NotImplementedError
+
+    def news_count(self):
+        """Return how many news articles there are"""
+        raise NotImplementedError
+
+    def news_articles(self, start, stop):
+        """Return [(title, body)] for articles start..stop-1, oldest first"""
+        raise NotImplementedError
+
+    def post_news(self, title, body):
+        """Add an article after the newest one"""
+        raise NotImplementedError
+
+    def food_menu(self):
+        """Return [(item, price)]"""
+        raise NotImplementedError
+
+    def maintenance_notes(self):
+        """Return [(hatch, note)]"""
+        raise NotImplementedError
+
+    def hatch_notes(self, hatch):
+        """Return [(hatch, note)] for one `HATCH-XXX` ID"""
+        raise NotImplementedError
+
+    def maintenance_notes_by_priority(self, priority):
+        """Return [(hatch, note)] tagged HIGH, MEDIUM or LOW"""
+        raise NotImplementedError
+
+    def maintenance_note_count(self):
+        """Return how many maintenance notes there are"""
+        raise NotImplementedError
+
+    def maintenance_note_records(self, start, stop):
+        """Return [(hatch, note)] for notes start..stop-1, in file order"""
+        raise NotImplementedError
+
+    def _search_sources(self):
+        return [
+            ('news', self.news_count, self.news_articles),
+            ('maintenance', self.maintenance_note_count, self.maintenance_note_records),
+        ]
+
+    def search(self, query, sources=None, limit=10):
+        """Search news and maintenance notes
+
+        Returns (matches, exact, [(score, source, record number, (title, body))])
+        for the best limit matches; see SearchIndex.search. sources limits
+        the search to 'news' and/or 'maintenance'.
+        """
+        matches, exact, hits = self.search_index.search(query, sources, limit)
+        fetch = {'news': self.news_articles, 'maintenance': self.maintenance_note_records}
+        return matches, exact, [(score, source, number, fetch[source](number, number + 1)[0])
+                                for score, source, number in hits]
+
+    def search_pending(self):
+        """Return how many news articles and notes are waiting to be added to the search index"""
+        return self.search_index.pending()
+
+
+class FlatFileStorage(Storage):
+    """The original flat .txt files"""
+
+    def __init__(self, balances=None):
+        balances = balances or os.environ.get('IRON_RING_BALANCES', 'text')
+        if balances not in ('text', 'mmap'):
+            raise ValueError(f"Unknown balance store: {balances}")
+        self.holos = MmapHoloLedger() if balances == 'mmap' else ledger
+        self.transfer_keys = TransferKeys(self.holos)
+        self.search_index = SearchIndex(SEARCH_INDEX_PATH, self._search_sources())
+
+    def preload(self):
+        store.preload()
+        with self.holos.lock.exclusive():
+            self._finish_deliveries()
+
+    def users(self):
+        return store.get('users.txt')
+
+    def permissions(self):
+        return store.get('permissions.txt')
+
+    def balances(self):
+        return self.holos.balances()
+
+    def balance(self, username):
+        return self.holos.balance(username)
+
+    def transfer(self, sender, recipient, amount, memo='', key=None):
+        if key is not None:
+            check_key(key)
+        with self.holos.lock.exclusive():
+            if key is not None:
+                receipt = self.transfer_keys.get(key)
+                if receipt is not None:
+                    return replay(receipt, sender, recipient, amount)
+            check_transfer(sender, recipient, amount, self.holos.balance)
+            memo = transfer_memo(sender, recipient, memo)
+            receipt = Receipt(key, sender, recipient, amount, memo, False)
+            entries = [(sender, -amount), (recipient, amount)]
+            if key is None:
+                self.holos.post(entries, memo)
+            else:
+                self.transfer_keys.post(receipt, entries)
+        return receipt
+
+    def recent_transactions(self, username, limit=5):
+        return self.holos.recent(username, limit)
+
+    def inventory_items(self, username):
+        return inventory.items(username)
+
+    def add_inventory_item(self, username, item_name, description, quantity):
+        inventory.append(username, item_name, description, quantity)
+
+    def delete_inventory_item(self, username, item_name):
+        return inventory.delete_item(username, item_name)
+
+    def compact_inventory(self):
+        return inventory.compact()
+
+    def place_order(self, username, item_name, quantity, cost):
+        with self.holos.lock.exclusive():
+            check_debit(username, self.holos.balance(username), cost)
+            self._post_and_deliver([([(username, -cost)], f"STORE {quantity} x {item_name}")],
+                                   [(username, item_name, item_name, quantity)])
+
+    def apply_batch(self, rows, dry_run=False):
+        # One ledger append for every transaction, one inventory append for
+        # every delivery, both made while the ledger is locked
+        food_menu = self.food_menu()
+        with self.holos.lock.exclusive():
+            result = plan(rows, self.holos.balances(), food_menu)
+            if not dry_run:
+                self._post_and_deliver(result.transactions, result.deliveries)
+        return result
+
+    def _post_and_deliver(self, transactions, deliveries):
+        """Post transactions and append deliveries to the inventory, both or neither
+
+        The ledger and the inventory are separate files, so the deliveries
+        are first journaled, with where in user_inventory.txt they will go,
+        and the ledger append carries a note naming the journal. That
+        append is the commit point: _finish_deliveries() later drops a
+        journal whose note never landed and makes a delivery that did not.
+        Callers hold the ledger's exclusive lock.
+        """
+        if not transactions or not deliveries:
+            if transactions:
+                self.holos.post_many(transactions)
+            if deliveries:
+                inventory.append_many(deliveries)
+            return
+        with inventory.lock.exclusive():
+            self._finish_deliveries()
+            journal_id = f"{os.getpid()}-{time.time_ns()}"
+            tmp_path = DELIVERY_JOURNAL_PATH + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'id': journal_id, 'offset': inventory.size(), 'deliveries': deliveries}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, DELIVERY_JOURNAL_PATH)
+            self.holos.post_many(transactions, notes=[f"deliveries {journal_id}"])
+            inventory.append_many(deliveries)
+            os.remove(DELIVERY_JOURNAL_PATH)
+
+    def _finish_deliveries(self):
+        """Complete or drop the deliveries journal a crashed terminal left; callers hold the ledger lock"""
+        try:
+            with open(DELIVERY_JOURNAL_PATH) as f:
+                journal = json.load(f)
+        except FileNotFoundError:
+            return
+        with inventory.lock.exclusive():
+            if f"deliveries {journal['id']}" in self.holos.notes():
+                deliveries = [tuple(row) for row in journal['deliveries']]
+                if not inventory.appended_at(journal['offset'], deliveries):
+                    inventory.append_many(deliveries)
+            os.remove(DELIVERY_JOURNAL_PATH)
+
+    def news_count(self):
+        return news.count()
+
+    def news_articles(self, start, stop):
+        return news.records(start, stop)
+
+    def post_news(self, title, body):
+        news.append(title, body)
+
+    def food_menu(self):
+        return store.get('food_menu.txt')
+
+    def maintenance_notes(self):
+        return store.get('maintenance_notes.txt').notes
+
+    def hatch_notes(self, hatch):
+        return store.get('maintenance_notes.txt').hatch(hatch)
+
+    def maintenance_notes_by_priority(self, priority):
+        return store.get('maintenance_notes.txt').with_priority(priority)
+
+    def maintenance_note_count(self):
+        return maintenance_notes.count()
+
+    def maintenance_note_records(self, start, stop):
+        return maintenance_notes.records(start, stop)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS permissions (
+    role TEXT NOT NULL,
+    option INTEGER NOT NULL,
+    PRIMARY KEY (role, option)
+);
+CREATE TABLE IF NOT EXISTS balances (
+    username TEXT PRIMARY KEY,
+    holos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    username TEXT NOT NULL,
+    delta INTEGER NOT NULL,
+    memo TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_username ON transactions (username, id);
+CREATE TABLE IF NOT EXISTS transfer_keys (
+    key TEXT PRIMARY KEY,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    memo TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    item TEXT NOT NULL,
+    description TEXT NOT NULL,
+    quantity TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inventory_username ON inventory (username, item);
+CREATE TABLE IF NOT EXISTS news (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS food_menu (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item TEXT NOT NULL,
+    price INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS maintenance_notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hatch_id TEXT NOT NULL,
+    hatch TEXT NOT NULL,
+    note TEXT NOT NULL,
+    priority TEXT
+);
+CREATE INDEX IF NOT EXISTS maintenance_notes_hatch ON maintenance_notes (hatch_id);
+"""
+
+PRIORITY_INDEX = "CREATE INDEX IF NOT EXISTS maintenance_notes_priority ON maintenance_notes (priority, id)"
+# Inventory quantities are free text; only whole numbers are summed when rows are merged
+WHOLE_QUANTITY = "quantity GLOB '[0-9]*' AND quantity NOT GLOB '*[^0-9]*'"
+
+
+class SQLiteStorage(Storage):
+    """A local SQLite database, created on first use
+
+    sqlite3 connections can't be shared between threads, so each session
+    thread gets its own. In WAL mode they read in parallel, and SQLite
+    serializes their writes.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = os.path.abspath(path)  # every thread's connection opens the same file
+        self._local = threading.local()
+        self.conn.executescript(SCHEMA)
+        self._add_priority_column()
+        self.search_index = SearchIndex(self.path + '.search', self._search_sources())
+
+    @property
+    def conn(self):
+        """This thread's connection to the database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3  # only the sqlite backend pays for loading it
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _add_priority_column(self):
+        """Give databases imported before notes had a priority column one, filled from the notes"""
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(maintenance_notes)')]
+        if 'priority' not in columns:
+            with self.conn:
+                self.conn.execute('ALTER TABLE maintenance_notes ADD COLUMN priority TEXT')
+                rows = self.conn.execute('SELECT id, note FROM maintenance_notes').fetchall()
+                self.conn.executemany('UPDATE maintenance_notes SET priority = ? WHERE id = ?',
+                                      ((note_priority(note), row_id) for row_id, note in rows))
+        self.conn.execute(PRIORITY_INDEX)
+
+    def users(self):
+        rows = self.conn.execute('SELECT username, password, role FROM users')
+        return {username: {'password': password, 'role': role} for username, password, role in rows}
+
+    def get_user(self, username):
+        row = self.conn.execute(
+            'SELECT password, role FROM users WHERE username = ?', (username,)
+        ).fetchone()
+        return {'password': row[0], 'role': row[1]} if row else None
+
+    def permissions(self):
+        permissions = {}
+        for role, option in self.conn.execute('SELECT role, option FROM permissions ORDER BY role, option'):
+            permissions.setdefault(role, []).append(option)
+        return permissions
+
+    def balances(self):
+        return dict(self.conn.execute('SELECT username, holos FROM balances'))
+
+    def balance(self, username):
+        row = self.conn.execute('SELECT holos FROM balances WHERE username = ?', (username,)).fetchone()
+        return row[0] if row else None
+
+    def _post(self, entries, memo):
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        for username, delta in entries:
+            self.conn.execute(
+                'INSERT INTO balances (username, holos) VALUES (?, ?) '
+                'ON CONFLICT (username) DO UPDATE SET holos = holos + excluded.holos',
+                (username, delta)
+            )
+            self.conn.execute(
+                'INSERT INTO transactions (timestamp, username, delta, memo) VALUES (?, ?, ?, ?)',
+                (timestamp, username, delta, memo)
+            )
+
+    def transfer(self, sender, recipient, amount, memo='', key=None):
+        if key is not None:
+            check_key(key)
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')  # hold the write lock from the balance read on
+            if key is not None:
+                row = self.conn.execute(
+                    'SELECT key, sender, recipient, amount, memo FROM transfer_keys WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    return replay(Receipt(*row, False), sender, recipient, amount)
+            check_transfer(sender, recipient, amount, self.balance)
+            memo = transfer_memo(sender, recipient, memo)
+            self._post([(sender, -amount), (recipient, amount)], memo)
+            if key is not None:
+                self.conn.execute(
+                    'INSERT INTO transfer_keys (key, sender, recipient, amount, memo) VALUES (?, ?, ?, ?, ?)',
+                    (key, sender, recipient, amount, memo)
+                )
+        return Receipt(key, sender, recipient, amount, memo, False)
+
+    def recent_transactions(self, username, limit=5):
+        rows = self.conn.execute(
+            'SELECT id, timestamp, username, delta, memo FROM transactions '
+            'WHERE username = ? ORDER BY id DESC LIMIT ?',
+            (username, limit)
+        )
+        return [LedgerRecord(*row) for row in rows]
+
+    def inventory_items(self, username):
+        rows = self.conn.execute(
+            'SELECT item, description, quantity FROM inventory WHERE username = ? ORDER BY id',
+            (username,)
+        )
+        return [tuple(row) for row in rows]
+
+    def _add_inventory_item(self, username, item_name, description, quantity):
+        quantity = str(quantity)
+        if quantity.isdigit():
+            # Top up the row already holding this item instead of adding another
+            row = self.conn.execute(
+                'SELECT id, quantity FROM inventory WHERE username = ? AND item = ? AND ' + WHOLE_QUANTITY +
+                ' ORDER BY id LIMIT 1', (username, item_name)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute('UPDATE inventory SET quantity = ? WHERE id = ?',
+                                  (str(int(row[1]) + int(quantity)), row[0]))
+                return
+        self.conn.execute(
+            'INSERT INTO inventory (username, item, description, quantity) VALUES (?, ?, ?, ?)',
+            (username, item_name, description, quantity)
+        )
+
+    def add_inventory_item(self, username, item_name, description, quantity):
+        with self.conn:
+            self._add_inventory_item(username, item_name, description, quantity)
+
+    def delete_inventory_item(self, username, item_name):
+        with self.conn:
+            cursor = self.conn.execute(
+                'DELETE FROM inventory WHERE username = ? AND item = ?', (username, item_name)
+            )
+        return cursor.rowcount
+
+    def compact_inventory(self):
+        merged = 0
+        with self.conn:
+            groups = self.conn.execute(
+                'SELECT username, item, MIN(id), SUM(CAST(quantity AS INTEGER)), COUNT(*) FROM inventory '
+                'WHERE ' + WHOLE_QUANTITY + ' GROUP BY username, item HAVING COUNT(*) > 1'
+            ).fetchall()
+            for username, item_name, first_id, total, count in groups:
+                self.conn.execute('UPDATE inventory SET quantity = ? WHERE id = ?', (str(total), first_id))
+                self.conn.execute(
+                    'DELETE FROM inventory WHERE username = ? AND item = ? AND id != ? AND ' + WHOLE_QUANTITY,
+                    (username, item_name, first_id)
+                )
+                merged += count - 1
+        return merged
+
+    def place_order(self, username, item_name, quantity, cost):
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            check_debit(username, self.balance(username), cost)
+            self._post([(username, -cost)], f"STORE {quantity} x {item_name}")
+            self._add_inventory_item(username, item_name, item_name, quantity)
+
+    def apply_batch(self, rows, dry_run=False):
+        food_menu = self.food_menu()
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')  # hold the write lock from the balance read on
+            result = plan(rows, self.balances(), food_menu)
+            if not dry_run:
+                for entries, memo in result.transactions:
+                    self._post(entries, memo)
+                for delivery in result.deliveries:
+                    self._add_inventory_item(*delivery)
+        return result
+
+    def news_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM news').fetchone()[0]
+
+    def news_articles(self, start, stop):
+        start = max(0, start)
+        rows = self.conn.execute(
+            'SELECT title, body FROM news ORDER BY id LIMIT ? OFFSET ?', (max(0, stop - start), start)
+        )
+        return [tuple(row) for row in rows]
+
+    def post_news(self, title, body):
+        with self.conn:
+            self.conn.execute('INSERT INTO news (title, body) VALUES (?, ?)', (title, body))
+
+    def food_menu(self):
+        return [tuple(row) for row in self.conn.execute('SELECT item, price FROM food_menu ORDER BY id')]
+
+    def maintenance_notes(self):
+        return [tuple(row) for row in self.conn.execute('SELECT hatch, note FROM maintenance_notes ORDER BY id')]
+
+    def hatch_notes(self, hatch):
+        rows = self.conn.execute(
+            'SELECT hatch, note FROM maintenance_notes WHERE hatch_id = ? ORDER BY id', (hatch.upper(),)
+        )
+        return [tuple(row) for row in rows]
+
+    def maintenance_notes_by_priority(self, priority):
+        rows = self.conn.execute(
+            'SELECT hatch, note FROM maintenance_notes WHERE priority = ? ORDER BY id', (priority.upper(),)
+        )
+        return [tuple(row) for row in rows]
+
+    def maintenance_note_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM maintenance_notes').fetchone()[0]
+
+    def maintenance_note_records(self, start, stop):
+        start = max(0, start)
+        rows = self.conn.execute(
+            'SELECT hatch, note FROM maintenance_notes ORDER BY id LIMIT ? OFFSET ?', (max(0, stop - start), start)
+        )
+        return [tuple(row) for row in rows]
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _read_pairs(path):
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and '|' in line:
+                yield line.split('|', 1)
+
+
+def _read_inventory(path):
+    with open(path, 'rb') as f:
+        for raw in f:
+            parsed = parse_item(raw)
+            if parsed is not None:
+                username, (item_name, description, quantity) = parsed
+                yield (username, item_name, description, quantity)
+
+
+def _read_ledger(path):
+    try:
+        with open(path, 'r') as f:
+            records = parse_ledger(f)
+    except FileNotFoundError:
+        return
+    for record in records:
+        yield (record.timestamp, record.username, record.delta, record.memo)
+
+
+def import_flat_files(db_path=DEFAULT_DB_PATH, source_dir='.', batch_size=IMPORT_BATCH_SIZE, balances=None):
+    """Bulk load the .txt data files from source_dir into db_path, replacing its contents
+
+    Balances are read from the store the flat backend uses, named by
+    balances or IRON_RING_BALANCES as for FlatFileStorage: with mmap,
+    user_holos.txt is stale once the ledger has been compacted.
+    Returns {table: rows imported}.
+    """
+    balances = balances or os.environ.get('IRON_RING_BALANCES', 'text')
+    if balances not in ('text', 'mmap'):
+        raise ValueError(f"Unknown balance store: {balances}")
+
+    def source(name):
+        return os.path.join(source_dir, name)
+
+    def holos_rows():
+        if balances == 'mmap':
+            source_ledger = MmapHoloLedger(source('user_holos.bin'), source('user_holos.txt'),
+                                           source('user_holos.ledger'))
+        else:
+            source_ledger = HoloLedger(source('user_holos.txt'), source('user_holos.ledger'))
+        return source_ledger.balances().items()
+
+    def users_rows():
+        with open(source('users.txt'), 'r') as f:
+            users = parse_users(f)
+        return ((u, d['password'], d['role']) for u, d in users.items())
+
+    def permissions_rows():
+        with open(source('permissions.txt'), 'r') as f:
+            permissions = parse_permissions(f)
+        return ((role, option) for role, options in permissions.items() for option in options)
+
+    def food_rows():
+        return ((item, int(price)) for item, price in _read_pairs(source('food_menu.txt')))
+
+    def notes_rows():
+        return ((hatch_id(hatch), hatch, note, note_priority(note))
+                for hatch, note in _read_pairs(source('maintenance_notes.txt')))
+
+    def transaction_rows():
+        yield from _read_ledger(source('user_holos.ledger.old'))
+        yield from _read_ledger(source('user_holos.ledger'))
+
+    def transfer_key_rows():
+        notes = [note for name in ('user_holos.notes', 'user_holos.ledger.old', 'user_holos.ledger')
+                 for note in read_notes(source(name))]
+        return ((r.key, r.sender, r.recipient, r.amount, r.memo) for r in parse_keys(notes).values())
+
+    tables = [
+        ('users', 'INSERT INTO users (username, password, role) VALUES (?, ?, ?)', users_rows),
+        ('permissions', 'INSERT INTO permissions (role, option) VALUES (?, ?)', permissions_rows),
+        ('balances', 'INSERT INTO balances (username, holos) VALUES (?, ?)', holos_rows),
+        ('transactions', 'INSERT INTO transactions (timestamp, username, delta, memo) VALUES (?, ?, ?, ?)',
+         transaction_rows),
+        ('transfer_keys', 'INSERT INTO transfer_keys (key, sender, recipient, amount, memo) VALUES (?, ?, ?, ?, ?)',
+         transfer_key_rows),
+        ('inventory', 'INSERT INTO inventory (username, item, description, quantity) VALUES (?, ?, ?, ?)',
+         lambda: _read_inventory(source('user_inventory.txt'))),
+        ('news', 'INSERT INTO news (title, body) VALUES (?, ?)', lambda: _read_pairs(source('news.txt'))),
+        ('food_menu', 'INSERT INTO food_menu (item, price) VALUES (?, ?)', food_rows),
+        ('maintenance_notes', 'INSERT INTO maintenance_notes (hatch_id, hatch, note, priority) VALUES (?, ?, ?, ?)',
+         notes_rows),
+    ]
+
+    db = SQLiteStorage(db_path)
+    counts = {}
+    with db.conn:
+        for table, insert, rows in tables:
+            db.conn.execute(f'DELETE FROM {table}')
+            counts[table] = 0
+            try:
+                for batch in _batched(rows(), batch_size):
+                    db.conn.executemany(insert, batch)
+                    counts[table] += len(batch)
+            except FileNotFoundError:
+                pass
+    db.conn.close()
+    # The search index described the database just replaced
+    try:
+        os.remove(db_path + '.search')
+    except FileNotFoundError:
+        pass
+    return counts
+
+
+def open_storage(backend=None, db_path=None):
+    """Open the backend named by IRON_RING_STORAGE (flat or sqlite)
+
+    The flat backend keeps balances in user_holos.txt, or in user_holos.bin
+    with IRON_RING_BALANCES=mmap.
+    """
+    backend = backend or os.environ.get('IRON_RING_STORAGE', 'flat')
+    if backend == 'sqlite':
+        return SQLiteStorage(db_path or os.environ.get('IRON_RING_DB', DEFAULT_DB_PATH))
+    if backend == 'flat':
+        return FlatFileStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")